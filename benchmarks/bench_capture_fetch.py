@@ -0,0 +1,143 @@
+"""
+Capture benchmark: handle_response detail gathering under a burst of accepted responses.
+
+    python benchmarks/bench_capture_fetch.py [--responses 500] [--body-size 20000] [--rtt-ms 3] [--slots 16]
+
+Playwright runs every response handler as its own task, so an SPA burst means hundreds of
+handlers at once, each doing browser round trips for the body and both header sets. The
+browser side is simulated here (asyncio.sleep per round trip; body bytes go through one
+shared pipe at --per-kb-ms) and two capture paths are compared:
+
+  serial      the three awaits one after another, no bound (the previous handler);
+  concurrent  fetch_response_details (asyncio.gather) inside CaptureSlots, then build_api_record.
+
+Reports handler latency (p50/p95 from the metrics histogram), the burst's wall time, the
+most bodies requested from the browser at once (what the slots bound) and the event loop's
+worst scheduling lag measured by a 5 ms ticker.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_core import CaptureSlots, build_api_record, fetch_response_details # noqa: E402
+from viper_metrics import ScanMetrics # noqa: E402
+
+HEADERS = {"content-type": "application/json", "cache-control": "no-cache", "x-request-id": "0" * 32,
+           "server": "bench", "date": "Mon, 01 Jan 2024 00:00:00 GMT", "content-length": "0"}
+
+
+class Browser:
+    """
+    Simulated CDP: round trips overlap, body bytes share one pipe (transfers are serialized).
+    Counts the bodies requested and not yet delivered.
+    """
+    def __init__(self, rtt, per_kb):
+        self.rtt = rtt; self.per_kb = per_kb
+        self.pipe = asyncio.Lock()
+        self.bodies_in_flight = 0; self.peak_bodies = 0
+
+    async def body(self, size):
+        self.bodies_in_flight += 1; self.peak_bodies = max(self.peak_bodies, self.bodies_in_flight)
+        try:
+            await asyncio.sleep(self.rtt)
+            async with self.pipe: await asyncio.sleep(self.per_kb * size / 1024)
+            return b'{"items": [' + b'1,' * (size // 2 - 8) + b'1]}'
+        finally: self.bodies_in_flight -= 1
+
+    async def headers(self):
+        await asyncio.sleep(self.rtt)
+        return dict(HEADERS)
+
+
+class FakeRequest:
+    method = "GET"; resource_type = "fetch"; post_data_buffer = None
+
+    def __init__(self, browser, url):
+        self.browser = browser; self.url = url
+
+    async def all_headers(self): return await self.browser.headers()
+
+
+class FakeResponse:
+    status = 200
+
+    def __init__(self, browser, url, size):
+        self.browser = browser; self.size = size; self.url = url
+        self.request = FakeRequest(browser, url)
+
+    async def body(self): return await self.browser.body(self.size)
+
+    async def all_headers(self): return await self.browser.headers()
+
+
+def no_log(message, level="INFO"): pass
+
+
+async def serial_capture(response, metrics):
+    request = response.request
+    with metrics.body_fetch_seconds.time(): body = await response.body()
+    response_headers = dict(await response.all_headers())
+    request_headers = dict(await request.all_headers())
+    return build_api_record(request.method, request.url, response.status, request_headers, None, response_headers, body)
+
+
+async def concurrent_capture(response, metrics, slots):
+    request = response.request
+    async with slots.slot():
+        body, response_headers, request_headers, request_body = await fetch_response_details(request, response, no_log, metrics)
+        return build_api_record(request.method, request.url, response.status, request_headers, request_body, response_headers, body)
+
+
+async def ticker(stop, lag):
+    interval = 0.005
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag[0] = max(lag[0], time.perf_counter() - start - interval)
+
+
+async def run_burst(mode, args):
+    browser = Browser(args.rtt_ms / 1000, args.per_kb_ms / 1000)
+    metrics = ScanMetrics()
+    slots = CaptureSlots(args.slots, metrics)
+    stop = asyncio.Event(); lag = [0.0]
+    tick = asyncio.create_task(ticker(stop, lag))
+
+    async def handler(i):
+        start = time.perf_counter()
+        response = FakeResponse(browser, f"https://api.example.com/items/{i}", args.body_size)
+        if mode == "serial": await serial_capture(response, metrics)
+        else: await concurrent_capture(response, metrics, slots)
+        metrics.handler_seconds.observe(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(args.responses)))
+    wall = time.perf_counter() - start
+    stop.set(); await tick
+    return {'wall': wall, 'p50': metrics.handler_seconds.quantile(0.5), 'p95': metrics.handler_seconds.quantile(0.95),
+            'peak_bodies': browser.peak_bodies, 'lag': lag[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=500, help="Accepted responses in the burst.")
+    parser.add_argument("--body-size", type=int, default=20000)
+    parser.add_argument("--rtt-ms", type=float, default=3.0, help="Simulated browser round trip per call.")
+    parser.add_argument("--per-kb-ms", type=float, default=0.05, help="Body transfer time per KB through the shared pipe.")
+    parser.add_argument("--slots", type=int, default=16, help="CaptureSlots limit of the concurrent path.")
+    args = parser.parse_args()
+
+    print(f"{args.responses} responses of {args.body_size / 1024:.0f} KB, {args.rtt_ms} ms round trips, {args.slots} capture slots")
+    for mode in ("serial", "concurrent"):
+        r = asyncio.run(run_burst(mode, args))
+        print(f"{mode:>10}: burst {r['wall'] * 1000:7.1f} ms | handler p50 {r['p50'] * 1000:6.1f} ms, p95 {r['p95'] * 1000:6.1f} ms "
+              f"| peak bodies in flight {r['peak_bodies']:4d} | max loop lag {r['lag'] * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+End-to-end scan benchmark against a local synthetic site (no network needed).
+
+    python benchmarks/bench_e2e_scan.py [--load-calls 200] [--sizes 512 4096 65536]
+        [--types json text xml binary] [--scroll-pages 5] [--calls-per-scroll 20]
+        [--click-targets 5] [--calls-per-click 10] [--form-values 3] [--repeat 1]
+        [--out FILE] [--compare BASELINE.json]
+
+Starts a ThreadingHTTPServer on 127.0.0.1 that serves one page. The page fires its API
+calls (fetch and XMLHttpRequest, cycling through the chosen body sizes and content types):
+
+  * --load-calls on load;
+  * --calls-per-scroll each time infinite scroll reaches the bottom (up to --scroll-pages);
+  * --calls-per-click for each of --click-targets buttons (.bench-click);
+  * one search call per submitted value of the #bench-search form.
+
+Then runs a full scan (viper_core.run_scan -> discover_apis_async) against it and reports:
+
+  * captures, expected calls and captures/s over the scan's wall time;
+  * response-to-queue latency percentiles, from the server finishing a response to the
+    scanner queueing its api_found message (both clocks are time.monotonic() in this process);
+  * peak RSS of this process, and of the browser processes (sampled; needs psutil);
+  * wall time per scan phase (launch, load, forms, clicks, scroll, teardown), from the scan's log.
+
+Results are written as JSON (default benchmarks/results/e2e-<timestamp>.json) with the tool
+version and git commit, so runs can be compared; --compare prints the deltas against an
+earlier file. Requires Playwright with Chromium installed.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import viper_core # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTENT_TYPES = {
+    "json": "application/json", "text": "text/plain; charset=utf-8",
+    "xml": "application/xml", "binary": "application/octet-stream",
+}
+# (message type, text prefix) -> phase that starts there (the scan's own status/log lines)
+PHASE_MARKERS = [
+    (("status", "Launching browser"), "launch"), (("log", "Navigating to"), "load"),
+    (("log", "Attempting form input"), "forms"), (("log", "Attempting clicks"), "clicks"),
+    (("log", "Performing"), "scroll"), (("log", "Interaction phase complete"), "teardown"),
+]
+RSS_SAMPLE_INTERVAL = 0.25 # Seconds
+
+PAGE_TEMPLATE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Viper benchmark site</title>
+<style>.filler {{ height: 1500px; border-top: 1px solid #ccc; }} button {{ margin: 4px; }}</style></head>
+<body>
+<form id="bench-form" onsubmit="return false;"><input id="bench-search" name="q" autocomplete="off"></form>
+<div id="buttons">{buttons}</div>
+<div id="feed"><div class="filler"></div></div>
+<script>
+const CFG = {config};
+let seq = 0;
+function call(path) {{
+  const i = seq++;
+  const size = CFG.sizes[i % CFG.sizes.length], type = CFG.types[i % CFG.types.length];
+  const url = path + (path.includes('?') ? '&' : '?') + 'size=' + size + '&type=' + type + '&n=' + i;
+  if (i % 2) {{ fetch(url).then(r => r.arrayBuffer()).catch(() => {{}}); }}
+  else {{ const x = new XMLHttpRequest(); x.open('GET', url); x.send(); }}
+}}
+window.addEventListener('load', () => {{ for (let i = 0; i < CFG.load_calls; i++) call('/api/load/' + i); }});
+let scrollPage = 0, loading = false;
+window.addEventListener('scroll', () => {{
+  if (loading || scrollPage >= CFG.scroll_pages) return;
+  if (window.innerHeight + window.scrollY < document.body.scrollHeight - 200) return;
+  loading = true; const page = ++scrollPage;
+  for (let i = 0; i < CFG.calls_per_scroll; i++) call('/api/feed/' + page + '/' + i);
+  const more = document.createElement('div'); more.className = 'filler'; document.getElementById('feed').appendChild(more);
+  setTimeout(() => {{ loading = false; }}, 50);
+}});
+document.querySelectorAll('.bench-click').forEach((btn, b) => btn.addEventListener('click', () => {{
+  for (let i = 0; i < CFG.calls_per_click; i++) call('/api/click/' + b + '/' + i);
+}}));
+document.getElementById('bench-search').addEventListener('keydown', e => {{
+  if (e.key === 'Enter') call('/api/search?q=' + encodeURIComponent(e.target.value));
+}});
+</script></body></html>"""
+
+
+def make_body(size, kind, seed):
+    """ Deterministic body of about `size` bytes in the given format. """
+    if kind == "json":
+        items = [{"id": seed * 1000 + n, "name": f"item-{seed}-{n}", "ok": n % 2 == 0} for n in range(max(1, size // 48))]
+        return json.dumps({"seed": seed, "items": items}).encode('utf-8')
+    if kind == "xml":
+        rows = "".join(f"<item id=\"{seed}-{n}\"/>" for n in range(max(1, size // 20)))
+        return f"<?xml version=\"1.0\"?><items>{rows}</items>".encode('utf-8')
+    if kind == "text":
+        return (f"line {seed} " * (size // 8 + 1)).encode('utf-8')[:size]
+    return bytes((seed + n) % 256 for n in range(size))
+
+
+class SyntheticSite:
+    """ The local benchmark server. `sent` maps each API path+query to time.monotonic() when its response was written. """
+    def __init__(self, config):
+        self.config = config
+        self.sent = {}
+        self.requests = 0
+        site = self
+        buttons = "".join(f'<button class="bench-click" id="b{b}">Load {b}</button>' for b in range(config["click_targets"]))
+        page = PAGE_TEMPLATE.format(buttons=buttons, config=json.dumps({k: config[k] for k in (
+            "sizes", "types", "load_calls", "scroll_pages", "calls_per_scroll", "calls_per_click")})).encode('utf-8')
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                site.requests += 1
+                parts = urlsplit(self.path)
+                if parts.path == "/":
+                    self.send_body(page, "text/html; charset=utf-8")
+                elif parts.path.startswith("/api/"):
+                    query = parse_qs(parts.query)
+                    kind = query.get("type", ["json"])[0]
+                    body = make_body(int(query.get("size", ["256"])[0]), kind, int(query.get("n", ["0"])[0]))
+                    self.send_body(body, CONTENT_TYPES.get(kind, CONTENT_TYPES["json"]))
+                    site.sent[self.path] = time.monotonic()
+                else:
+                    self.send_body(b"", "text/plain", status=404)
+
+            def send_body(self, body, content_type, status=200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass # Quiet
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="bench-site", daemon=True)
+
+    def expected_calls(self):
+        c = self.config
+        return (c["load_calls"] + c["scroll_pages"] * c["calls_per_scroll"]
+                + c["click_targets"] * c["calls_per_click"] + c["form_values"])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RssSampler:
+    """ Samples this process's and the browser processes' RSS in the background, keeping the peaks (MB). """
+    def __init__(self):
+        self.peak_browser_mb = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            browser_mb = viper_core.playwright_children_rss_mb()
+            if browser_mb is not None:
+                self.peak_browser_mb = max(self.peak_browser_mb or 0.0, browser_mb)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def peak_self_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KB on Linux
+
+
+def percentile(values, pct):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def run_once(config):
+    """ One scan against a fresh server; returns the metrics dict. """
+    with SyntheticSite(config) as site:
+        params = viper_core.build_scan_params(
+            site.url, scrolls=config["scroll_pages"] + 1, scroll_delay=0.3, wait_time=0.5,
+            click_selectors=[f"#b{b}" for b in range(config["click_targets"])],
+            form_selector="#bench-search" if config["form_values"] else "",
+            form_values_list=[f"query {v}" for v in range(config["form_values"])], form_submit=True, form_delay=0.3,
+            output_file=os.devnull)
+        phases = []; latencies = []; errors = []; captured = 0
+        start = time.monotonic()
+
+        def on_message(message):
+            nonlocal captured
+            now = message.get('ts', time.monotonic())
+            text = message.get('message', '')
+            for (msg_type, prefix), phase in PHASE_MARKERS:
+                if message.get('type') == msg_type and text.startswith(prefix) and (not phases or phases[-1][0] != phase):
+                    phases.append((phase, now)); break
+            if message.get('type') == 'error':
+                errors.append(text)
+            elif message.get('type') == 'api_found':
+                captured += 1
+                parts = urlsplit(message['data'].url)
+                sent = site.sent.get(parts.path + (f"?{parts.query}" if parts.query else ""))
+                if sent is not None: latencies.append(now - sent)
+
+        with RssSampler() as sampler:
+            viper_core.run_scan(params, on_message=on_message)
+        end = time.monotonic()
+
+    phase_times = {}
+    for (phase, t0), (_, t1) in zip(phases, phases[1:] + [("end", end)]):
+        phase_times[phase] = round(phase_times.get(phase, 0.0) + (t1 - t0), 3)
+    wall = end - start
+    return {
+        "wall_s": round(wall, 3),
+        "captures": captured,
+        "expected_calls": site.expected_calls(),
+        "server_api_responses": len(site.sent),
+        "captures_per_s": round(captured / wall, 2) if wall else None,
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 2) if latencies else None for p in (50, 90, 99)}
+                      | {"max": round(max(latencies) * 1000, 2) if latencies else None},
+        "peak_rss_mb": round(peak_self_rss_mb(), 1),
+        "peak_browser_rss_mb": round(sampler.peak_browser_mb, 1) if sampler.peak_browser_mb is not None else None,
+        "phases_s": phase_times,
+        "errors": errors,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(BENCH_DIR),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def flatten(metrics, prefix=""):
+    flat = {}
+    for key, value in metrics.items():
+        if isinstance(value, dict): flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool): flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nvs. {baseline_path} (version {baseline.get('version')}, commit {baseline.get('commit')}):")
+    old, new = flatten(baseline["summary"]), flatten(current["summary"])
+    for key in sorted(new):
+        if key not in old: continue
+        delta = new[key] - old[key]
+        pct = f"{delta / old[key]:+.1%}" if old[key] else ""
+        print(f"  {key:<28} {old[key]:>10}  ->  {new[key]:>10}  {pct}")
+
+
+def summarize(runs):
+    """ Median of each numeric metric over the runs (a single run is its own summary). """
+    flat_runs = [flatten(run) for run in runs]
+    summary = {}
+    for key in flat_runs[0]:
+        values = sorted(run[key] for run in flat_runs if key in run)
+        target = summary
+        *parents, leaf = key.split('.')
+        for parent in parents: target = target.setdefault(parent, {})
+        target[leaf] = values[len(values) // 2]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--load-calls", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 4096, 65536], help="Response body sizes (bytes), cycled.")
+    parser.add_argument("--types", nargs="+", choices=sorted(CONTENT_TYPES), default=["json", "text", "xml", "binary"], help="Response content types, cycled.")
+    parser.add_argument("--scroll-pages", type=int, default=5)
+    parser.add_argument("--calls-per-scroll", type=int, default=20)
+    parser.add_argument("--click-targets", type=int, default=5)
+    parser.add_argument("--calls-per-click", type=int, default=10)
+    parser.add_argument("--form-values", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=1, help="Scans to run; the summary holds the medians.")
+    parser.add_argument("--out", help="Result JSON file (default: benchmarks/results/e2e-<timestamp>.json).")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier result file to compare against.")
+    args = parser.parse_args()
+
+    config = {"load_calls": args.load_calls, "sizes": args.sizes, "types": args.types, "scroll_pages": args.scroll_pages,
+              "calls_per_scroll": args.calls_per_scroll, "click_targets": args.click_targets,
+              "calls_per_click": args.calls_per_click, "form_values": args.form_values}
+    runs = []
+    for i in range(args.repeat):
+        metrics = run_once(config)
+        runs.append(metrics)
+        print(f"run {i + 1}/{args.repeat}: {metrics['captures']}/{metrics['expected_calls']} captured in {metrics['wall_s']} s "
+              f"({metrics['captures_per_s']}/s), latency p50 {metrics['latency_ms']['p50']} ms p99 {metrics['latency_ms']['p99']} ms, "
+              f"peak RSS {metrics['peak_rss_mb']} MB (browser {metrics['peak_browser_rss_mb']} MB)")
+        print(f"  phases: {', '.join(f'{k} {v} s' for k, v in metrics['phases_s'].items())}")
+        for error in metrics['errors']: print(f"  scan error: {error}")
+
+    result = {
+        "benchmark": "e2e_scan", "version": viper_core.__version__, "commit": git_commit(),
+        "python": platform.python_version(), "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config,
+        "summary": summarize(runs), "runs": runs,
+    }
+    out = args.out or os.path.join(BENCH_DIR, "results", f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(result, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
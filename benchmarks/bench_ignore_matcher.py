@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: compiled IgnoreMatcher vs. the per-URL any() scan over the ignore list.
+
+    python benchmarks/bench_ignore_matcher.py [--patterns 300] [--urls 20000] [--repeat 5]
+
+Builds the default ignore list plus N synthetic custom patterns (domains, path fragments
+and extensions, like a pasted blocklist), then a mix of ignored and API-like URLs. It checks
+that both implementations agree on every URL before timing them.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_core import DEFAULT_IGNORE_PATTERNS, url_matches_ignore_list # noqa: E402
+from viper_matching import IgnoreMatcher # noqa: E402
+
+WORDS = ["track", "pixel", "beacon", "metrics", "cdn", "ads", "tag", "stat", "collect", "widget",
+         "chat", "consent", "cookie", "social", "video", "img", "static", "assets", "log", "event"]
+TLDS = [".com", ".net", ".io", ".org", ".co.uk"]
+API_PATHS = ["/api/v1/users/{n}", "/graphql", "/v2/items?page={n}", "/rest/orders/{n}/lines", "/search?q=item{n}"]
+
+
+def synthetic_patterns(n, rng):
+    patterns = []
+    for i in range(n):
+        kind = i % 3
+        if kind == 0: patterns.append(f"{rng.choice(WORDS)}{i}{rng.choice(WORDS)}{rng.choice(TLDS)}")
+        elif kind == 1: patterns.append(f"/{rng.choice(WORDS)}-{i}/")
+        else: patterns.append(f"{rng.choice(WORDS)}{i}.js")
+    return patterns
+
+
+def synthetic_urls(n, patterns, rng):
+    urls = []
+    domains = [p for p in patterns if '.' in p and '/' not in p and not p.endswith('.js')]
+    for i in range(n):
+        roll = rng.random()
+        if roll < 0.25: # Third-party host from the list (often a subdomain)
+            urls.append(f"https://{rng.choice(['', 'www.', 'edge.'])}{rng.choice(domains)}/p?id={i}")
+        elif roll < 0.35: # Static asset
+            urls.append(f"https://shop.example.com/static/{rng.choice(WORDS)}{i}{rng.choice(['.png', '.css', '.woff2', '.js'])}")
+        else: # First-party API call, not ignored
+            urls.append(f"https://Shop.Example.com{rng.choice(API_PATHS).format(n=i)}")
+    return urls
+
+
+def timed(fn, urls, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for u in urls: fn(u)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--patterns", type=int, default=300, help="Synthetic custom patterns on top of the defaults.")
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patterns = list(set(DEFAULT_IGNORE_PATTERNS + synthetic_patterns(args.patterns, rng)))
+    urls = synthetic_urls(args.urls, patterns, rng)
+
+    start = time.perf_counter()
+    matcher = IgnoreMatcher(patterns)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    mismatches = [u for u in urls if matcher.matches(u) != url_matches_ignore_list(u, patterns)]
+    if mismatches:
+        print(f"MISMATCH on {len(mismatches)} URL(s), e.g. {mismatches[0]}")
+        return 1
+
+    legacy_s = timed(lambda u: url_matches_ignore_list(u, patterns), urls, args.repeat)
+    compiled_s = timed(matcher.matches, urls, args.repeat)
+    ignored = sum(matcher.matches(u) for u in urls)
+    print(f"{len(patterns)} patterns, {len(urls)} URLs ({ignored} ignored), results identical.")
+    print(f"compile:        {compile_ms:8.2f} ms (once per scan)")
+    print(f"any() scan:     {legacy_s / len(urls) * 1e6:8.2f} us/URL")
+    print(f"IgnoreMatcher:  {compiled_s / len(urls) * 1e6:8.2f} us/URL  ({legacy_s / compiled_s:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
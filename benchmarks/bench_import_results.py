@@ -0,0 +1,87 @@
+"""
+Import benchmark: reading a saved results file back, whole-file json.load vs. streaming.
+
+    python benchmarks/bench_import_results.py [--rows 20000] [--body-size 8000] [--gzip]
+
+Writes N synthetic records as a JSON export (the layout of write_json_records), then reads
+it two ways:
+
+  load    json.load of the whole file, then ApiRecord.from_dict with every body decoded,
+          as a loader would without the streaming reader;
+  stream  viper_journal.iter_result_messages: the array is parsed incrementally and bodies
+          stay base64 until needed. Records are dropped as they are read, like the CLI's
+          --open does; the GUI keeps them (or writes them to its store).
+
+Reports time and peak traced memory (tracemalloc, so both runs are slower than untraced).
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_journal import iter_result_messages, open_export_file, write_json_records # noqa: E402
+from viper_records import ApiRecord # noqa: E402
+
+
+def synthetic_records(n, body_size):
+    for i in range(n):
+        items = [{"id": i * 100 + k, "name": f"Item {i}-{k}", "price": k * 1.25} for k in range(body_size // 50)]
+        body = json.dumps({"page": i, "items": items}).encode('utf-8')[:body_size]
+        yield ApiRecord("GET", f"https://shop.example.com/api/v2/items/{i}?page={i % 10}", 200, "application/json",
+                        {"accept": "application/json"}, None, {"content-type": "application/json"}, body)
+
+
+def load_whole(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    records = []
+    for item in data:
+        record = ApiRecord.from_dict(item)
+        if record.response_body_b64 is not None: # Decode up front, like an eager loader
+            record.response_body = base64.b64decode(record.response_body_b64); record.response_body_b64 = None
+        records.append(record)
+    return len(records)
+
+
+def stream(path):
+    return sum(1 for message in iter_result_messages(path) if message['type'] == 'api_found')
+
+
+def measure(read, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = read(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--body-size", type=int, default=8000, help="Response body bytes per record.")
+    parser.add_argument("--gzip", action="store_true", help="Also time streaming a .json.gz copy.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="viper_bench_") as root:
+        path = os.path.join(root, "apis.json")
+        paths = [path] + ([path + ".gz"] if args.gzip else [])
+        for name in paths:
+            with open_export_file(name) as f:
+                write_json_records(f, synthetic_records(args.rows, args.body_size))
+        print(f"{args.rows} records, {os.path.getsize(path) / 2**20:.0f} MB JSON")
+        for label, read, name in [("load", load_whole, path), ("stream", stream, path)] + [("stream .gz", stream, p) for p in paths[1:]]:
+            count, elapsed, peak = measure(read, name)
+            print(f"{label:>10}: {count} records in {elapsed:6.2f} s, peak {peak / 2**20:8.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
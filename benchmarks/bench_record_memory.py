@@ -0,0 +1,107 @@
+"""
+Memory benchmark: bytes per captured API call, legacy dict vs. ApiRecord.
+
+    python benchmarks/bench_record_memory.py [--counts 10000 100000] [--body-size 1500]
+
+Builds N synthetic captures the way the response handler sees them: header dicts with
+freshly allocated strings (as Playwright returns them), a JSON body and a small POST body.
+The "dict" layout is the one records used before (header dicts, base64 body, preformatted
+snippet). Memory is measured with tracemalloc and includes everything each record keeps alive;
+tracing makes the 100k run take a few minutes.
+"""
+import argparse
+import base64
+import gc
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_records import ApiRecord, format_response_snippet_pro_thread # noqa: E402
+
+REQUEST_HEADERS = {
+    "accept": "application/json, text/plain, */*", "accept-encoding": "gzip, deflate, br",
+    "accept-language": "en-US,en;q=0.9", "content-type": "application/json",
+    "origin": "https://shop.example.com", "referer": "https://shop.example.com/catalog",
+    "sec-ch-ua": '"Chromium";v="124", "Google Chrome";v="124", "Not-A.Brand";v="99"',
+    "sec-ch-ua-mobile": "?0", "sec-ch-ua-platform": '"Windows"', "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors", "sec-fetch-site": "same-origin",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+}
+RESPONSE_HEADERS = {
+    "cache-control": "no-cache, no-store, must-revalidate", "content-encoding": "br",
+    "content-type": "application/json; charset=utf-8", "server": "nginx", "vary": "Accept-Encoding, Origin",
+    "x-content-type-options": "nosniff", "strict-transport-security": "max-age=31536000; includeSubDomains",
+}
+
+
+def fresh(value):
+    """ A new str object with the same value (Playwright hands out new strings for every response). """
+    return value.encode('utf-8').decode('utf-8')
+
+
+def capture(i, body_size):
+    """ What the response handler has for one call: method, url, status, headers and bodies. """
+    request_headers = {fresh(k): fresh(v) for k, v in REQUEST_HEADERS.items()}
+    request_headers["x-request-id"] = f"{i:032x}"
+    response_headers = {fresh(k): fresh(v) for k, v in RESPONSE_HEADERS.items()}
+    response_headers["date"] = f"Tue, 14 May 2024 10:{i // 60 % 60:02d}:{i % 60:02d} GMT"
+    response_headers["etag"] = f'W/"{i:x}-{i * 7919:x}"'
+    items = [{"id": i * 100 + n, "name": f"Item {i}-{n}", "price": n * 1.25} for n in range(body_size // 50)]
+    body = json.dumps({"page": i, "items": items}).encode('utf-8')[:body_size]
+    request_body = json.dumps({"query": f"item {i}", "page": i % 10}).encode('utf-8')
+    return (fresh("POST" if i % 4 == 0 else "GET"), f"https://shop.example.com/api/v2/items/{i}?page={i % 10}",
+            200, request_headers, request_body, response_headers, body)
+
+
+def legacy_dict(method, url, status, request_headers, request_body, response_headers, body):
+    content_type = response_headers.get('content-type', '')
+    return {
+        "method": method, "url": url, "status": status, "content_type": content_type,
+        "response_snippet": format_response_snippet_pro_thread(body, content_type),
+        "request_headers": request_headers, "request_body": request_body, "response_headers": response_headers,
+        "raw_response_body_bytes": base64.b64encode(body).decode('ascii') if body else None,
+    }
+
+
+def api_record(method, url, status, request_headers, request_body, response_headers, body):
+    return ApiRecord(method, url, status, response_headers.get('content-type', ''),
+                     request_headers, request_body, response_headers, body)
+
+
+def measure(build, count, body_size):
+    """ Bytes still allocated per record once `count` records are built (inputs are freed as they would be). """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = {}
+    for i in range(count):
+        record = build(*capture(i, body_size))
+        store[i] = record
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del store
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--body-size", type=int, default=1500, help="Response body bytes per call.")
+    args = parser.parse_args()
+
+    print(f"{args.body_size} B response bodies, {len(REQUEST_HEADERS) + 1} request / {len(RESPONSE_HEADERS) + 2} response headers")
+    print(f"{'records':>8}  {'dict B/rec':>11}  {'ApiRecord B/rec':>15}  {'saved':>6}  {'dict total':>10}  {'ApiRecord total':>15}")
+    for count in args.counts:
+        legacy = measure(legacy_dict, count, args.body_size)
+        compact = measure(api_record, count, args.body_size)
+        print(f"{count:>8}  {legacy:>11,.0f}  {compact:>15,.0f}  {1 - compact / legacy:>6.0%}  "
+              f"{legacy * count / 2**20:>8.1f} MB  {compact * count / 2**20:>13.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
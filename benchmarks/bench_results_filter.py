@@ -0,0 +1,92 @@
+"""
+Filter benchmark: the results table's filter per keystroke, trigram index vs. a full scan.
+
+    python benchmarks/bench_results_filter.py [--rows 250000] [--seed 1]
+
+Builds a ResultsModel over N synthetic records (hosts, REST paths, ids, query strings),
+then types a few terms one character at a time, as the debounced filter would see them on
+slow typing. Each keystroke is timed two ways:
+
+  scan   substring test of every record's search text (narrowing within the view when
+         the term extends the previous one), as before the index;
+  index  ResultsModel.set_filter (SubstringIndex candidates, then the same substring test).
+
+Both must return the same rows. Also reports how long building the index took, then times
+a few structured queries (viper_query) planned through the index against running their
+predicate over every record.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_records import ApiRecord # noqa: E402
+from viper_query import parse_query # noqa: E402
+from viper_results import ResultsModel, search_text # noqa: E402
+
+WORDS = ["users", "orders", "items", "search", "graphql", "v1", "v2", "api", "auth", "cart",
+         "products", "reviews", "media", "static", "config"]
+TYPED = ["svc12", "orders/", "404", "123456", "graphql/v2", "json"]
+QUERIES = ["method:POST status:2xx host:svc12.*", "status:404 path:/graphql/*", "host:*.example3.com -method:get",
+           "type:html status:>=500 url:reviews/media", "method:PUT,POST status:201"]
+
+
+def synthetic_records(n, rng):
+    records = {}
+    for _ in range(n):
+        host = f"svc{rng.randint(0, 40)}.example{rng.randint(0, 9)}.com"
+        path = "/".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+        record = ApiRecord(rng.choice(["GET", "POST", "PUT"]), f"https://{host}/{path}/{rng.randint(0, 10**6)}?q={rng.randint(0, 999)}",
+                           rng.choice([200, 201, 404, 500]), rng.choice(["application/json", "text/html"]))
+        records[record.key] = record
+    return records
+
+
+def scan_filter(search, view, previous, term):
+    candidates = view if previous and previous in term else search
+    return [key for key in candidates if term in search[key]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=250000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    records = synthetic_records(args.rows, random.Random(args.seed))
+    start = time.perf_counter()
+    model = ResultsModel(records)
+    print(f"{len(records)} rows, model + index built in {time.perf_counter() - start:.2f} s")
+    search = {key: search_text(record) for key, record in records.items()}
+
+    worst = {"scan": 0.0, "index": 0.0}
+    for word in TYPED:
+        model.set_filter("")
+        view, previous = list(search), ""
+        cells = []
+        for i in range(1, len(word) + 1):
+            term = word[:i]
+            start = time.perf_counter(); view = scan_filter(search, view, previous, term); scan = time.perf_counter() - start
+            start = time.perf_counter(); model.set_filter(term); index = time.perf_counter() - start
+            if model.view != view: raise SystemExit(f"Mismatch for {term!r}: {len(model.view)} vs {len(view)} rows")
+            worst["scan"] = max(worst["scan"], scan); worst["index"] = max(worst["index"], index)
+            cells.append(f"{term}: {scan * 1000:.0f}/{index * 1000:.0f}")
+            previous = term
+        print(f"{word:>11} ({len(view):6d} rows)  scan/index ms  " + "  ".join(cells))
+    print(f"worst keystroke: scan {worst['scan'] * 1000:.1f} ms, index {worst['index'] * 1000:.1f} ms")
+
+    for text in QUERIES:
+        query = parse_query(text)
+        model.set_filter("")
+        start = time.perf_counter(); expected = [key for key, record in records.items() if query.matches(record, search[key])]; scan = time.perf_counter() - start
+        start = time.perf_counter(); model.set_filter(text); index = time.perf_counter() - start
+        if model.view != expected: raise SystemExit(f"Mismatch for {text!r}")
+        print(f"{text:>45} ({len(expected):6d} rows)  predicate scan {scan * 1000:6.1f} ms, index plan {index * 1000:6.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Schema inference benchmark: cost of merging captured JSON bodies into endpoint schemas.
+
+    python benchmarks/bench_schema_merge.py [--bodies 100000] [--endpoints 50] [--items 10]
+
+Generates synthetic API responses (nested objects, arrays of records, optional and nullable
+fields, enum-like strings) spread over --endpoints templated paths and merges them into a
+SchemaRegistry through observe(), i.e. including json.loads as the collector thread does.
+The per-endpoint sample cap is lifted so every body is merged. Reports merge throughput,
+the registry's memory afterwards (tracemalloc, measured separately) and the time to render
+the OpenAPI document.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from viper_schema import SchemaRegistry # noqa: E402
+
+STATUSES = ["active", "pending", "suspended", "deleted"]
+
+
+def make_body(i, items):
+    """ A typical list response: paging info plus `items` records, some fields optional or nullable. """
+    records = []
+    for n in range(items):
+        record = {"id": i * items + n, "name": f"Item {i}-{n}", "price": round((n + 1) * 1.25, 2),
+                  "status": STATUSES[(i + n) % len(STATUSES)], "created_at": "2024-05-14T10:00:00Z",
+                  "owner": {"id": f"{i:08x}-0000-4000-8000-{n:012x}", "email": f"user{n}@example.com"},
+                  "tags": ["a", "b"][: n % 3], "discount": None if n % 4 else 0.1}
+        if n % 5 == 0: record["note"] = "limited"
+        records.append(record)
+    return json.dumps({"page": i % 100, "total": 10000, "next": None if i % 10 == 0 else f"/api/items?page={i + 1}",
+                       "items": records}).encode('utf-8')
+
+
+def captures(count, endpoints, items):
+    for i in range(count):
+        endpoint = i % endpoints
+        yield "GET", f"https://api.example.com/v1/resource{endpoint}/{i}?page={i % 7}", 200, make_body(i, items)
+
+
+def merge_all(registry, bodies):
+    for method, url, status, body in bodies:
+        registry.observe(method, url, status, None, None, "application/json", body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bodies", type=int, default=100000)
+    parser.add_argument("--endpoints", type=int, default=50)
+    parser.add_argument("--items", type=int, default=10, help="Records per response body.")
+    args = parser.parse_args()
+
+    bodies = list(captures(args.bodies, args.endpoints, args.items))
+    body_bytes = sum(len(b[3]) for b in bodies)
+    print(f"{args.bodies} bodies ({body_bytes / 2**20:.1f} MB, avg {body_bytes / args.bodies:.0f} B) over {args.endpoints} endpoints")
+
+    parse_start = time.perf_counter()
+    for body in bodies: json.loads(body[3])
+    parse_s = time.perf_counter() - parse_start
+
+    registry = SchemaRegistry(samples_per_endpoint=args.bodies) # Merge everything
+    start = time.perf_counter()
+    merge_all(registry, bodies)
+    merge_s = time.perf_counter() - start
+    print(f"merge: {merge_s:.2f} s total, {merge_s / args.bodies * 1e6:.0f} us/body "
+          f"({(merge_s - parse_s) / args.bodies * 1e6:.0f} us merge + {parse_s / args.bodies * 1e6:.0f} us json.loads), "
+          f"{args.bodies / merge_s:,.0f} bodies/s")
+
+    start = time.perf_counter()
+    spec = registry.to_openapi()
+    export_ms = (time.perf_counter() - start) * 1000
+    print(f"OpenAPI export: {export_ms:.1f} ms, {len(spec['paths'])} paths, {len(json.dumps(spec)) / 1024:.0f} KB")
+
+    # Registry memory, measured on a fresh registry (tracing slows merging down)
+    del registry; gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    registry = SchemaRegistry(samples_per_endpoint=args.bodies)
+    merge_all(registry, bodies[: min(len(bodies), 20000)])
+    half = tracemalloc.get_traced_memory()[0] - before
+    merge_all(registry, bodies[min(len(bodies), 20000):])
+    gc.collect()
+    full = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"registry memory: {half / 1024:.0f} KB after {min(len(bodies), 20000)} bodies, {full / 1024:.0f} KB after {args.bodies} "
+          f"({full / args.endpoints / 1024:.1f} KB per endpoint)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
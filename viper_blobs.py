@@ -0,0 +1,66 @@
+"""
+Viper API Interceptor - on-disk blob store for large response bodies.
+
+Bodies up to the scan's inline limit stay in the record as base64 ('raw_response_body_bytes').
+Larger ones are written once to a content-addressed file (<root>/<sha[:2]>/<sha256>), and the
+record keeps only a small reference instead:
+
+    'response_body_blob': {'sha256': ..., 'size': ..., 'path': ...}
+
+The details pane and the exports read a blob only when they need it (see ApiRecord.load_body).
+Identical bodies, e.g. the same feed hit by several batch targets, are stored once.
+"""
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+
+DEFAULT_INLINE_BODY_LIMIT = 256 * 1024 # Bytes; larger response bodies are spilled to the blob store
+
+
+class BlobStore:
+    """ Content-addressed store of response bodies. Without a root it uses a private temp dir removed by close(). """
+    def __init__(self, root=None):
+        self.owns_root = root is None
+        self.root = os.path.abspath(root) if root else tempfile.mkdtemp(prefix="viper_blobs_")
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def put(self, data):
+        """ Stores bytes (if not already present) and returns their reference dict. Safe to call from worker threads. """
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path_for(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp name then rename, so a concurrent put() or reader never sees a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                with contextlib.suppress(OSError): os.remove(tmp_path)
+                raise
+        return {"sha256": sha256, "size": len(data), "path": path}
+
+    def clear(self):
+        """ Deletes every blob under the root (records referencing them can no longer be read). """
+        for name in os.listdir(self.root):
+            entry = os.path.join(self.root, name)
+            if os.path.isdir(entry) and len(name) == 2:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def close(self):
+        """ Removes the temp dir if this store created it; a user-supplied root is kept. """
+        if self.owns_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def read_blob(ref, limit=None):
+    """ Reads a blob's bytes (at most `limit` bytes if given). Raises OSError if the file is gone. """
+    with open(ref['path'], 'rb') as f:
+        return f.read(-1 if limit is None else limit)
+
@@ -0,0 +1,337 @@
+"""
+Viper API Interceptor - headless command line entry point.
+
+    python -m viper_cli https://example.com -o apis.json
+    python -m viper_cli --targets-file targets.txt --concurrency 8 --config scan.json
+    python -m viper_cli --open old_scan.json.gz --query "status:5xx" -o errors.json
+
+Builds the same scan_params dict as the GUI's Start Scan (via viper_core.build_scan_params)
+and runs discover_apis_async without importing tkinter/customtkinter, so it works on
+display-less CI runners and servers. The scan engine is only imported after argument
+parsing, which keeps `--help` and argument errors instant. --open reads a saved results
+file instead of scanning and never imports the engine at all.
+"""
+import time
+_T_START = time.perf_counter() # Cold start reference point, reported at DEBUG level
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+
+# Option name -> type, for values read from a --config JSON file (same names as build_scan_params)
+CONFIG_KEYS = {
+    "url": str, "targets": list, "scrolls": int, "scroll_delay": float, "wait_time": float,
+    "click_selectors": list, "hover_before_click": bool, "form_selector": str, "form_values_list": list,
+    "form_submit": bool, "form_delay": float, "wait_strategy": str, "user_agent": str,
+    "proxy": str, "proxy_type": str, "ignore_patterns": list, "allowed_resource_types": list,
+    "status_codes": str, "navigation_timeout": int, "action_timeout": int,
+    "concurrency": int, "target_timeout": float, "output_file": str, "log_level": str, "log_file": str, "openapi_file": str,
+    "block_resources": bool, "block_resource_types": list, "block_ignored_urls": bool,
+    "inline_body_limit": int, "blob_dir": str, "capture_concurrency": int,
+    "adaptive_waits": bool, "quiet_window": float, "quiet_cap": float,
+    "crawl": bool, "crawl_max_depth": int, "crawl_max_pages": int, "crawl_concurrency": int,
+    "dedup_templates": bool, "journal_path": str, "store_path": str, "metrics_path": str, "metrics_port": int,
+    "query": str,
+}
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "SUCCESS"]
+
+
+def build_arg_parser():
+    """ Command line flags mirroring the GUI's scan settings. """
+    parser = argparse.ArgumentParser(
+        prog="python -m viper_cli",
+        description="Headless Viper API Interceptor: discover API calls made by web pages.")
+    parser.add_argument("urls", nargs="*", metavar="URL", help="Target URL(s). More than one URL runs a batch scan.")
+    parser.add_argument("--targets-file", metavar="FILE", help="File with one target URL per line (# comments allowed).")
+    parser.add_argument("--config", metavar="FILE", help="JSON file with scan options (keys as in build_scan_params). Flags override it.")
+    parser.add_argument("-o", "--output", dest="output_file", metavar="FILE", help="Where to save results as JSON (default: viper_discovered_apis.json).")
+    parser.add_argument("--open", dest="open_file", metavar="FILE", help="Read a saved results file (JSON export or NDJSON journal, optionally .gz) instead of scanning. "
+                        "Prints its results (those matching --query), and saves them with -o and/or --store; scan options are ignored.")
+
+    interact = parser.add_argument_group("interaction")
+    interact.add_argument("--scrolls", type=int, help="Number of times to scroll down the page (default 3).")
+    interact.add_argument("--scroll-delay", type=float, help="Delay in seconds between scrolls (default 1.5).")
+    interact.add_argument("--wait-time", type=float, help="Extra wait in seconds after load/interaction phases (default 2.0).")
+    interact.add_argument("--click", dest="click_selectors", action="append", metavar="SELECTOR", help="CSS selector to click (repeatable, or comma-separated).")
+    interact.add_argument("--hover", dest="hover_before_click", action="store_const", const=True, help="Hover before each click.")
+    interact.add_argument("--form-selector", metavar="SELECTOR", help="CSS selector of the input to type into.")
+    interact.add_argument("--form-value", dest="form_values_list", action="append", metavar="VALUE", help="Value to type into the form input (repeatable).")
+    interact.add_argument("--no-form-submit", dest="form_submit", action="store_const", const=False, help="Do not press Enter after each form value.")
+    interact.add_argument("--form-delay", type=float, help="Delay in seconds between form values (default 2.0).")
+    interact.add_argument("--fixed-waits", dest="adaptive_waits", action="store_const", const=False, help="Sleep the fixed delays (and networkidle waits) instead of ending phases on network quiescence.")
+    interact.add_argument("--quiet-window", type=float, metavar="SECONDS", help="Adaptive waits: quiet time that ends a phase (default 0.5).")
+    interact.add_argument("--quiet-cap", type=float, metavar="SECONDS", help="Adaptive waits: maximum wait per phase (default 10).")
+
+    browser = parser.add_argument_group("browser")
+    browser.add_argument("--wait-until", dest="wait_strategy", choices=["load", "domcontentloaded", "networkidle"], help="Page load strategy (default networkidle).")
+    browser.add_argument("--user-agent", help="User-Agent string (default: desktop Chrome).")
+    browser.add_argument("--proxy", metavar="HOST:PORT", help="HTTP/SOCKS5 proxy server.")
+    browser.add_argument("--proxy-type", choices=["http", "socks5"], help="Proxy type (default http).")
+    browser.add_argument("--nav-timeout", dest="navigation_timeout", type=int, metavar="MS", help="Navigation timeout in ms (default 60000).")
+    browser.add_argument("--action-timeout", type=int, metavar="MS", help="Timeout for clicks/fills in ms (default 30000).")
+
+    filtering = parser.add_argument_group("filtering")
+    filtering.add_argument("--ignore", dest="ignore_patterns", action="append", metavar="PATTERN", help="Extra URL fragment/domain to ignore (repeatable).")
+    filtering.add_argument("--ignore-file", metavar="FILE", help="File with one ignore pattern per line.")
+    filtering.add_argument("--resource-types", metavar="TYPES", help="Comma-separated resource types to capture (default xhr,fetch).")
+    filtering.add_argument("--status-codes", metavar="CODES", help="Allowed status codes, e.g. 200,302 or 2xx,3xx (default: <400).")
+    filtering.add_argument("--query", metavar="QUERY", help="Only print and save results matching a filter query, e.g. 'method:POST status:2xx host:*.example.com size:>1mb header:authorization' (same syntax as the GUI filter).")
+    filtering.add_argument("--templates", dest="dedup_templates", action="store_const", const=True, help="Group calls into endpoint templates (/items/{int}) with hit counts instead of one result per exact URL.")
+    filtering.add_argument("--block-resources", action="store_const", const=True, help="Abort unwanted requests at the network level instead of downloading them.")
+    filtering.add_argument("--block-types", metavar="TYPES", help="Resource types aborted when blocking (default image,media,font).")
+    filtering.add_argument("--no-block-ignored", dest="block_ignored_urls", action="store_const", const=False, help="When blocking, do not abort ignore-list matches.")
+
+    capture = parser.add_argument_group("capture")
+    capture.add_argument("--inline-body-limit", type=int, metavar="BYTES", help="Response bodies larger than this are spilled to a blob store on disk (default 262144).")
+    capture.add_argument("--capture-concurrency", type=int, metavar="N", help="Accepted responses whose bodies/headers are fetched at once; the rest wait (default 16).")
+    capture.add_argument("--journal", dest="journal_path", metavar="FILE", help="Append results to this NDJSON journal while scanning (default: the output file with an .ndjson extension).")
+    capture.add_argument("--openapi", dest="openapi_file", metavar="FILE", help="Infer JSON schemas per endpoint from captured bodies and write an OpenAPI 3 spec to FILE.")
+    capture.add_argument("--store", dest="store_path", metavar="FILE", help="Also write results to an SQLite result store (indexed; can be reopened in the GUI).")
+    capture.add_argument("--no-journal", action="store_true", help="Keep results in memory only; nothing is written until the scan ends.")
+    capture.add_argument("--blob-dir", metavar="DIR", help="Keep spilled bodies in DIR (content-addressed by sha256). Default: a temp dir removed on exit.")
+
+    crawl = parser.add_argument_group("crawl")
+    crawl.add_argument("--crawl", action="store_const", const=True, help="Also visit same-origin links and SPA routes found on each target page.")
+    crawl.add_argument("--max-depth", dest="crawl_max_depth", type=int, metavar="N", help="Crawl: link depth from the target page (default 2).")
+    crawl.add_argument("--max-pages", dest="crawl_max_pages", type=int, metavar="N", help="Crawl: page budget per target, including the target (default 20).")
+    crawl.add_argument("--crawl-concurrency", type=int, metavar="N", help="Crawl: pages open at the same time (default 3).")
+
+    batch = parser.add_argument_group("batch")
+    batch.add_argument("--concurrency", type=int, help="Targets scanned at once in batch mode (default 4).")
+    batch.add_argument("--target-timeout", type=float, metavar="SECONDS", help="Per-target time budget in batch mode, 0 = none (default 180).")
+
+    parser.add_argument("--log-level", choices=LOG_LEVELS, type=str.upper, help="Minimum log level printed to stderr (default INFO).")
+    parser.add_argument("--log-file", metavar="FILE", help="Also write the full log (DEBUG and up) to FILE, rotated at 5 MB.")
+    parser.add_argument("--metrics-file", dest="metrics_path", metavar="FILE", help="Write scan metrics (response outcomes, filter verdicts, latency histograms, phase times) to FILE as JSON when the scan ends.")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="Serve live scan metrics in Prometheus text format on http://127.0.0.1:PORT/metrics.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print discovered APIs to stdout.")
+    return parser
+
+
+def load_config_file(path):
+    """ Reads scan options from a JSON config file, validating the keys. """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError("Config file must contain a JSON object.")
+    unknown = sorted(set(config) - set(CONFIG_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown config option(s): {', '.join(unknown)}")
+    for key, expected in CONFIG_KEYS.items():
+        if key in config and config[key] is not None and not isinstance(config[key], expected):
+            if expected is float and isinstance(config[key], int): continue
+            raise ValueError(f"Config option '{key}' must be of type {expected.__name__}.")
+    return config
+
+
+def read_lines_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def options_from_args(args):
+    """ Merges --config values with command line flags (flags win) into build_scan_params options. """
+    from viper_core import parse_pattern_lines, parse_status_codes, build_proxy_config
+
+    options = load_config_file(args.config) if args.config else {}
+    for key in CONFIG_KEYS:
+        value = getattr(args, key, None)
+        if value is not None:
+            options[key] = value
+
+    targets = list(options.pop("targets", None) or [])
+    url = options.pop("url", None)
+    urls = list(args.urls or [])
+    if url: urls.insert(0, url)
+    if args.targets_file:
+        targets.extend(parse_pattern_lines(read_lines_file(args.targets_file)))
+    if len(urls) > 1 or (urls and targets):
+        targets = urls + targets
+        urls = []
+    options["url"] = urls[0] if urls else None
+    options["targets"] = targets
+
+    if args.click_selectors: # Allow both repeated flags and comma-separated lists
+        options["click_selectors"] = [s for sel in args.click_selectors for s in sel.split(',')]
+    ignore = list(options.get("ignore_patterns") or [])
+    if args.ignore_file:
+        ignore.extend(parse_pattern_lines(read_lines_file(args.ignore_file)))
+    options["ignore_patterns"] = ignore
+    if isinstance(options.get("allowed_resource_types"), str):
+        options["allowed_resource_types"] = [t.strip() for t in options["allowed_resource_types"].split(',') if t.strip()]
+    if args.resource_types:
+        options["allowed_resource_types"] = [t.strip() for t in args.resource_types.split(',') if t.strip()]
+    if args.block_types:
+        options["block_resource_types"] = [t.strip() for t in args.block_types.split(',') if t.strip()]
+    options["allowed_status_codes"] = parse_status_codes(options.pop("status_codes", "") or "")
+    options["proxy_config"] = build_proxy_config(options.pop("proxy", "") or "", options.pop("proxy_type", None) or "http")
+    options.pop("log_level", None)
+    return options
+
+
+def make_message_printer(level_name, quiet=False, log_handler=None, query=None):
+    """
+    Returns an on_message callback printing queue messages like the GUI log pane (and writing every 'log' message to log_handler, if given).
+    With a viper_query.Query, only matching results are printed (hits:/size: clauses see the record as first found).
+    """
+    level_map = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR, "SUCCESS": logging.INFO}
+    min_level = level_map.get(level_name, logging.INFO)
+    state = {'errors': 0}
+    if log_handler:
+        from viper_core import log_record_from_message
+
+    def on_message(message):
+        msg_type = message.get('type')
+        if msg_type == 'log':
+            msg_level = message.get('level', 'INFO').upper()
+            if log_handler: log_handler.handle(log_record_from_message(message))
+            if level_map.get(msg_level, getattr(logging, msg_level, logging.INFO)) >= min_level:
+                print(f"{time.strftime('%H:%M:%S')} [{msg_level:<7}] {message.get('message', '')}", file=sys.stderr)
+        elif msg_type == 'status':
+            if min_level <= logging.DEBUG:
+                print(f"{time.strftime('%H:%M:%S')} [STATUS ] {message.get('message', '')}", file=sys.stderr)
+        elif msg_type == 'api_found' and not quiet:
+            record = message['data']
+            if query and not query.matches(record): return
+            url = (record.template or '').partition(' ')[2] or record.url # Template mode prints the template
+            print(f"{record.method}\t{record.status}\t{url}", flush=True)
+        elif msg_type == 'error':
+            state['errors'] += 1
+            print(f"{time.strftime('%H:%M:%S')} [ERROR  ] {message.get('message', '')}", file=sys.stderr)
+    on_message.state = state
+    return on_message
+
+
+def open_results(args, parser):
+    """
+    --open: streams the records of a saved results file (one at a time, however large the file)
+    to stdout, and to -o (JSON, gzip for .gz; written only if the whole file is read) and/or a
+    --store SQLite file. Returns the exit code.
+    """
+    from viper_journal import EXPORT_PARTIAL_SUFFIX, is_gzip_name, iter_journal_results, open_export_file, write_json_records
+    from viper_query import QueryError, parse_query
+    from viper_store import StoreWriter
+
+    try: query = parse_query(args.query or "") or None
+    except QueryError as e: parser.error(f"--query: {e}")
+    on_message = make_message_printer(args.log_level or "INFO", quiet=args.quiet)
+    counts = {'read': 0, 'matched': 0}
+    store = None
+
+    def matching():
+        for record in iter_journal_results(args.open_file): # Deduplicated, journal hit counts applied
+            counts['read'] += 1
+            if query and not query.matches(record): continue
+            counts['matched'] += 1
+            on_message({'type': 'api_found', 'data': record})
+            if store: store.append({'type': 'api_found', 'data': record})
+            yield record
+
+    try:
+        if args.store_path: store = StoreWriter(args.store_path)
+        if args.output_file:
+            partial = args.output_file + EXPORT_PARTIAL_SUFFIX # Renamed when complete, like ExportTask: a failed read never leaves a truncated -o
+            try:
+                with open_export_file(partial, compress=is_gzip_name(args.output_file)) as f:
+                    write_json_records(f, matching())
+                os.replace(partial, args.output_file)
+            finally:
+                try: os.remove(partial)
+                except OSError: pass # Already renamed
+            on_message({'type': 'log', 'level': 'SUCCESS', 'message': f"{counts['matched']} result(s) saved to {args.output_file}"})
+        else:
+            for _ in matching(): pass
+    except Exception as e: # OSError, ValueError (not a results file), sqlite3.Error
+        on_message({'type': 'log', 'level': 'ERROR', 'message': f"Could not read {args.open_file}: {e}"})
+        return 1
+    finally:
+        if store: store.close()
+    if query: print(f"{counts['read']} result(s) read from {args.open_file}, {counts['matched']} matching --query.", file=sys.stderr)
+    else: print(f"{counts['read']} result(s) read from {args.open_file}.", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.open_file:
+        if args.urls or args.targets_file: parser.error("--open cannot be combined with target URLs")
+        return open_results(args, parser)
+    if not args.urls and not args.targets_file and not args.config:
+        parser.error("a target URL, --targets-file, --config or --open is required")
+
+    t_import = time.perf_counter()
+    import viper_core # Deferred: pulls in Playwright, never tkinter
+    import_ms = (time.perf_counter() - t_import) * 1000
+
+    from viper_blobs import BlobStore
+    from viper_schema import SchemaRegistry
+    from viper_journal import journal_path_for
+    from viper_query import QueryError, parse_query
+
+    try:
+        options = options_from_args(args)
+        if args.no_journal: options["journal_path"] = None
+        elif not options.get("journal_path"):
+            options["journal_path"] = journal_path_for(options.get("output_file") or viper_core.DEFAULT_OUTPUT_FILE)
+        log_file = options.pop("log_file", None)
+        openapi_file = options.pop("openapi_file", None)
+        metrics_port = options.pop("metrics_port", None)
+        query = parse_query(options.pop("query", None) or "") or None
+        if openapi_file: options["schema_registry"] = SchemaRegistry()
+        blob_store = BlobStore(options.pop("blob_dir", None)) # Large bodies are read back when saving
+        params = viper_core.build_scan_params(blob_store=blob_store, **options)
+    except QueryError as e:
+        parser.error(f"--query: {e}")
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    level_name = args.log_level or "INFO"
+    log_handler = None
+    if log_file:
+        try: log_handler = viper_core.open_rotating_log(log_file)
+        except OSError as e: parser.error(f"cannot open log file {log_file}: {e}")
+    on_message = make_message_printer(level_name, quiet=args.quiet, log_handler=log_handler, query=query)
+    metrics_server = None
+    if metrics_port is not None:
+        from viper_metrics import MetricsServer
+        try: metrics_server = MetricsServer(params['metrics'], metrics_port)
+        except (OSError, OverflowError) as e: parser.error(f"cannot serve metrics on port {metrics_port}: {e}")
+    startup_ms = (time.perf_counter() - _T_START) * 1000
+    on_message({'type': 'log', 'level': 'DEBUG', 'message': f"Cold start: {startup_ms:.0f} ms to scan start (engine import {import_ms:.0f} ms)."})
+
+    try:
+        results = viper_core.run_scan(params, on_message=on_message)
+
+        output_file = params['output_file'] or viper_core.DEFAULT_OUTPUT_FILE
+        journal_path = params.get('journal_path')
+        if query:
+            matched = sum(1 for record in results.values() if query.matches(record))
+        if results and journal_path and os.path.exists(journal_path):
+            viper_core.save_journal_results(journal_path, output_file, params['queue'], query=query) # Streams, never re-serializes `results`
+        elif results:
+            viper_core.save_results_gui({key: record for key, record in results.items() if not query or query.matches(record)},
+                                        output_file, params['queue'])
+        if openapi_file:
+            viper_core.save_openapi_spec(params['schema_registry'], openapi_file, params['queue'])
+        while not params['queue'].empty(): # Print the save confirmation/error
+            on_message(params['queue'].get_nowait())
+        for line in params['metrics'].summary_lines():
+            on_message({'type': 'log', 'level': 'DEBUG', 'message': f"Metrics: {line}"})
+    finally:
+        blob_store.close()
+        if metrics_server: metrics_server.close()
+        if log_handler: viper_core.close_rotating_log(log_handler)
+    if query: print(f"{len(results)} API call(s) discovered, {matched} matching --query.", file=sys.stderr)
+    else: print(f"{len(results)} API call(s) discovered.", file=sys.stderr)
+
+    if params['stop_event'].is_set():
+        return 130
+    return 1 if on_message.state['errors'] and not results else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1576 @@
+"""
+Viper API Interceptor - scan engine.
+
+Everything needed to run a scan without a display: constants, the Playwright
+discovery logic, the warm browser runtime and result saving. The GUI
+(viper_scraper_exe.py) and the headless CLI (viper_cli.py) are both thin front
+ends over this module, which must never import tkinter/customtkinter.
+"""
+import threading
+import queue
+import asyncio
+import json
+import logging
+import re
+import time
+import random
+from urllib.parse import urlparse, urlunparse, urljoin, quote
+import os
+import sys
+import traceback # Import for logging tracebacks
+import contextlib
+from logging.handlers import RotatingFileHandler
+
+from playwright.async_api import async_playwright, Error as PlaywrightError, Page, Locator, TimeoutError as PlaywrightTimeoutError
+
+from viper_matching import IgnoreMatcher
+from viper_blobs import DEFAULT_INLINE_BODY_LIMIT
+from viper_endpoints import DEFAULT_MAX_SAMPLES, EndpointRegistry, endpoint_template, apply_api_hit
+from viper_records import ApiRecord
+from viper_journal import JOURNAL_MESSAGE_TYPES, JournalWriter, export_json_from_journal, open_export_file, write_json_records
+from viper_schema import SCHEMA_BODY_LIMIT, SchemaCollector
+from viper_metrics import PhaseClock, ScanMetrics
+from viper_store import STORE_MESSAGE_TYPES, StoreWriter
+
+
+__version__ = "3.4.0-viper-enhanced" # Updated version
+TOOL_NAME = "Viper API Interceptor"
+DEFAULT_OUTPUT_FILE = "viper_discovered_apis.json"
+
+# --- Logging Setup ---
+log_formatter = logging.Formatter('%(asctime)s [%(levelname)-7s] %(message)s', datefmt='%H:%M:%S')
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG) # Keep DEBUG: handlers (GUI pane, console) filter, the optional log file gets everything
+DEFAULT_LOG_FILE = "viper_scan.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024 # Rotate the on-disk log at this size...
+LOG_FILE_BACKUPS = 3 # ...keeping this many old files (viper_scan.log.1 ...)
+
+# --- Constants ---
+RESOURCE_TYPES = ["xhr", "fetch", "document", "script", "stylesheet", "image", "font", "media", "websocket", "other"]
+DEFAULT_IGNORE_PATTERNS = [
+    'google-analytics.com', 'googletagmanager.com', 'facebook.net', 'connect.facebook.net',
+    'fbcdn.net', 'doubleclick.net', 'googleadservices.com', 'adservice.google.com',
+    'googlesyndication.com', 'fonts.googleapis.com', 'fonts.gstatic.com',
+    'gstatic.com/recaptcha', 'criteo.com', 'scorecardresearch.com', 'krxd.net',
+    'cdn-cgi/challenge-platform', 'cdn-cgi/rum', 'cdn.jsdelivr.net', 'cdnjs.cloudflare.com',
+    '.js', '.css', '.woff', '.woff2', '.ttf', '.svg', '.png', '.jpg', '.jpeg',
+    '.gif', '.ico', '.webp', '.avif', '.mp4', '.webm', '.css.map', '.js.map',
+    'google.com/ads', 'youtube.com/api/stats', 'googlevideo.com', 'ytimg.com',
+    'imasdk.googleapis.com', '/beacon', '/track', '/pixel', 'analytics', 'metrics', 'segment.com'
+]
+INTERESTING_HEADERS = ['authorization', 'set-cookie', 'cookie', 'x-csrf-token', 'x-api-key', 'x-auth-token', 'bearer', 'jwt', 'api-key', 'apikey']
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Mobile Safari/537.36",
+    "Custom"
+]
+DEFAULT_RESOURCE_TYPES = ["xhr", "fetch"] # Checked by default in the GUI
+# --- Network-level blocking (opt-in) ---
+ROUTE_BLOCK_DEFAULT_TYPES = ["image", "media", "font"] # Heavy types aborted outright when blocking is on
+# Never aborted because of an ignore-list match: the page needs these to render and run its API-calling JS
+ROUTE_PROTECTED_TYPES = ["document", "script", "stylesheet", "xhr", "fetch", "websocket", "eventsource"]
+# Rough average transfer size per resource type, used to estimate bytes avoided (aborted requests have no size)
+ROUTE_ESTIMATED_BYTES = {"image": 30000, "media": 400000, "font": 35000, "stylesheet": 15000, "script": 25000,
+                         "xhr": 3000, "fetch": 3000, "other": 5000}
+# Adaptive waits: a phase ends once tracked traffic has been quiet for QUIET_WINDOW seconds (at most QUIET_CAP)
+DEFAULT_QUIET_WINDOW = 0.5
+DEFAULT_QUIET_CAP = 10.0
+QUIESCENCE_IGNORED_TYPES = ["websocket", "eventsource", "media", "manifest"] # Open-ended streams never "finish"
+QUIESCENCE_LONG_POLL_SECONDS = 8.0 # Requests in flight longer than this are treated as long-polls and ignored
+# Crawl mode: same-origin pages visited after the target page itself
+DEFAULT_CRAWL_MAX_DEPTH = 2
+DEFAULT_CRAWL_MAX_PAGES = 20
+DEFAULT_CRAWL_CONCURRENCY = 3
+CRAWL_SKIP_EXTENSIONS = {'.pdf', '.zip', '.gz', '.tar', '.rar', '.7z', '.exe', '.dmg', '.apk', '.msi', '.iso',
+                         '.png', '.jpg', '.jpeg', '.gif', '.webp', '.svg', '.ico', '.bmp', '.mp4', '.webm', '.mp3',
+                         '.wav', '.ogg', '.woff', '.woff2', '.ttf', '.css', '.js', '.json', '.xml', '.txt', '.csv'}
+CRAWL_SKIP_PATTERNS = ['logout', 'log-out', 'signout', 'sign-out', 'logoff'] # Never follow links that end the session
+CRAWL_LINKS_JS = "() => Array.from(document.querySelectorAll('a[href], area[href]'), a => a.href)"
+# Accepted responses whose body/headers are being fetched and stored at once (bounds memory under bursts)
+DEFAULT_CAPTURE_CONCURRENCY = 16
+
+
+# --- Input Parsing Helpers (shared by GUI and CLI) ---
+
+def sanitize_url(url_str: str) -> str:
+    """Adds scheme if missing and validates basic structure."""
+    url_str = url_str.strip()
+    if not url_str: raise ValueError("URL cannot be empty.")
+    # Prepend https:// if no scheme is present
+    if not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', url_str):
+        log.debug(f"Prepending https:// to URL: {url_str}")
+        url_str = 'https://' + url_str
+    try:
+        parsed = urlparse(url_str)
+        # Basic check for scheme and netloc (domain)
+        if not parsed.scheme or not parsed.netloc:
+             # Try to handle cases like "https:example.com"
+             if parsed.scheme and not parsed.netloc and parsed.path:
+                  url_str = f"{parsed.scheme}://{parsed.path}"
+                  parsed = urlparse(url_str) # Reparse
+
+             # If still invalid, raise error
+             if not parsed.scheme or not parsed.netloc:
+                 raise ValueError("Invalid URL format. Ensure it includes scheme and domain.")
+        # Reconstruct to ensure clean format (e.g., handles ports correctly)
+        return parsed.geturl()
+    except Exception as e: # Catch potential errors during parsing
+        raise ValueError(f"Invalid URL structure: {e}")
+
+
+def parse_status_codes(code_input: str) -> set:
+    """
+    Parses a status code filter such as "200,302" or "2xx,3xx" into a set of codes.
+    An empty string returns an empty set (meaning: allow <400). Raises ValueError on bad input.
+    """
+    allowed_status_codes = set()
+    code_input = (code_input or "").strip().lower()
+    if not code_input: return allowed_status_codes
+
+    for part in code_input.split(','):
+        part = part.strip()
+        if not part: continue
+        if 'x' in part: # Handle ranges like 2xx, 4xx
+            if len(part) == 3 and part.endswith('xx') and part[0].isdigit():
+                base = int(part[0])
+                if 1 <= base <= 5:
+                    allowed_status_codes.update(range(base * 100, (base + 1) * 100))
+                else: raise ValueError(f"Invalid range base: {part}")
+            else: raise ValueError(f"Invalid range format: {part}. Use '1xx' to '5xx'.")
+        elif part.isdigit(): # Handle specific codes
+             code = int(part)
+             if 100 <= code <= 599:
+                 allowed_status_codes.add(code)
+             else: raise ValueError(f"Status code out of range (100-599): {part}")
+        else: raise ValueError(f"Invalid status code format: {part}")
+    return allowed_status_codes
+
+
+def build_proxy_config(proxy_str: str, proxy_type: str = "http"):
+    """Constructs the proxy dictionary for Playwright. Returns None if empty, raises ValueError if invalid."""
+    proxy_str = (proxy_str or "").strip()
+    if not proxy_str: return None
+    proxy_type = proxy_type.lower() # Ensure lowercase
+    # Ensure scheme is added if not present (e.g., user enters 127.0.0.1:8080)
+    server = f"{proxy_type}://{proxy_str}" if not proxy_str.startswith(('http://', 'https://', 'socks5://')) else proxy_str
+    # Basic validation
+    parsed = urlparse(server)
+    if not parsed.hostname or not parsed.port:
+         raise ValueError("Invalid hostname or port")
+    return {"server": server}
+
+
+def parse_pattern_lines(text: str) -> list:
+    """Splits one-per-line text (ignore patterns, targets) dropping blanks and # comments."""
+    return [line.strip() for line in (text or "").splitlines() if line.strip() and not line.strip().startswith('#')]
+
+
+def parse_csv_list(text: str) -> list:
+    """Splits "a, b,c" into ['a', 'b', 'c'] (lowercased, blanks dropped)."""
+    return [part.strip().lower() for part in (text or "").split(',') if part.strip()]
+
+
+def build_scan_params(url=None, targets=None, *, scrolls=3, scroll_delay=1.5, wait_time=2.0,
+                      click_selectors=(), hover_before_click=False, form_selector="", form_values_list=(),
+                      form_submit=True, form_delay=2.0, wait_strategy="networkidle", user_agent=None,
+                      proxy_config=None, ignore_patterns=(), allowed_resource_types=None,
+                      allowed_status_codes=None, navigation_timeout=60000, action_timeout=30000,
+                      use_stealth=False, concurrency=4, target_timeout=180.0, runtime=None,
+                      block_resources=False, block_resource_types=ROUTE_BLOCK_DEFAULT_TYPES,
+                      block_ignored_urls=True, route_protected_types=ROUTE_PROTECTED_TYPES,
+                      inline_body_limit=DEFAULT_INLINE_BODY_LIMIT, blob_store=None,
+                      adaptive_waits=True, quiet_window=DEFAULT_QUIET_WINDOW, quiet_cap=DEFAULT_QUIET_CAP,
+                      crawl=False, crawl_max_depth=DEFAULT_CRAWL_MAX_DEPTH, crawl_max_pages=DEFAULT_CRAWL_MAX_PAGES,
+                      crawl_concurrency=DEFAULT_CRAWL_CONCURRENCY, capture_concurrency=DEFAULT_CAPTURE_CONCURRENCY,
+                      dedup_templates=False, journal_path=None, store_path=None,
+                      schema_registry=None, metrics=None, metrics_path=None, output_file=DEFAULT_OUTPUT_FILE, result_queue=None, stop_event=None, notify=None):
+    """
+    Builds the scan_params dict consumed by run_playwright_discover_thread. Defaults match
+    the GUI's initial settings. Either `url` or a non-empty `targets` list (batch mode) is required.
+    """
+    targets = [sanitize_url(t) for t in (targets or [])]
+    if url:
+        url = sanitize_url(url)
+    elif targets:
+        url = targets[0] # Batch mode: the single URL is not used
+    else:
+        raise ValueError("Target URL is required.")
+
+    result_queue = result_queue if result_queue is not None else queue.Queue()
+    metrics = metrics if metrics is not None else ScanMetrics()
+    metrics.queue_depth.set_function(result_queue.qsize, queue="result")
+
+    # Combine default and custom ignore lists, remove duplicates
+    custom_ignore = [p.strip().lower() for p in ignore_patterns if p and p.strip()]
+    combined_ignore_list = list(set(DEFAULT_IGNORE_PATTERNS + custom_ignore))
+
+    return {
+        "url": url,
+        "output_file": output_file, # Not used by thread, but maybe later
+        "scrolls": int(scrolls),
+        "scroll_delay": float(scroll_delay),
+        "wait_time": float(wait_time),
+        "click_selectors": [s.strip() for s in click_selectors if s and s.strip()],
+        "hover_before_click": bool(hover_before_click),
+        "form_selector": (form_selector or "").strip(),
+        "form_values_list": [v.strip() for v in form_values_list if v and v.strip()],
+        "form_submit": bool(form_submit),
+        "form_delay": float(form_delay),
+        "wait_strategy": wait_strategy,
+        "user_agent": user_agent or USER_AGENTS[0],
+        "proxy_config": proxy_config,
+        "combined_ignore_list": combined_ignore_list,
+        "ignore_matcher": IgnoreMatcher(combined_ignore_list), # Compiled once per scan, shared by all targets
+        "allowed_resource_types": set(DEFAULT_RESOURCE_TYPES if allowed_resource_types is None else allowed_resource_types),
+        "allowed_status_codes": set(allowed_status_codes or ()),
+        "navigation_timeout": int(navigation_timeout),
+        "action_timeout": int(action_timeout),
+        "use_stealth": use_stealth, # Keep False unless playwright-stealth is explicitly integrated
+        "targets": targets, # Non-empty list switches the worker to batch mode
+        "concurrency": max(1, int(concurrency)),
+        "target_timeout": max(0.0, float(target_timeout or 0)),
+        "runtime": runtime, # Warm browser pool, or None to launch per scan
+        "block_resources": bool(block_resources), # Abort unwanted requests via context.route
+        "block_resource_types": set(block_resource_types or ()),
+        "block_ignored_urls": bool(block_ignored_urls),
+        "route_protected_types": set(route_protected_types or ()),
+        "inline_body_limit": max(0, int(inline_body_limit)), # Larger bodies go to blob_store (if one is given)
+        "blob_store": blob_store,
+        "adaptive_waits": bool(adaptive_waits), # End phases on network quiescence instead of fixed sleeps
+        "quiet_window": max(0.05, float(quiet_window)),
+        "quiet_cap": max(0.0, float(quiet_cap)),
+        "crawl": bool(crawl), # Also visit same-origin links found on the target page
+        "crawl_max_depth": max(1, int(crawl_max_depth)),
+        "crawl_max_pages": max(1, int(crawl_max_pages)), # Including the target page itself
+        "crawl_concurrency": max(1, int(crawl_concurrency)),
+        "capture_concurrency": max(1, int(capture_concurrency)),
+        "capture_slots": CaptureSlots(capture_concurrency, metrics), # Shared by all targets (and crawled pages) of a scan
+        "dedup_templates": bool(dedup_templates), # Dedup on endpoint templates (IDs/cache-busters collapsed) instead of exact URLs
+        "journal_path": journal_path, # NDJSON file every result is appended to during the scan (None = no journal)
+        "store_path": store_path, # SQLite result store (viper_store) results are written to during the scan (None = no store)
+        "schema_registry": schema_registry, # viper_schema.SchemaRegistry JSON bodies are merged into (None = no schema inference)
+        "metrics": metrics, # viper_metrics.ScanMetrics updated by the scan (counters, histograms, queue depths)
+        "metrics_path": metrics_path, # JSON file the metrics are written to when the scan ends (None = not written)
+        "queue": result_queue, # Queue for thread communication
+        "notify": notify, # Optional callable run (on the scan thread) after each queued message, e.g. to wake a GUI
+        "stop_event": stop_event if stop_event is not None else threading.Event() # Event to signal termination
+    }
+
+
+# --- Playwright Logic (Adapted for Threading/Queue Communication) ---
+
+def url_matches_ignore_list(url, ignore_list):
+    """
+    True if any ignore fragment occurs in the URL's domain or path (case-insensitive).
+    Accepts a compiled IgnoreMatcher (used by scans) or a plain list of fragments.
+    """
+    if isinstance(ignore_list, IgnoreMatcher):
+        return ignore_list.matches(url)
+    parsed_url = urlparse(url.lower()) # Parse the lowercase URL
+    url_path = parsed_url.path
+    url_domain = parsed_url.netloc
+    return any((ignore_frag in url_domain or ignore_frag in url_path) for ignore_frag in ignore_list if ignore_frag)
+
+
+def api_call_verdict(request, response, ignore_list, allowed_types, allowed_codes):
+    """
+    Checks if a request/response pair looks like an API call based on configured filters.
+    This version includes slightly looser heuristics for xhr/fetch types.
+    Returns (is_api, rule): the name of the check that decided, for the scan metrics.
+    """
+    # Early exit checks
+    if not request or not response: return False, "invalid"
+    if request.method == 'OPTIONS': return False, "options_preflight" # Ignore OPTIONS preflight requests
+
+    url = request.url # Keep case for potential future use, compare lower
+    method = request.method
+    status = response.status
+    resource_type = request.resource_type or 'other' # Default to 'other' if None
+
+    # --- Filtering Logic ---
+    # 1. Resource Type Filter
+    if allowed_types and resource_type not in allowed_types:
+        return False, "resource_type"
+
+    # 2. Status Code Filter
+    if allowed_codes: # If specific codes are provided, ONLY allow those
+        if status not in allowed_codes:
+            return False, "status_code"
+    elif status >= 400: # Default: If no specific codes, ignore errors (>=400)
+        return False, "error_status"
+
+    # 3. Ignore List Filter (Combined default + custom)
+    if url_matches_ignore_list(url, ignore_list):
+        return False, "ignore_list"
+
+    # --- API Heuristics ---
+    headers = response.headers # Playwright headers are dict-like, case-insensitive access
+    content_type = headers.get('content-type', '').lower()
+
+    # Strong indicators: Specific API content types
+    if any(api_ct in content_type for api_ct in ['application/json', 'application/xml', 'text/xml', 'application/javascript', 'text/javascript', 'application/vnd.api+json']):
+        return True, "api_content_type"
+
+    # Strong indicator: Non-GET successful requests are often API calls
+    if method != 'GET' and status < 400:
+        return True, "non_get"
+
+    # Moderate indicator (Looser Heuristic): xhr/fetch types that passed other filters
+    # This helps catch APIs that don't use standard content types but are requested via XHR/Fetch
+    if resource_type in ["xhr", "fetch"]:
+        log.debug(f"Including based on resource type filter pass: {method} {status} {resource_type} {url}")
+        return True, "xhr_fetch"
+
+    # If it passed filters but didn't match strong or moderate heuristics, exclude it.
+    # This avoids including many standard document/script/css loads that might pass basic filters.
+    log.debug(f"Excluding (passed filters but no strong API heuristic): {method} {status} {resource_type} {url}")
+    return False, "no_api_heuristic"
+
+
+def is_likely_api_call_pro_thread(request, response, queue, ignore_list, allowed_types, allowed_codes):
+    """ True if a request/response pair looks like an API call (see api_call_verdict). """
+    return api_call_verdict(request, response, ignore_list, allowed_types, allowed_codes)[0]
+
+
+class RouteBlocker:
+    """
+    Opt-in request routing that aborts unwanted requests before they hit the network:
+    every request of a blocked resource type, plus (optionally) ignore-list matches that
+    are not of a protected type. Keeps per-scan counts of what was avoided.
+    Note that routing sends every request through the Python side, so it is only worth
+    it on media-heavy targets or metered proxies.
+    """
+    def __init__(self, block_types, ignore_list, block_ignored=True, protected_types=ROUTE_PROTECTED_TYPES):
+        self.block_types = set(block_types)
+        self.ignore_list = ignore_list
+        self.block_ignored = block_ignored
+        self.protected_types = set(protected_types)
+        self.requests_seen = 0
+        self.requests_blocked = 0
+        self.blocked_by_type = {}
+        self.bytes_avoided_estimate = 0
+
+    def should_block(self, resource_type, url):
+        if resource_type in self.block_types:
+            return True
+        return (self.block_ignored and resource_type not in self.protected_types
+                and url_matches_ignore_list(url, self.ignore_list))
+
+    async def handle(self, route):
+        """ context.route() handler: abort or let the request through. """
+        request = route.request
+        resource_type = request.resource_type or 'other'
+        self.requests_seen += 1
+        try:
+            if self.should_block(resource_type, request.url):
+                self.requests_blocked += 1
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + 1
+                self.bytes_avoided_estimate += ROUTE_ESTIMATED_BYTES.get(resource_type, ROUTE_ESTIMATED_BYTES['other'])
+                await route.abort("blockedbyclient")
+            else:
+                await route.continue_()
+        except PlaywrightError:
+            pass # Route already handled or page/context closed
+
+    def summary(self):
+        return {
+            'requests_seen': self.requests_seen, 'requests_blocked': self.requests_blocked,
+            'blocked_by_type': dict(self.blocked_by_type), 'bytes_avoided_estimate': self.bytes_avoided_estimate,
+        }
+
+
+class NetworkQuiescence:
+    """
+    In-flight request tracker fed by the page's request/requestfinished/requestfailed events.
+    wait_quiet() returns as soon as no tracked request has been active for `window` seconds,
+    or after `cap` seconds at most. WebSockets/event streams, ignore-list matches (analytics
+    beacons) and requests pending longer than `long_poll_after` (long-polls) are not tracked.
+    """
+    def __init__(self, ignore_matcher=None, ignored_types=QUIESCENCE_IGNORED_TYPES, long_poll_after=QUIESCENCE_LONG_POLL_SECONDS):
+        self.ignore_matcher = ignore_matcher
+        self.ignored_types = set(ignored_types)
+        self.long_poll_after = long_poll_after
+        self.inflight = {} # Request -> monotonic start time
+        self.last_activity = time.monotonic()
+        self.phases = 0
+        self.seconds_waited = 0.0
+
+    def attach(self, page):
+        page.on("request", self.on_request)
+        page.on("requestfinished", self.on_done)
+        page.on("requestfailed", self.on_done)
+
+    def on_request(self, request):
+        if request.resource_type in self.ignored_types: return
+        if self.ignore_matcher is not None and self.ignore_matcher.matches(request.url): return
+        self.last_activity = self.inflight[request] = time.monotonic()
+
+    def on_done(self, request):
+        if self.inflight.pop(request, None) is not None:
+            self.last_activity = time.monotonic()
+
+    def busy(self, now):
+        """ Number of tracked requests in flight, not counting presumed long-polls. """
+        return sum(1 for started in self.inflight.values() if now - started < self.long_poll_after)
+
+    async def wait_quiet(self, window, cap, stop_event=None):
+        """ Waits until the network has been quiet for `window` seconds (measured from now at the earliest). Returns seconds waited. """
+        start = time.monotonic()
+        poll = min(0.1, window / 4)
+        while True:
+            now = time.monotonic()
+            if now - start >= cap or (stop_event is not None and stop_event.is_set()): break
+            if not self.busy(now) and now - max(self.last_activity, start) >= window: break
+            await asyncio.sleep(poll)
+        waited = time.monotonic() - start
+        self.phases += 1; self.seconds_waited += waited
+        return waited
+
+
+def normalize_crawl_url(url, origin):
+    """
+    Frontier key for a link, or None if it should not be crawled: other origins, non-HTTP schemes,
+    downloads/assets and logout links. Fragments are dropped unless they look like hash routes (#/..., #!...).
+    """
+    try: parsed = urlparse(url)
+    except ValueError: return None
+    scheme = parsed.scheme.lower(); netloc = parsed.netloc.lower()
+    if scheme not in ('http', 'https') or f"{scheme}://{netloc}" != origin: return None
+    path = parsed.path or '/'
+    if os.path.splitext(path)[1].lower() in CRAWL_SKIP_EXTENSIONS: return None
+    if any(p in path.lower() for p in CRAWL_SKIP_PATTERNS): return None
+    fragment = parsed.fragment if parsed.fragment.startswith(('/', '!')) else ''
+    return urlunparse((scheme, netloc, path, parsed.params, parsed.query, fragment))
+
+
+class CrawlFrontier:
+    """ Deduplicated breadth-first frontier of same-origin URLs, bounded by depth and a total page budget. """
+    def __init__(self, seed_url, max_depth=DEFAULT_CRAWL_MAX_DEPTH, max_pages=DEFAULT_CRAWL_MAX_PAGES):
+        parsed = urlparse(seed_url)
+        self.origin = f"{parsed.scheme.lower()}://{parsed.netloc.lower()}"
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.queue = asyncio.Queue() # (url, depth) waiting to be visited
+        self.seen = set()
+        self.scheduled = 1 # The seed page counts against the budget
+        seed_key = normalize_crawl_url(seed_url, self.origin)
+        if seed_key: self.seen.add(seed_key)
+
+    def add(self, url, depth):
+        """ Queues a link found at depth-1. Returns True if it was new and within budget. """
+        if depth > self.max_depth or self.scheduled >= self.max_pages: return False
+        key = normalize_crawl_url(url, self.origin)
+        if key is None or key in self.seen: return False
+        self.seen.add(key)
+        self.scheduled += 1
+        self.queue.put_nowait((key, depth))
+        return True
+
+
+class CaptureSlots:
+    """
+    Bounds how many accepted responses have their details fetched and stored at once. Bodies of
+    the ones waiting are not requested yet, so a burst of large responses cannot pile up in memory.
+    """
+    def __init__(self, limit, metrics=None):
+        self.limit = max(1, int(limit))
+        self.in_flight = 0
+        self.metrics = metrics
+        self._semaphore = None # Created on first use, on the scan's event loop
+        if metrics is not None: metrics.captures_in_flight.set_function(lambda: self.in_flight)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore is None: self._semaphore = asyncio.Semaphore(self.limit)
+        waited_from = time.perf_counter()
+        async with self._semaphore:
+            if self.metrics is not None: self.metrics.capture_wait_seconds.observe(time.perf_counter() - waited_from)
+            self.in_flight += 1
+            try: yield
+            finally: self.in_flight -= 1
+
+
+async def fetch_response_details(request, response, q_log, metrics=None):
+    """
+    Fetches (response body, response headers, request headers, request body) of a response, best
+    effort: the three browser round trips run concurrently and whatever fails is None/{} (logged at DEBUG).
+    """
+    req_url = request.url
+
+    async def body():
+        if metrics is None: return await response.body()
+        with metrics.body_fetch_seconds.time(): return await response.body()
+
+    response_body_bytes, response_headers, request_headers = await asyncio.gather(
+        body(), response.all_headers(), request.all_headers(), return_exceptions=True)
+    if isinstance(response_body_bytes, BaseException):
+        q_log(f"Could not get response body for {req_url}: {response_body_bytes}", "DEBUG"); response_body_bytes = None
+    if isinstance(response_headers, BaseException):
+        q_log(f"Could not get response headers for {req_url}: {response_headers}", "DEBUG"); response_headers = {}
+    if isinstance(request_headers, BaseException):
+        q_log(f"Could not get request headers for {req_url}: {request_headers}", "DEBUG"); request_headers = {}
+    request_body_bytes = None
+    try:
+        request_body_bytes = request.post_data_buffer # Access attribute directly
+    except PlaywrightError as e: q_log(f"Could not get request post data buffer for {req_url}: {e}", "DEBUG")
+    except Exception as e_body: q_log(f"Unexpected error getting request post data buffer for {req_url}: {e_body}", "DEBUG")
+    return response_body_bytes, dict(response_headers), dict(request_headers), request_body_bytes
+
+
+def build_api_record(req_method, req_url, status, request_headers, request_body_bytes, response_headers,
+                     response_body_bytes, blob_store=None, inline_body_limit=DEFAULT_INLINE_BODY_LIMIT, **record_fields):
+    """
+    CPU/disk side of a capture, run off the event loop: spills a large body to the blob store
+    (sha256 + write) and builds the ApiRecord (header packing). Returns (record, note) where
+    note is a log line about the spill, if any.
+    """
+    content_type = response_headers.get('content-type', '')
+    body_blob = None; note = None
+    if blob_store is not None and response_body_bytes and len(response_body_bytes) > inline_body_limit:
+        # Spill large bodies to disk; the record only keeps the reference
+        try:
+            body_blob = blob_store.put(response_body_bytes)
+            response_body_bytes = None
+            note = (f"Stored {body_blob['size'] / 1024:.0f} KB body of {req_url} as blob {body_blob['sha256'][:12]}.", "DEBUG")
+        except OSError as e: note = (f"Could not write body blob for {req_url}, keeping it inline: {e}", "WARNING")
+    record = ApiRecord(req_method, req_url, status, content_type, request_headers, request_body_bytes,
+                       response_headers, response_body_bytes, body_blob, **record_fields)
+    return record, note
+
+
+class ScanReporter:
+    """
+    Puts log, status and result messages for one scan (or one batch target) onto the result queue.
+    Every message gets 'ts' (time.monotonic() when queued) so consumers can measure display latency.
+    """
+    def __init__(self, result_queue, target=None, journal=None, notify=None, metrics=None, store=None):
+        self.result_queue = result_queue
+        self.metrics = metrics # ScanMetrics counting dropped messages (optional)
+        self.target = target # Set in batch mode so every message can be traced back to its target
+        self.journal = journal # JournalWriter results are also appended to (None = no journal)
+        self.store = store # StoreWriter results are also written to (None = no result store)
+        self.notify = notify # Called after each queued message (e.g. wakes the GUI instead of waiting for its poll)
+
+    def put(self, message):
+        """ Safely put a message onto the queue, tagging it with the target if one is set. """
+        if self.target is not None:
+            message.setdefault('target', self.target)
+        if self.journal is not None and message.get('type') in JOURNAL_MESSAGE_TYPES:
+            self.journal.append(message) # Persisted even if the GUI never gets to it
+        if self.store is not None and message.get('type') in STORE_MESSAGE_TYPES:
+            self.store.append(message)
+        message.setdefault('ts', time.monotonic()) # After the journal snapshot: only meaningful in this process
+        try:
+            self.result_queue.put_nowait(message)
+            if self.notify is not None: self.notify()
+            return True
+        except queue.Full:
+            print(f"Warning: Result queue full. Dropping '{message.get('type')}' message.", file=sys.stderr)
+            if self.metrics is not None: self.metrics.messages_dropped.inc(type=message.get('type'))
+            return False
+
+    def log(self, message, level="INFO", exc_info=False):
+        """ Safely put a log message onto the queue. """
+        # Optionally include traceback string for errors
+        if exc_info and getattr(logging, level.upper(), 0) >= logging.ERROR:
+            message += f"\n{traceback.format_exc()}"
+        if self.target is not None:
+            message = f"[{urlparse(self.target).netloc or self.target}] {message}"
+        self.put({'type': 'log', 'level': level, 'message': message})
+
+    def status(self, message, progress=False):
+        """ Safely put a status update onto the queue. """
+        if self.target is not None:
+            message = f"[{urlparse(self.target).netloc or self.target}] {message}"
+        self.put({'type': 'status', 'message': message, 'progress': progress})
+
+
+def open_rotating_log(path, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+    """
+    Attaches a rotating file handler (DEBUG and up) to the tool's logger and returns it.
+    Scan messages travel as 'log' queue messages, not LogRecords; feed them in with log_record_from_message().
+    """
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8', delay=True)
+    handler.setFormatter(log_formatter)
+    handler.setLevel(logging.DEBUG)
+    log.addHandler(handler)
+    return handler
+
+
+def close_rotating_log(handler):
+    log.removeHandler(handler)
+    handler.close()
+
+
+def log_record_from_message(message):
+    """ LogRecord for a 'log' queue message, so handlers (e.g. the rotating log file) can write it. """
+    level_name = message.get('level', 'INFO').upper()
+    return logging.makeLogRecord({
+        'name': log.name, 'levelname': level_name, 'levelno': getattr(logging, level_name, logging.INFO),
+        'msg': message.get('message', ''),
+    })
+
+
+async def launch_browser(p, proxy_config, reporter):
+    """ Launches Chromium, reporting failures via the queue. Returns None if the launch failed. """
+    reporter.status("Launching browser...", progress=True)
+    try:
+        # Launch browser (consider adding channel="chrome" or "msedge" if needed)
+        browser = await p.chromium.launch(headless=True, proxy=proxy_config)
+        reporter.log(f"Browser launched successfully.", level="DEBUG")
+        return browser
+    except PlaywrightError as launch_err:
+        reporter.log(f"Failed to launch browser: {launch_err}", level="CRITICAL")
+        reporter.log("Check if Playwright browsers are installed ('playwright install --with-deps')", level="ERROR")
+        reporter.put({'type': 'error', 'message': f"Browser Launch Error: {launch_err}"})
+    except Exception as e: # Catch other potential launch errors
+        reporter.log(f"Unexpected browser launch error: {e}", level="CRITICAL", exc_info=True)
+        reporter.put({'type': 'error', 'message': f"Unexpected Launch Error: {e}"})
+    return None
+
+
+async def collect_page_links(page, route_changes=()):
+    """ Links on the page plus the URLs it navigated to (SPA route changes). Best effort. """
+    links = list(route_changes)
+    try:
+        links.append(page.url)
+        links.extend(await page.evaluate(CRAWL_LINKS_JS))
+    except PlaywrightError: pass # Page closed or navigating; use what we have
+    return links
+
+
+def track_route_changes(page):
+    """ Records main-frame navigations, including history API (pushState) route changes. Returns the list. """
+    route_changes = []
+    page.on("framenavigated", lambda frame: route_changes.append(frame.url) if frame == page.main_frame else None)
+    return route_changes
+
+
+async def crawl_same_origin(context, seed_page, seed_routes, params, reporter, handle_response, settle):
+    """
+    Crawl mode: visits same-origin links (and route changes) reachable from the seed page with a bounded
+    pool of pages. Every response goes through the scan's handle_response, so dedup is shared with the seed.
+    Crawled pages are loaded and scrolled; clicks and form input only run on the seed page.
+    """
+    stop_event = params['stop_event']; q_log = reporter.log; q_status = reporter.status
+    frontier = CrawlFrontier(seed_page.url, params.get('crawl_max_depth', DEFAULT_CRAWL_MAX_DEPTH), params.get('crawl_max_pages', DEFAULT_CRAWL_MAX_PAGES))
+    for link in await collect_page_links(seed_page, seed_routes):
+        frontier.add(link, 1)
+    if frontier.queue.empty():
+        q_log("Crawl: no same-origin links found on the target page.", level="INFO")
+        return
+
+    stats = {'pages': 0, 'endpoints': 0, 'pages_since_new': 0}
+    crawl_start = time.monotonic()
+    q_log(f"Crawl started from {frontier.origin}: {frontier.queue.qsize()} link(s) queued "
+          f"(depth <= {frontier.max_depth}, <= {frontier.max_pages} pages).", level="INFO")
+
+    async def visit(page, tracker, route_changes, found, url, depth):
+        route_changes.clear(); found[0] = 0
+        try:
+            await page.goto(url, wait_until=params['wait_strategy'])
+            await settle(f"after loading {url}", params['wait_time'], on_page=page, tracker=tracker)
+            for i in range(params['scrolls']):
+                if stop_event.is_set(): break
+                await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+                await settle(f"after scroll {i+1} on {url}", params['scroll_delay'], on_page=page, tracker=tracker)
+        except PlaywrightError as e:
+            q_log(f"Crawl: could not load {url}: {e}", level="WARNING")
+        added = sum(frontier.add(link, depth + 1) for link in await collect_page_links(page, route_changes)) if depth < frontier.max_depth else 0
+
+        stats['pages'] += 1; stats['endpoints'] += found[0]
+        stats['pages_since_new'] = 0 if found[0] else stats['pages_since_new'] + 1
+        rate = stats['pages'] / max(time.monotonic() - crawl_start, 1e-6)
+        q_log(f"Crawled {url} (depth {depth}): {found[0]} new endpoint(s), {added} new link(s).", level="INFO")
+        q_status(f"Crawl: {stats['pages']}/{frontier.scheduled - 1} pages, {rate:.2f} pages/s, {stats['endpoints']} new endpoints, "
+                 f"{frontier.queue.qsize()} queued", progress=True)
+
+    async def worker():
+        page = await context.new_page() # Each worker reuses one page for its share of the frontier
+        found = [0] # New endpoints attributed to the page's current URL
+        async def on_response(response):
+            if await handle_response(response): found[0] += 1
+        page.on("response", on_response)
+        tracker = None
+        if params.get('adaptive_waits', True):
+            tracker = NetworkQuiescence(params.get('ignore_matcher')); tracker.attach(page)
+        route_changes = track_route_changes(page)
+        try:
+            while True:
+                url, depth = await frontier.queue.get()
+                try:
+                    if not stop_event.is_set(): await visit(page, tracker, route_changes, found, url, depth)
+                except Exception as e: q_log(f"Crawl: error visiting {url}: {e}", level="ERROR", exc_info=True)
+                finally: frontier.queue.task_done()
+        finally:
+            try: await page.close()
+            except PlaywrightError: pass
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, params.get('crawl_concurrency', DEFAULT_CRAWL_CONCURRENCY)))]
+    try:
+        await frontier.queue.join() # Done when every queued page (including ones added while crawling) was visited
+    finally:
+        for task in workers: task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    elapsed = time.monotonic() - crawl_start
+    q_log(f"Crawl finished: {stats['pages']} page(s) in {elapsed:.1f}s ({stats['pages'] / max(elapsed, 1e-6):.2f} pages/s), "
+          f"{stats['endpoints']} new endpoint(s); last {stats['pages_since_new']} page(s) found nothing new.", level="INFO")
+
+
+async def scan_target_async(browser, params: dict, reporter: ScanReporter):
+    """
+    Scans a single target URL in its own BrowserContext on an already-launched browser.
+    The context (and page) are always closed before returning; the browser is left open.
+    """
+    # --- Extract parameters for easier access ---
+    url = params['url']; stop_event = params['stop_event']
+    scrolls = params['scrolls']; scroll_delay = params['scroll_delay']
+    wait_time = params['wait_time']; click_selectors = params['click_selectors']
+    hover_before_click = params['hover_before_click']
+    form_selector = params['form_selector']; form_values_list = params['form_values_list']
+    form_submit = params['form_submit']; form_delay = params['form_delay']
+    wait_strategy = params['wait_strategy']; user_agent = params['user_agent']
+    ignore_matcher = params.get('ignore_matcher')
+    if ignore_matcher is None: ignore_matcher = IgnoreMatcher(params['combined_ignore_list'])
+    allowed_resource_types = params['allowed_resource_types']
+    allowed_status_codes = params['allowed_status_codes']
+    navigation_timeout = params['navigation_timeout']
+    action_timeout = params['action_timeout']
+    use_stealth = params.get('use_stealth', False)
+    blob_store = params.get('blob_store'); inline_body_limit = params.get('inline_body_limit', DEFAULT_INLINE_BODY_LIMIT)
+    quiet_window = params.get('quiet_window', DEFAULT_QUIET_WINDOW); quiet_cap = params.get('quiet_cap', DEFAULT_QUIET_CAP)
+    schema_collector = params.get('schema_collector') # Set while a schema registry is attached to the scan
+    metrics = params.get('metrics') or ScanMetrics() # Shared by all targets of a batch
+    capture_slots = params.get('capture_slots') or CaptureSlots(params.get('capture_concurrency', DEFAULT_CAPTURE_CONCURRENCY), metrics)
+    phases = PhaseClock(metrics.phase_seconds)
+    q_log = reporter.log; q_status = reporter.status
+
+    # --- State Variables ---
+    processed_req_keys = set() # Use set of (method, url) tuples for faster lookups
+    endpoint_registry = EndpointRegistry(DEFAULT_MAX_SAMPLES) if params.get('dedup_templates') else None # Template mode dedup
+    context = None
+    page = None
+    blocker = None
+    quiescence = NetworkQuiescence(ignore_matcher) if params.get('adaptive_waits', True) else None
+    fixed_wait_total = 0.0 # What the fixed delays would have slept (reported when adaptive waits are on)
+
+    async def settle(phase, fixed_delay=0.0, networkidle=False, on_page=None, tracker=None):
+        """
+        Ends a phase: waits for network quiescence (adaptive) or the fixed delay/networkidle wait (legacy).
+        Waits on the target page unless another (crawled) page and its tracker are given.
+        """
+        nonlocal fixed_wait_total
+        fixed_wait_total += fixed_delay
+        if on_page is None: on_page, tracker = page, quiescence
+        with metrics.settle_seconds.time(): # Overlaps the open phase; not a phase of its own
+            if tracker is not None:
+                waited = await tracker.wait_quiet(quiet_window, quiet_cap, stop_event)
+                q_log(f"Network quiet {phase} after {waited:.2f}s.", level="DEBUG")
+                return
+            if networkidle:
+                try: await on_page.wait_for_load_state('networkidle', timeout=action_timeout)
+                except PlaywrightTimeoutError: q_log(f"Timeout waiting network idle {phase}", "WARNING")
+                except PlaywrightError as e: q_log(f"Error waiting {phase}: {e}", "WARNING")
+            if fixed_delay > 0: await asyncio.sleep(fixed_delay)
+
+    # --- Main Async Automation Block ---
+    try:
+        # Check stop event *after* launching browser but *before* context
+        if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped before context creation.")
+
+        q_log("Creating browser context.", level="DEBUG")
+        try:
+            context = await browser.new_context(
+                user_agent=user_agent,
+                viewport={'width': 1920, 'height': 1080}, # Common desktop size
+                java_script_enabled=True,
+                accept_downloads=False, # Don't automatically download files
+                ignore_https_errors=True, # Useful for sites with self-signed certs
+                bypass_csp=True, # Can help scripts load/run, but use cautiously
+                locale="en-US", # Set locale/language
+                timezone_id="America/New_York" # Set timezone
+            )
+            # Set default timeouts for the context
+            context.set_default_navigation_timeout(navigation_timeout)
+            context.set_default_timeout(action_timeout) # Default for actions like click, fill
+            if params.get('block_resources'):
+                # Abort ignored/heavy requests before they are sent instead of dropping their responses later
+                blocker = RouteBlocker(params.get('block_resource_types', ROUTE_BLOCK_DEFAULT_TYPES), ignore_matcher,
+                                       params.get('block_ignored_urls', True), params.get('route_protected_types', ROUTE_PROTECTED_TYPES))
+                await context.route("**/*", blocker.handle)
+                q_log(f"Network blocking on: types {sorted(blocker.block_types)}, ignore-list matches {'on' if blocker.block_ignored else 'off'}.", level="DEBUG")
+            page = await context.new_page()
+            q_log(f"Browser context and page created.", level="DEBUG")
+        except Exception as context_err:
+             q_log(f"Failed to create browser context or page: {context_err}", level="CRITICAL", exc_info=True)
+             reporter.put({'type': 'error', 'message': f"Context/Page Error: {context_err}"})
+             return
+
+        # Apply stealth patches if enabled (requires playwright-stealth installed)
+        if use_stealth:
+             try:
+                 from playwright_stealth import stealth_async
+                 q_log("Applying playwright-stealth patches...", level="DEBUG")
+                 await stealth_async(page) # Note: stealth often modifies the page object
+                 q_log("Stealth patches applied.", level="DEBUG")
+             except ImportError: q_log("playwright-stealth not installed. Skipping stealth.", level="WARNING")
+             except Exception as stealth_err: q_log(f"Could not apply stealth: {stealth_err}", level="WARNING")
+
+
+        async def observe_schema(request, response):
+            """ Feeds a call that is not recorded again (template mode hit) to schema inference, while its endpoint still wants samples. """
+            content_type = response.headers.get('content-type', '')
+            if 'json' not in content_type.lower() or not schema_collector.wants(request.method, request.url, response.status): return
+            try: body = await response.body()
+            except PlaywrightError: return
+            if len(body) > SCHEMA_BODY_LIMIT: return
+            schema_collector.submit(ApiRecord(request.method, request.url, response.status, content_type,
+                                              {'content-type': request.headers.get('content-type', '')}, request.post_data_buffer, None, body))
+
+        # --- Response Handler ---
+        async def handle_response(response):
+            """ Callback function executed for each network response. """
+            # Check stop event frequently inside the handler
+            if stop_event.is_set(): return
+
+            request = response.request # Define request early for logging
+            req_url = "unknown_request_url" # Default for logging if request is invalid
+            handler_start = time.perf_counter()
+            try:
+                # Basic check if request/response objects are valid
+                if not request or not response: return
+
+                req_url = request.url; req_method = request.method
+                if endpoint_registry is not None:
+                    # Template mode: /items/1 ... /items/50000 are one endpoint; later calls only bump its hit count
+                    req_key = endpoint_template(req_method, req_url)
+                else:
+                    # Use tuple key for faster lookups in the processed set
+                    req_key = (req_method, req_url)
+                    if req_key in processed_req_keys:
+                        # q_log(f"Skipping already processed: {req_method} {req_url}", "DEBUG")
+                        metrics.responses.inc(outcome="duplicate")
+                        return # Already processed this exact request/URL pair
+
+                # Perform the check using parameters passed to the main function (template hits too: a
+                # known endpoint's 404s or ignored URLs must not count as hits or samples)
+                is_api, rule = api_call_verdict(request, response, ignore_matcher, allowed_resource_types, allowed_status_codes)
+                metrics.filter_verdicts.inc(rule=rule, accepted="true" if is_api else "false")
+                if not is_api: metrics.responses.inc(outcome="filtered")
+                elif endpoint_registry is not None and req_key in endpoint_registry:
+                    stats, sample_added = endpoint_registry.hit(req_key, req_url)
+                    reporter.put({'type': 'api_hit', 'key': req_key, 'hits': stats.hits, 'url': req_url if sample_added else None})
+                    metrics.responses.inc(outcome="template_hit")
+                    if schema_collector is not None: await observe_schema(request, response)
+                else:
+                    # Mark as processed *after* passing the check
+                    if endpoint_registry is not None: endpoint_registry.add(req_key, req_url)
+                    else: processed_req_keys.add(req_key)
+
+                    # --- Gather Details (best effort), at most capture_concurrency at a time ---
+                    async with capture_slots.slot():
+                        response_body_bytes, response_headers, request_headers, request_body_bytes = await fetch_response_details(
+                            request, response, q_log, metrics)
+                        body_size = len(response_body_bytes) if response_body_bytes else 0
+                        record_args = (req_method, req_url, response.status, request_headers, request_body_bytes, response_headers, response_body_bytes)
+                        record_fields = dict(
+                            blob_store=blob_store, inline_body_limit=inline_body_limit,
+                            template=req_key if endpoint_registry is not None else None, # GUI keys rows on the template
+                            samples=[req_url] if endpoint_registry is not None else None,
+                            target=reporter.target) # Which batch target produced this call (batch mode)
+                        # Compact record for the queue: raw bytes, packed headers, snippet formatted only when displayed.
+                        # Spilling a large body (sha256 + write) runs on a worker thread; small records are built in place.
+                        if blob_store is not None and body_size > inline_body_limit:
+                            api_details, note = await asyncio.to_thread(build_api_record, *record_args, **record_fields)
+                        else:
+                            api_details, note = build_api_record(*record_args, **record_fields)
+                    if note: q_log(*note)
+                    if body_size: metrics.captured_bytes.inc(body_size, storage="blob" if api_details.response_body_blob else "inline")
+                    if schema_collector is not None: schema_collector.submit(api_details) # Parsed/merged on the collector thread
+                    # Put the found API details onto the queue for the GUI thread
+                    if reporter.put({'type': 'api_found', 'data': api_details}):
+                        metrics.responses.inc(outcome="accepted")
+                        q_log(f"API Found: {req_method} {req_url} ({response.status})", level="SUCCESS") # Log success via queue
+                        return True # New endpoint (crawl mode counts these per page)
+                    else:
+                        metrics.responses.inc(outcome="dropped")
+                        q_log(f"Warning: Result queue full. Dropping API data for {req_url}", "WARNING")
+
+
+            except Exception as e:
+                # Log errors occurring within the handler itself
+                metrics.responses.inc(outcome="error")
+                url_for_log = req_url if 'req_url' in locals() and req_url != "unknown_request_url" else response.url if response else "unknown URL"
+                q_log(f"Error processing response {url_for_log}: {e}", level="ERROR", exc_info=True)
+            finally:
+                metrics.handler_seconds.observe(time.perf_counter() - handler_start)
+
+        # --- Attach Event Handlers ---
+        page.on("response", handle_response)
+        if quiescence is not None: quiescence.attach(page) # In-flight tracking for adaptive waits
+        seed_routes = track_route_changes(page) if params.get('crawl') else None # SPA routes feed the crawl frontier
+        # Optional: Add other handlers if needed for deep debugging
+        # page.on("request", lambda request: q_log(f">> REQ: {request.method} {request.resource_type} {request.url}", "DEBUG"))
+        # page.on("framenavigated", lambda frame: q_log(f"Frame Nav: {frame.url}", "DEBUG"))
+        # page.on("load", lambda: q_log("Page Load event fired", "DEBUG"))
+        # page.on("domcontentloaded", lambda: q_log("DOM Content Loaded event fired", "DEBUG"))
+        # page.on("console", lambda msg: q_log(f"CONSOLE ({msg.type()}): {msg.text()}", "DEBUG"))
+        # page.on("pageerror", lambda exc: q_log(f"PAGE ERROR: {exc}", "ERROR"))
+
+        # --- Initial Navigation ---
+        q_log(f"Navigating to {url} [UA: {user_agent[:50]}...]", level="INFO")
+        phases.enter("load")
+        try:
+            q_status(f"Loading page (wait: {wait_strategy}, timeout: {navigation_timeout}ms)...", progress=True)
+            await page.goto(url, wait_until=wait_strategy) # Uses context default timeout
+            q_status("Page loaded. Waiting for network to settle..." if quiescence else f"Page loaded. Initial wait {wait_time}s...", progress=True)
+            await settle("after load", wait_time) # Initial settle time after load
+        except PlaywrightTimeoutError as e: q_log(f"Navigation timeout for {url}: {e}", level="ERROR")
+        except PlaywrightError as e: q_log(f"Navigation/load error for {url}: {e}", level="ERROR")
+        except Exception as e: q_log(f"Unexpected error during page load for {url}: {e}", level="ERROR", exc_info=True)
+        # Check stop event after initial load attempt
+        if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped during initial load.")
+
+        # --- Interaction Phase ---
+        q_status("Performing interactions...", progress=True)
+        interactions_performed = 0
+
+        # Form Interactions
+        if form_selector and form_values_list:
+            phases.enter("forms")
+            q_log(f"Attempting form input on '{form_selector}'...", level="INFO")
+            for i, form_value in enumerate(form_values_list):
+                if stop_event.is_set(): break # Check stop event between inputs
+                q_log(f"Form Input {i+1}/{len(form_values_list)}: Filling '{form_selector}' with '{form_value[:30]}...'")
+                try:
+                    form_input = page.locator(form_selector).first # Target the first match
+                    await form_input.scroll_into_view_if_needed(timeout=action_timeout // 2) # Ensure visible first
+                    await form_input.fill(form_value, timeout=action_timeout) # Use context default
+                    interactions_performed += 1
+                    await asyncio.sleep(0.1 + random.uniform(0, 0.2)) # Tiny delay after fill
+
+                    if form_submit:
+                        q_log(f"Submitting form via Enter key on '{form_selector}'")
+                        await form_input.press("Enter", delay=random.uniform(100, 300))
+                        interactions_performed += 1
+                        q_status(f"Waiting after submit {i+1} ({'adaptive' if quiescence else 'networkidle'})...", progress=True)
+                        # Wait for network to likely settle after submission (plus the delay between inputs)
+                        await settle("after form submit", form_delay + random.uniform(0, 0.5), networkidle=True)
+                    else:
+                        # Wait specified delay between form submissions/inputs
+                        await settle("after form input", form_delay + random.uniform(0, 0.5))
+                except PlaywrightTimeoutError as e: q_log(f"Timeout interacting with form '{form_selector}' for value '{form_value[:30]}...': {e}", level="WARNING")
+                except PlaywrightError as e: q_log(f"Playwright error on form '{form_selector}': {e}", level="WARNING")
+                except Exception as e: q_log(f"Unexpected error during form interaction '{form_selector}': {e}", level="ERROR", exc_info=True)
+            # Wait after completing all form interactions
+            if interactions_performed > 0 and not stop_event.is_set():
+                q_status("Form input phase finished. Waiting...", progress=True);
+                await settle("after form input phase", wait_time) # Wait specified time after all form fills
+
+        # Check stop event
+        if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after form input.")
+
+        # Click Interactions
+        if click_selectors:
+            phases.enter("clicks")
+            q_log(f"Attempting clicks based on {len(click_selectors)} selector(s)...", level="INFO")
+            clicks_done_in_phase = 0
+            for selector in click_selectors:
+                 if stop_event.is_set(): break # Check stop event between clicks
+                 q_log(f"Attempting click: {selector}", level="DEBUG")
+                 try:
+                     elements = page.locator(selector)
+                     count = await elements.count()
+                     if count == 0:
+                         q_log(f"No elements found for click selector: {selector}", level="DEBUG")
+                         continue
+
+                     # Try to click the first visible, enabled element
+                     element_to_click = None
+                     # Check first few matches for visibility/enabled state
+                     for i in range(min(count, 5)): # Limit checks for performance
+                         el = elements.nth(i)
+                         try:
+                             if await el.is_visible() and await el.is_enabled():
+                                element_to_click = el
+                                break
+                         except PlaywrightError as vis_err:
+                             q_log(f"Error checking visibility/enabled for {selector} nth({i}): {vis_err}", level="DEBUG")
+                             continue # Try next element
+
+                     if element_to_click:
+                        q_log(f"Found visible/enabled element for {selector}. Attempting click.", level="DEBUG")
+                        await element_to_click.scroll_into_view_if_needed(timeout=action_timeout // 2)
+                        if hover_before_click:
+                            q_log(f"Hovering over {selector}", level="DEBUG")
+                            try:
+                                await element_to_click.hover(timeout=action_timeout // 3) # Shorter hover timeout
+                                await asyncio.sleep(0.2 + random.uniform(0, 0.3)) # Short pause after hover
+                            except PlaywrightError as hover_err: q_log(f"Hover failed for {selector}: {hover_err}", level="WARNING")
+
+                        # Perform the click with slight random delay
+                        await element_to_click.click(delay=random.uniform(50, 200), timeout=action_timeout)
+                        q_log(f"Clicked element matching {selector}", level="INFO")
+                        clicks_done_in_phase += 1
+                        interactions_performed += 1
+                        # Wait after click to allow potential async operations (until quiet in adaptive mode)
+                        await settle(f"after clicking {selector}", 1.0 + random.uniform(0, 0.5))
+
+                     else: q_log(f"No visible/enabled element found for click selector: {selector}", level="DEBUG")
+
+                 except PlaywrightTimeoutError as e: q_log(f"Timeout clicking {selector}: {e}", level="WARNING")
+                 except PlaywrightError as e: q_log(f"Playwright error clicking {selector}: {e}", level="WARNING")
+                 except Exception as e_click: q_log(f"Unexpected error clicking {selector}: {e_click}", level="ERROR", exc_info=True)
+
+            # Wait after completing all click interactions if any were performed
+            if clicks_done_in_phase > 0 and not stop_event.is_set():
+                 q_status("Click phase finished. Waiting for network...", progress=True)
+                 await settle("after clicks", wait_time, networkidle=True)
+
+        # Check stop event
+        if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after clicks.")
+
+        # Scroll Interactions
+        if scrolls > 0:
+            phases.enter("scrolls")
+            q_log(f"Performing {scrolls} scroll(s)...", level="INFO")
+            for i in range(scrolls):
+                if stop_event.is_set(): break # Check stop event between scrolls
+                q_log(f"Scroll {i+1}/{scrolls}", level="DEBUG")
+                try:
+                     # Scroll down the page using JavaScript
+                     await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
+                     interactions_performed += 1
+                     # Wait specified delay between scrolls (until lazy loads finish in adaptive mode)
+                     await settle(f"after scroll {i+1}", scroll_delay + random.uniform(0, 0.2))
+                except PlaywrightError as e: q_log(f"Error during scroll {i+1}: {e}", level="WARNING")
+                except Exception as e: q_log(f"Unexpected error during scroll {i+1}: {e}", level="ERROR", exc_info=True)
+
+            # Wait after completing all scrolls
+            if scrolls > 0 and not stop_event.is_set():
+                q_status("Scrolling finished. Waiting for network...", progress=True)
+                await settle("after scroll", wait_time, networkidle=True) # Final wait after scrolling phase
+
+        # --- Final Wait & Cleanup ---
+        if interactions_performed > 0: q_log("Interaction phase complete.", level="INFO")
+        else: q_log("No interactions were performed based on settings.", level="INFO")
+
+        if not stop_event.is_set():
+            phases.enter("final_wait")
+            if quiescence is None: q_log("Allowing final 5s for network settlement before closing...", level="DEBUG")
+            await settle("before closing", 5.0) # Extra final wait
+            if quiescence is not None:
+                q_log(f"Adaptive waits: {quiescence.phases} phase(s) settled in {quiescence.seconds_waited:.1f}s "
+                      f"(fixed delays alone: {fixed_wait_total:.1f}s).", level="DEBUG")
+
+        if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after interactions.")
+        if params.get('crawl'):
+            phases.enter("crawl")
+            await crawl_same_origin(context, page, seed_routes, params, reporter, handle_response, settle)
+            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped during crawl.")
+        q_log("Async discovery phase complete.", level="INFO")
+
+    # --- Exception Handling for the entire async block ---
+    except asyncio.CancelledError:
+         if not stop_event.is_set():
+             raise # Cancelled from outside (e.g. batch target timeout), let the caller handle it
+         q_log("Scan process was stopped by user signal.", level="WARNING")
+         # Results collected so far are already in the queue
+
+    except PlaywrightError as e:
+        # Log Playwright-specific errors that weren't caught deeper
+        q_log(f"A Playwright error occurred: {e}", level="ERROR", exc_info=True)
+        reporter.put({'type': 'error', 'message': f"Playwright Error: {e}"})
+
+    except Exception as e:
+        # Log any other unexpected errors
+        q_log(f"An unexpected error occurred during the scan: {e}", level="CRITICAL", exc_info=True)
+        reporter.put({'type': 'error', 'message': f"Unexpected Scan Error: {e}"})
+
+    # --- Cleanup ---
+    finally:
+        phases.close()
+        if blocker:
+            stats = blocker.summary()
+            by_type = ", ".join(f"{t}: {n}" for t, n in sorted(stats['blocked_by_type'].items())) or "none"
+            q_log(f"Network blocking avoided {stats['requests_blocked']}/{stats['requests_seen']} requests "
+                  f"(~{stats['bytes_avoided_estimate'] / 1024:.0f} KB est.) [{by_type}]", level="INFO")
+            reporter.put({'type': 'route_stats', 'stats': stats})
+        q_log("Closing browser context.", level="DEBUG")
+        # Close page and context safely (the browser belongs to the caller)
+        if page:
+             try: await page.close()
+             except Exception as e: q_log(f"Error closing page: {e}", "DEBUG")
+        if context:
+            try: await context.close()
+            except Exception as e: q_log(f"Error closing context: {e}", "DEBUG")
+
+
+@contextlib.asynccontextmanager
+async def scan_browser(params: dict, reporter: ScanReporter):
+    """
+    Yields the browser a scan runs on: borrowed from the warm ScanRuntime pool when
+    params['runtime'] is set, otherwise launched for this scan and closed afterwards.
+    Yields None if no browser could be obtained (the error is already reported).
+    """
+    runtime = params.get('runtime')
+    if runtime:
+        browser = await runtime.acquire(params['proxy_config'], reporter)
+        try:
+            yield browser
+        finally:
+            if browser: await runtime.release(browser)
+        return
+
+    async with async_playwright() as p:
+        browser = await launch_browser(p, params['proxy_config'], reporter)
+        try:
+            yield browser
+        finally:
+            if browser:
+                reporter.log("Closing browser.", level="INFO")
+                try:
+                    await browser.close()
+                    reporter.log("Browser closed.", level="INFO")
+                except Exception as e: reporter.log(f"Error closing browser: {e}", "DEBUG")
+
+
+async def discover_apis_async(params: dict):
+    """ The core Playwright automation logic running in the worker thread (single target). """
+    reporter = ScanReporter(params['queue'], journal=params.get('journal'), notify=params.get('notify'), metrics=params.get('metrics'), store=params.get('store'))
+    try:
+        async with scan_browser(params, reporter) as browser:
+            if not browser: return # Critical error, cannot proceed
+            await scan_target_async(browser, params, reporter)
+    except Exception as e:
+        reporter.log(f"An unexpected error occurred during the scan: {e}", level="CRITICAL", exc_info=True)
+        reporter.put({'type': 'error', 'message': f"Unexpected Scan Error: {e}"})
+    finally:
+        reporter.log("Async function finished.", level="DEBUG")
+
+
+async def discover_apis_batch_async(params: dict):
+    """
+    Scans every URL in params['targets'] on one shared browser, running up to
+    params['concurrency'] targets at once. Each target gets its own BrowserContext and
+    is abandoned once params['target_timeout'] seconds have passed (0 = no limit).
+    """
+    targets = params['targets']; stop_event = params['stop_event']
+    concurrency = max(1, int(params.get('concurrency') or 1))
+    target_timeout = params.get('target_timeout') or None # None disables the per-target budget
+    reporter = ScanReporter(params['queue'], journal=params.get('journal'), notify=params.get('notify'), metrics=params.get('metrics'), store=params.get('store'))
+    total = len(targets)
+    finished_count = 0
+
+    async def run_target(browser, semaphore, target):
+        """ Runs one target under the concurrency limit and timeout budget. """
+        nonlocal finished_count
+        async with semaphore:
+            if stop_event.is_set(): return
+            target_reporter = ScanReporter(params['queue'], target=target, journal=params.get('journal'), notify=params.get('notify'), metrics=params.get('metrics'), store=params.get('store'))
+            outcome = "done"
+            try:
+                await asyncio.wait_for(scan_target_async(browser, dict(params, url=target), target_reporter), timeout=target_timeout)
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                target_reporter.log(f"Per-target timeout ({target_timeout}s) reached. Moving on.", level="WARNING")
+            except Exception as e:
+                outcome = "error"
+                target_reporter.log(f"Target scan failed: {e}", level="ERROR", exc_info=True)
+            finished_count += 1
+            reporter.put({'type': 'target_done', 'target': target, 'outcome': outcome, 'done': finished_count, 'total': total})
+            reporter.status(f"Batch: {finished_count}/{total} targets done (concurrency {concurrency}).", progress=finished_count < total)
+
+    try:
+        async with scan_browser(params, reporter) as browser:
+            if not browser: return # Critical error, cannot proceed
+            reporter.log(f"Batch scan of {total} target(s), {concurrency} at a time.", level="INFO")
+            semaphore = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(run_target(browser, semaphore, target) for target in targets))
+        if stop_event.is_set():
+            reporter.log(f"Batch stopped by user after {finished_count}/{total} target(s).", level="WARNING")
+        else:
+            reporter.log(f"Batch discovery complete: {total} target(s) scanned.", level="INFO")
+    except Exception as e:
+        reporter.log(f"An unexpected error occurred during the batch scan: {e}", level="CRITICAL", exc_info=True)
+        reporter.put({'type': 'error', 'message': f"Unexpected Batch Error: {e}"})
+
+
+def playwright_children_rss_mb():
+    """ Total RSS (MB) of this process's children (Playwright driver + browsers). None if psutil is missing. """
+    try:
+        import psutil # Optional dependency, only needed for RSS-based browser recycling
+    except ImportError:
+        return None
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try: total += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied): pass
+    return total / (1024 * 1024)
+
+
+class ScanRuntime:
+    """
+    Long-lived background runtime: one event loop thread, one Playwright driver and a
+    pool of warm Chromium browsers (keyed by proxy config) shared across scans, so a
+    new scan only pays for a fresh BrowserContext.
+
+    Browsers are health-checked before reuse and recycled after `max_scans_per_browser`
+    scans or once the browser processes use more than `max_rss_mb` MB (needs psutil).
+    """
+    def __init__(self, pool_size=2, max_scans_per_browser=50, max_rss_mb=2048, health_interval=30.0):
+        self.pool_size = pool_size # Max idle browsers kept per proxy config
+        self.max_scans_per_browser = max_scans_per_browser
+        self.max_rss_mb = max_rss_mb
+        self.health_interval = health_interval
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._start_error = None
+        self._playwright = None
+        self._idle = {} # proxy key -> list of idle browsers
+        self._browser_info = {} # id(browser) -> {'key', 'scans'}
+        self._recycle_all = False # Set when RSS limit is exceeded; leased browsers are closed on release
+        # --- Stats ---
+        self.driver_start_seconds = 0.0
+        self.launches = 0
+        self.launch_seconds_total = 0.0
+        self.reuses = 0
+        self.recycled = 0
+        self.scans = 0
+
+    # --- Thread-side API (called from scan/GUI threads) ---
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive() and self._loop and self._loop.is_running())
+
+    def start(self, timeout=60):
+        """ Starts the runtime thread and Playwright driver (blocking until ready). """
+        if self.is_running(): return
+        self._ready.clear()
+        self._start_error = None
+        self._thread = threading.Thread(target=self._run_loop, name="viper-runtime", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Scan runtime did not start in time.")
+        if self._start_error:
+            raise RuntimeError(f"Scan runtime failed to start: {self._start_error}")
+
+    def run(self, coro):
+        """ Runs a coroutine on the runtime loop and blocks the calling thread until it finishes. """
+        self.start()
+        self.scans += 1
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def prewarm(self, proxy_config=None, count=None):
+        """ Launches browsers up to `count` (default pool_size) idle ones for the proxy config, blocking. """
+        self.start()
+        asyncio.run_coroutine_threadsafe(self._prewarm(proxy_config, count or self.pool_size), self._loop).result()
+
+    def shutdown(self, timeout=15):
+        """ Closes all browsers, stops Playwright and the loop thread. """
+        if not self.is_running(): return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+
+    def stats(self):
+        """ Snapshot of pool counters, including the launch/startup time saved by reuse. """
+        avg_launch = self.launch_seconds_total / self.launches if self.launches else 0.0
+        # Every reuse skips a browser launch; every scan after the first skips loop + driver startup
+        saved = self.reuses * avg_launch + max(0, self.scans - 1) * self.driver_start_seconds
+        return {
+            'running': self.is_running(), 'scans': self.scans, 'launches': self.launches,
+            'reuses': self.reuses, 'recycled': self.recycled,
+            'idle': sum(len(v) for v in self._idle.values()),
+            'avg_launch_seconds': round(avg_launch, 3),
+            'driver_start_seconds': round(self.driver_start_seconds, 3),
+            'seconds_saved': round(saved, 2),
+        }
+
+    # --- Loop-side implementation ---
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            t0 = time.perf_counter()
+            self._playwright = loop.run_until_complete(async_playwright().start())
+            self.driver_start_seconds = time.perf_counter() - t0
+        except Exception as e:
+            self._start_error = e
+            self._ready.set()
+            loop.close()
+            return
+        health_task = loop.create_task(self._health_loop())
+        loop.call_soon(self._ready.set)
+        try:
+            loop.run_forever()
+        finally:
+            health_task.cancel()
+            try:
+                loop.run_until_complete(self._close_all())
+                loop.run_until_complete(self._playwright.stop())
+            except Exception as e:
+                log.debug(f"Error shutting down scan runtime: {e}")
+            loop.close()
+            self._playwright = None
+
+    @staticmethod
+    def _proxy_key(proxy_config):
+        return json.dumps(proxy_config, sort_keys=True) if proxy_config else ""
+
+    async def _launch(self, proxy_config, reporter):
+        t0 = time.perf_counter()
+        browser = await launch_browser(self._playwright, proxy_config, reporter)
+        if browser:
+            self.launches += 1
+            self.launch_seconds_total += time.perf_counter() - t0
+            self._browser_info[id(browser)] = {'key': self._proxy_key(proxy_config), 'scans': 0}
+        return browser
+
+    async def _prewarm(self, proxy_config, count):
+        idle = self._idle.setdefault(self._proxy_key(proxy_config), [])
+        reporter = ScanReporter(queue.Queue()) # Prewarm has no scan to report to
+        while len(idle) < count:
+            browser = await self._launch(proxy_config, reporter)
+            if not browser: break
+            idle.append(browser)
+
+    async def _discard(self, browser):
+        self._browser_info.pop(id(browser), None)
+        try: await browser.close()
+        except Exception as e: log.debug(f"Error closing pooled browser: {e}")
+
+    async def acquire(self, proxy_config, reporter):
+        """ Returns a healthy idle browser for the proxy config, launching one if none is available. """
+        idle = self._idle.setdefault(self._proxy_key(proxy_config), [])
+        while idle:
+            browser = idle.pop()
+            if browser.is_connected(): # Health check before reuse
+                self.reuses += 1
+                reporter.log(f"Reusing warm browser (launches so far: {self.launches}, reuses: {self.reuses}).", level="DEBUG")
+                return browser
+            reporter.log("Discarding disconnected pooled browser.", level="DEBUG")
+            await self._discard(browser)
+        return await self._launch(proxy_config, reporter)
+
+    async def release(self, browser):
+        """ Returns a browser to the pool, or closes it if it is due for recycling. """
+        info = self._browser_info.get(id(browser))
+        if info is None:
+            await self._discard(browser)
+            return
+        info['scans'] += 1
+        idle = self._idle.setdefault(info['key'], [])
+        if (self._recycle_all or info['scans'] >= self.max_scans_per_browser
+                or not browser.is_connected() or len(idle) >= self.pool_size):
+            if info['scans'] >= self.max_scans_per_browser or self._recycle_all: self.recycled += 1
+            await self._discard(browser)
+        else:
+            idle.append(browser)
+        if self._recycle_all and not self._browser_info:
+            self._recycle_all = False # Every browser from before the RSS spike is gone
+
+    async def _health_loop(self):
+        """ Periodically drops dead idle browsers and recycles everything once RSS is over the limit. """
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for key, idle in self._idle.items():
+                for browser in [b for b in idle if not b.is_connected()]:
+                    idle.remove(browser)
+                    await self._discard(browser)
+            rss_mb = playwright_children_rss_mb()
+            if rss_mb is not None and self.max_rss_mb and rss_mb > self.max_rss_mb:
+                log.info(f"Browser RSS {rss_mb:.0f} MB exceeds {self.max_rss_mb} MB. Recycling pooled browsers.")
+                self._recycle_all = True
+                for idle in self._idle.values():
+                    while idle:
+                        self.recycled += 1
+                        await self._discard(idle.pop())
+
+    async def _close_all(self):
+        for idle in self._idle.values():
+            while idle:
+                await self._discard(idle.pop())
+
+
+def open_result_store(params: dict):
+    """ Opens the scan's StoreWriter (params['store_path']) and stores it in params['store']. """
+    params['store'] = None
+    if not params.get('store_path'): return None
+    try:
+        params['store'] = StoreWriter(params['store_path'], notify=params.get('notify'))
+        log.debug(f"Writing results to store {params['store_path']}")
+    except Exception as e: # sqlite3.Error, or a store from a newer version
+        try: params['queue'].put_nowait({'type': 'log', 'level': 'WARNING', 'message': f"Could not open result store {params['store_path']}: {e}"})
+        except queue.Full: pass
+    return params['store']
+
+
+def open_result_journal(params: dict):
+    """ Opens the scan's NDJSON journal (params['journal_path']) and stores it in params['journal']. """
+    params['journal'] = None
+    if not params.get('journal_path'): return None
+    try:
+        params['journal'] = JournalWriter(params['journal_path'])
+        log.debug(f"Writing results to journal {params['journal_path']}")
+    except OSError as e:
+        try: params['queue'].put_nowait({'type': 'log', 'level': 'WARNING', 'message': f"Could not open result journal {params['journal_path']}: {e}"})
+        except queue.Full: pass
+    return params['journal']
+
+
+def run_playwright_discover_thread(params: dict):
+    """ Wrapper function to run the async Playwright logic in a separate thread. """
+    queue = params['queue']
+    stop_event = params['stop_event']
+    # A non-empty target list switches to batch mode on a shared browser
+    discover = discover_apis_batch_async if params.get('targets') else discover_apis_async
+    try:
+        journal = open_result_journal(params)
+        store = open_result_store(params)
+        schema_registry = params.get('schema_registry')
+        params['schema_collector'] = SchemaCollector(schema_registry) if schema_registry is not None else None
+        try:
+            runtime = params.get('runtime')
+            if runtime:
+                # Warm mode: run on the long-lived runtime loop and its browser pool
+                runtime.run(discover(params))
+            else:
+                # Create a new event loop for this thread
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                # Run the main async function until it completes or is cancelled
+                loop.run_until_complete(discover(params))
+                loop.close() # Clean up the loop
+        finally:
+            if journal:
+                journal.close() # Everything is on disk before 'finished' is sent
+                params['journal'] = None
+                log.debug(f"Result journal closed: {journal.records_written} line(s), {journal.fsyncs} fsync(s), {journal.errors} error(s).")
+            if store:
+                store.close() # Every result is committed before 'finished' is sent
+                params['store'] = None
+                log.debug(f"Result store closed: {store.rows_written} row(s), {store.commits} commit(s), {store.errors} error(s).")
+            if params['schema_collector']:
+                params['schema_collector'].close() # Schemas are complete before 'finished' is sent
+                log.debug(f"Schema inference: {len(schema_registry)} endpoint(s), {schema_registry.bodies_merged} JSON bodies merged, {params['schema_collector'].dropped} dropped.")
+                params['schema_collector'] = None
+            if params.get('metrics') and params.get('metrics_path'):
+                write_scan_metrics(params['metrics'], params['metrics_path'], queue)
+
+        # Check if the scan was stopped *before* sending the final finished message
+        if not stop_event.is_set():
+            # Send a 'finished' message if the scan completed normally
+            try: queue.put_nowait({'type': 'finished', 'message': f"Scan finished. Check results table."})
+            except queue.Full: log.warning("Result queue full, couldn't send 'finished' message.")
+        else:
+             # Send appropriate message if stopped by user
+             try: queue.put_nowait({'type': 'finished', 'message': f"Scan stopped by user. Check results table."})
+             except queue.Full: log.warning("Result queue full, couldn't send 'stopped' message.")
+
+
+    except Exception as e:
+        # Log the error in the main thread's logger as well for visibility
+        log.exception("Error in worker thread execution")
+        # Send error message to the GUI queue
+        try: queue.put_nowait({'type': 'error', 'message': f"Worker thread error: {e}"})
+        except queue.Full: pass
+
+
+def write_scan_metrics(metrics, filename, queue):
+    """ Dumps a ScanMetrics snapshot to a JSON file. Logs messages via the queue. """
+    try:
+        metrics.write_json(filename)
+        message = {'type': 'log', 'level': 'INFO', 'message': f"Scan metrics saved to {filename}"}
+    except (OSError, TypeError, ValueError) as e:
+        message = {'type': 'log', 'level': 'ERROR', 'message': f"Error writing scan metrics to {filename}: {e}"}
+    try: queue.put_nowait(message)
+    except Exception: pass # Full queue: the metrics file itself is what matters
+
+
+def save_results_gui(apis_data_dict, filename, queue):
+    """ Saves the provided API data dictionary to a JSON file. Logs messages via the queue. """
+    if not apis_data_dict:
+        try: queue.put_nowait({'type': 'log', 'level': 'WARNING', 'message': "No API data provided to save."})
+        except queue.Full: pass
+        return
+
+    try:
+        with open_export_file(filename) as f: # gzip for a .gz name
+            # Written one record at a time; bytes are encoded and the live records are not modified
+            write_json_records(f, apis_data_dict.values())
+        # Log success via queue
+        try: queue.put_nowait({'type': 'log', 'level': 'SUCCESS', 'message': f"API details saved to {filename}"})
+        except queue.Full: pass
+    except IOError as e:
+        try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Error writing results to {filename}: {e}"})
+        except queue.Full: pass
+    except TypeError as e:
+         # This might happen if data isn't JSON serializable (e.g., raw bytes left somehow)
+         try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Error serializing results to JSON: {e}"})
+         except queue.Full: pass
+    except Exception as e:
+        try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Unexpected error saving results: {e}"})
+        except queue.Full: pass
+
+
+def save_journal_results(journal_path, filename, queue, query=None):
+    """ Saves a scan's results (those matching `query`, if given) to a JSON file by streaming its NDJSON journal (safe to run off the GUI thread). """
+    try:
+        count = export_json_from_journal(journal_path, filename, query=query)
+        if count: message = {'type': 'log', 'level': 'SUCCESS', 'message': f"API details saved to {filename} ({count} from journal {journal_path})"}
+        else: message = {'type': 'log', 'level': 'WARNING', 'message': f"No API data in journal {journal_path} to save."}
+    except OSError as e:
+        message = {'type': 'log', 'level': 'ERROR', 'message': f"Error writing results from journal to {filename}: {e}"}
+    except Exception as e:
+        message = {'type': 'log', 'level': 'ERROR', 'message': f"Unexpected error saving results from journal: {e}"}
+    queue.put(message)
+    return message['level'] == 'SUCCESS'
+
+
+def save_openapi_spec(schema_registry, filename, queue, title=None):
+    """ Writes the OpenAPI 3 document inferred so far (viper_schema.SchemaRegistry) to a JSON file. """
+    try:
+        spec = schema_registry.to_openapi(title=title or f"{TOOL_NAME} inferred API")
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(spec, f, indent=2, ensure_ascii=False)
+        if spec['paths']: message = {'type': 'log', 'level': 'SUCCESS', 'message': f"OpenAPI spec with {len(spec['paths'])} path(s) saved to {filename}"}
+        else: message = {'type': 'log', 'level': 'WARNING', 'message': f"No endpoints inferred yet; wrote an empty OpenAPI spec to {filename}"}
+    except OSError as e:
+        message = {'type': 'log', 'level': 'ERROR', 'message': f"Error writing OpenAPI spec to {filename}: {e}"}
+    queue.put(message)
+    return message['level'] != 'ERROR'
+
+
+
+def run_scan(params: dict, on_message=None):
+    """
+    Library entry point: runs a scan (single or batch) to completion in a worker thread
+    and returns {api_key: ApiRecord} for every API found, deduplicated like the GUI.
+    `on_message` is called on the calling thread for every queue message (logs, status, ...).
+    KeyboardInterrupt sets the stop event and waits for the worker to clean up.
+    """
+    result_queue = params['queue']
+    results = {}
+    worker = threading.Thread(target=run_playwright_discover_thread, args=(params,), daemon=True)
+    worker.start()
+    while True:
+        try:
+            try:
+                message = result_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not worker.is_alive() and result_queue.empty(): break
+                continue
+            if message.get('type') == 'api_found' and message.get('data'):
+                results.setdefault(message['data'].key, message['data'])
+            elif message.get('type') == 'api_hit':
+                apply_api_hit(results, message)
+            if on_message: on_message(message)
+        except KeyboardInterrupt:
+            log.warning(">>> Stop signal sent by user <<<")
+            params['stop_event'].set()
+    return results
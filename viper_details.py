@@ -0,0 +1,185 @@
+"""
+Viper API Interceptor - rendering of the details panes, off the GUI thread.
+
+Selecting a row used to decode, json.loads and json.dumps(indent=2) the whole response body
+and insert the result into a textbox, all on the Tk thread, so a multi-MB JSON body froze the
+window on every click. Here:
+
+  * render_details() turns a record into display text (headers, bodies, snippet) and never
+    touches Tk;
+  * DetailRenderer runs it on one worker thread. Only the newest selection is rendered:
+    a job that was superseded while it waited is skipped, and one superseded while it ran
+    is discarded, so arrow-keying through the table never queues up work. Small inline bodies
+    (DETAIL_SYNC_BYTES) are rendered directly by the GUI;
+  * DetailCache keeps the last rendered views (LRU, bounded by entries and characters), so
+    going back to a row shows it at once;
+  * the GUI shows long bodies one DETAIL_PAGE_CHARS page at a time ("Load more").
+"""
+import base64
+import json
+import logging
+import queue
+import threading
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+DETAIL_BODY_LIMIT = 1024 * 1024 # Max bytes of a response body loaded into the details pane
+DETAIL_SYNC_BYTES = 16 * 1024 # Inline bodies up to this size are cheap enough to render on the GUI thread
+DETAIL_PAGE_CHARS = 64 * 1024 # Characters inserted into a details textbox at a time
+DETAIL_CACHE_ENTRIES = 64 # Rendered views kept for quick re-selection
+DETAIL_CACHE_CHARS = 32 * 1024 * 1024 # ... and at most this many characters of body text in total
+TEXT_SUBTYPES = ('xml', 'javascript', 'html')
+
+
+class DetailView:
+    """ Display text of one record's details panes. Headers are sorted (name, value) pairs. """
+    __slots__ = ('request_headers', 'response_headers', 'request_body', 'response_snippet', 'raw_body', 'raw_note')
+
+    def __init__(self, request_headers, response_headers, request_body, response_snippet, raw_body, raw_note=""):
+        self.request_headers = request_headers
+        self.response_headers = response_headers
+        self.request_body = request_body
+        self.response_snippet = response_snippet
+        self.raw_body = raw_body
+        self.raw_note = raw_note # Shown above the raw body (e.g. "showing first 1024 KB")
+
+    @property
+    def size(self):
+        """ Approximate characters held, for the cache budget. """
+        return len(self.request_body) + len(self.response_snippet) + len(self.raw_body)
+
+
+def pretty_json_or_text(text):
+    """ Pretty-printed JSON if `text` parses as JSON, else the text unchanged. """
+    try: return json.dumps(json.loads(text), indent=2, ensure_ascii=False)
+    except (ValueError, RecursionError): return text
+
+
+def format_request_body(body_bytes):
+    """ Display text of a request body: pretty-printed JSON, plain text, or a note for binary data. """
+    if not body_bytes: return "[No Request Body]"
+    try:
+        text = body_bytes.decode('utf-8', errors='replace')
+    except Exception as e:
+        log.debug(f"Could not decode request body for display: {e}")
+        return "[Binary or Undecodable Request Body]"
+    return pretty_json_or_text(text) if text.strip().startswith(('{', '[')) else text
+
+
+def format_raw_body(record, byte_limit=DETAIL_BODY_LIMIT):
+    """ (note, text) for the Raw Body pane: JSON pretty-printed, text as is, binary as Base64. At most byte_limit bytes are read. """
+    blob_ref = record.response_body_blob
+    try:
+        body = record.load_body(byte_limit) # Spilled bodies are read from disk (capped)
+    except OSError as e:
+        log.error(f"Could not read response body blob {blob_ref.get('path')}: {e}")
+        return "", f"[Response body blob unavailable: {e}]"
+    if not body: return "", "[No Response Body Captured]"
+
+    note = ""
+    size = record.body_size or len(body)
+    if size > len(body):
+        note = f"[Showing first {len(body) // 1024} KB of {size / 1024:.0f} KB"
+        note += f", sha256 {blob_ref['sha256'][:12]}...]\n" if blob_ref else "]\n"
+    content_type = (record.content_type or '').lower()
+    try:
+        if 'json' in content_type:
+            text = body.decode('utf-8', errors='replace')
+            return note, text if note else pretty_json_or_text(text) # A cut-off document never parses
+        if content_type.startswith('text/') or any(sub in content_type for sub in TEXT_SUBTYPES):
+            return note, body.decode('utf-8', errors='replace')
+        return note, f"[Binary Data ({content_type or 'Unknown Type'})]\n--- Base64 ---\n{base64.b64encode(body).decode('ascii')}"
+    except Exception as e:
+        log.error(f"Error decoding/displaying raw body: {e}", exc_info=True)
+        return note, f"[Error decoding/displaying raw body]\n--- Base64 ---\n{base64.b64encode(body).decode('ascii')}"
+
+
+def render_details(record, byte_limit=DETAIL_BODY_LIMIT):
+    """ Builds the DetailView of a record. Safe to call from any thread. """
+    raw_note, raw_body = format_raw_body(record, byte_limit)
+    return DetailView(sorted(record.request_headers.items()), sorted(record.response_headers.items()),
+                      format_request_body(record.request_body), record.response_snippet, raw_body, raw_note)
+
+
+class DetailCache:
+    """ LRU of rendered views, keyed by api_key and checked against the record object they were rendered from. """
+    def __init__(self, max_entries=DETAIL_CACHE_ENTRIES, max_chars=DETAIL_CACHE_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.chars = 0
+        self._entries = OrderedDict() # api_key -> (record, view)
+        self._lock = threading.Lock() # Filled by the worker, read by the GUI thread
+
+    def get(self, key, record):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not record: return None # Missing, or from before a Clear
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, record, view):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old: self.chars -= old[1].size
+            if view.size > self.max_chars: return # Would evict everything else
+            self._entries[key] = (record, view)
+            self.chars += view.size
+            while len(self._entries) > self.max_entries or self.chars > self.max_chars:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.chars -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.chars = 0
+
+
+class DetailRenderer:
+    """
+    Renders details on a worker thread. submit() replaces any job that has not started yet;
+    on_done(key, generation, view) is called on the worker thread for the newest job only.
+    """
+    def __init__(self, on_done, cache=None, byte_limit=DETAIL_BODY_LIMIT):
+        self.on_done = on_done
+        self.cache = cache if cache is not None else DetailCache()
+        self.byte_limit = byte_limit
+        self.generation = 0
+        self._jobs = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="viper-details", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, record):
+        """ Queues a render and returns its generation; older jobs are cancelled. """
+        self.generation += 1
+        self._replace_job((self.generation, key, record))
+        return self.generation
+
+    def cancel(self):
+        """ Cancels the pending/running job (e.g. the selection was cleared). """
+        self.generation += 1
+
+    def close(self):
+        self.cancel()
+        self._replace_job(None)
+
+    def _replace_job(self, job):
+        # Only the GUI thread puts jobs, so once the waiting one is dropped the slot is free
+        try: self._jobs.get_nowait()
+        except queue.Empty: pass
+        self._jobs.put_nowait(job)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None: return
+            generation, key, record = job
+            if generation != self.generation: continue # Superseded while waiting
+            try:
+                view = render_details(record, self.byte_limit)
+            except Exception as e:
+                log.error(f"Error rendering details for {key}: {e}", exc_info=True)
+                continue
+            self.cache.put(key, record, view)
+            if generation == self.generation: # Not superseded while rendering
+                self.on_done(key, generation, view)
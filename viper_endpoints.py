@@ -0,0 +1,98 @@
+"""
+Viper API Interceptor - endpoint templates for deduplicating near-identical calls.
+
+    GET https://shop.example.com/api/items/123?page=2&_=1712345678
+ -> GET https://shop.example.com/api/items/{int}?page={int}
+
+Path segments and query values that look like IDs (integers, UUIDs, hex hashes, dates,
+long random tokens) become placeholders. Cache-buster parameters are dropped, and the
+remaining parameters are sorted by name. Every concrete URL of the same endpoint then
+maps to one template. The EndpointRegistry counts hits per template and keeps a few
+concrete URLs as samples.
+"""
+import re
+from urllib.parse import urlsplit, parse_qsl
+
+DEFAULT_MAX_SAMPLES = 5 # Concrete URLs kept per template
+
+# Query parameters that only defeat caches; dropped from templates
+VOLATILE_QUERY_PARAMS = frozenset({
+    '_', '_t', '_ts', '_dc', 't', 'ts', 'timestamp', 'cb', 'cachebuster', 'cache_buster', 'cachebust',
+    'nocache', 'no_cache', 'rnd', 'rand', 'random', 'nonce',
+})
+
+_PLACEHOLDERS = [ # First match wins
+    ('{int}', re.compile(r'^-?\d+$')),
+    ('{uuid}', re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')),
+    ('{date}', re.compile(r'^\d{4}-\d{2}-\d{2}(?:[T ][\d:.]+Z?)?$')),
+    ('{hash}', re.compile(r'^[0-9a-fA-F]{16,}$')),
+    ('{token}', re.compile(r'^(?=[^/]*\d)(?=[^/]*[A-Za-z])[A-Za-z0-9_\-=.~]{20,}$')), # Long mixed IDs: slugs rarely qualify
+]
+
+
+def template_value(value):
+    """ Placeholder for an ID-like path segment or query value, or the value itself. """
+    for placeholder, pattern in _PLACEHOLDERS:
+        if pattern.match(value):
+            return placeholder
+    return value
+
+
+def endpoint_template(method, url):
+    """ 'METHOD scheme://host/templated/path?sorted=params' for a request. """
+    try: parts = urlsplit(url)
+    except ValueError: return f"{method} {url}"
+    path = '/'.join(template_value(segment) if segment else segment for segment in parts.path.split('/'))
+    params = sorted({(name, template_value(value)) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                     if name.lower() not in VOLATILE_QUERY_PARAMS})
+    query = '&'.join(f"{name}={value}" for name, value in params)
+    return f"{method} {parts.scheme}://{parts.netloc.lower()}{path}" + (f"?{query}" if query else "")
+
+
+class EndpointStats:
+    """ Hit count and a bounded sample of concrete URLs for one template. """
+    __slots__ = ('template', 'hits', 'samples')
+
+    def __init__(self, template, url):
+        self.template = template
+        self.hits = 1
+        self.samples = [url]
+
+
+class EndpointRegistry:
+    """ Template -> EndpointStats for one scan. """
+    def __init__(self, max_samples=DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.endpoints = {}
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def __contains__(self, template):
+        return template in self.endpoints
+
+    def add(self, template, url):
+        """ Registers a newly recorded endpoint. """
+        self.endpoints[template] = stats = EndpointStats(template, url)
+        return stats
+
+    def hit(self, template, url):
+        """ Counts another call to a known template. Returns (stats, sample_added). """
+        stats = self.endpoints[template]
+        stats.hits += 1
+        if len(stats.samples) < self.max_samples and url not in stats.samples:
+            stats.samples.append(url)
+            return stats, True
+        return stats, False
+
+
+def apply_api_hit(results, message, max_samples=DEFAULT_MAX_SAMPLES):
+    """ Applies an 'api_hit' message (template mode) to a {api_key: ApiRecord} store. Returns the updated record or None. """
+    record = results.get(message.get('key'))
+    if record is None: return None
+    record.hits += 1 # Counted here, so hits from several batch targets add up
+    url = message.get('url')
+    if url:
+        if record.samples is None: record.samples = []
+        if len(record.samples) < max_samples and url not in record.samples: record.samples.append(url)
+    return record
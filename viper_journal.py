@@ -0,0 +1,523 @@
+"""
+Viper API Interceptor - append-only NDJSON result journal.
+
+Every 'api_found' / 'api_hit' message of a scan is appended to <output>.ndjson while the
+scan runs, one JSON object per line (the queue message itself, with its ApiRecord in the
+to_dict() layout; bodies spilled to the temporary blob store are inlined). Bytes values such as the raw request body are written as
+{"__b64__": "..."} and turned back into bytes when the journal is read.
+
+A writer thread does the JSON encoding and file I/O. It writes in batches and fsyncs at
+most every `fsync_interval` seconds, so a crash or a stopped scan loses at most the last
+interval. The final JSON export is produced by streaming the journal (see
+iter_journal_results), so it never needs the whole result set in memory at once.
+
+The JSON/CSV writers here are shared by every export: they take records one at a time,
+report progress per record, and write gzip when the file name ends in .gz. ExportTask
+runs one export on a worker thread for the GUI, with progress and cancellation.
+
+Saved result files are read back the same way, one record at a time: iter_result_messages
+accepts a JSON export (an array, parsed incrementally) or NDJSON (a journal, or one record per
+line), gzipped or not, and yields the 'api_found' / 'api_hit' messages a scan would have
+queued. ImportTask feeds them to the GUI from a worker thread.
+"""
+import base64
+import csv
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from viper_blobs import DEFAULT_INLINE_BODY_LIMIT
+from viper_endpoints import DEFAULT_MAX_SAMPLES
+from viper_records import ApiRecord
+
+log = logging.getLogger(__name__)
+
+BYTES_MARKER = "__b64__"
+JOURNAL_MESSAGE_TYPES = ('api_found', 'api_hit')
+DEFAULT_FSYNC_INTERVAL = 1.0 # Seconds
+DEFAULT_MAX_BATCH = 500 # Messages written per batch
+
+# CSV export layout (same as the GUI's original CSV export). The columns are fixed: the
+# primary ones, then every optional ApiRecord.field_names() key (empty when a record lacks it).
+CSV_PRIMARY_HEADERS = ['method', 'status', 'url', 'content_type', 'request_body', 'raw_response_body_bytes']
+CSV_OPTIONAL_HEADERS = ['hits', 'response_body_blob', 'samples', 'target', 'template']
+CSV_HEADERS = CSV_PRIMARY_HEADERS + CSV_OPTIONAL_HEADERS
+CSV_BODY_LIMIT = 1000 # Characters of base64 body kept per CSV cell
+EXPORT_GZIP_LEVEL = 6 # zlib level of .gz exports (9 is much slower for little gain on JSON)
+EXPORT_PARTIAL_SUFFIX = ".part" # ExportTask writes here and renames when the export is complete
+GZIP_MAGIC = b'\x1f\x8b'
+IMPORT_CHUNK_CHARS = 1 << 20 # Characters read at a time from a JSON array (doubled while one record is larger)
+IMPORT_SNIFF_CHARS = 4096 # Characters read to tell a JSON array from NDJSON
+IMPORT_MAX_QUEUED = 2000 # ImportTask waits while this many messages are still waiting for the GUI (or its store writer)
+IMPORT_WAIT = 0.01 # Seconds between checks while ImportTask waits for the queue to drain
+
+_WHITESPACE_RE = re.compile(r'[ \t\r\n]*')
+
+
+def journal_path_for(output_file):
+    """ Journal file used for an output file: same name, .ndjson extension (apis.json.gz -> apis.ndjson). """
+    if is_gzip_name(output_file): output_file = output_file[:-3]
+    return os.path.splitext(output_file)[0] + ".ndjson"
+
+
+def json_default(value):
+    """
+    json.dumps default= hook: encodes records and bytes such as request_body. A spilled body is
+    read back and inlined: the blob store is a temp dir removed on exit, and the journal must
+    outlive it. If the blob is already gone, only its reference is kept.
+    """
+    if isinstance(value, ApiRecord):
+        try: return value.to_dict()
+        except OSError: return value.to_dict(include_body=False)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {BYTES_MARKER: base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_bytes(obj):
+    """ json.loads object_hook= reversing json_default's bytes marker. """
+    if len(obj) == 1 and BYTES_MARKER in obj:
+        try: return base64.b64decode(obj[BYTES_MARKER])
+        except (ValueError, TypeError): return obj
+    return obj
+
+
+def _snapshot(message):
+    """ Copy of a message taken on the scan thread, so the GUI can mutate its record (hits/samples) meanwhile. """
+    data = message.get('data')
+    if not isinstance(data, ApiRecord):
+        return dict(message)
+    return {**message, 'data': data.copy()} # Encoded to JSON later, on the writer thread
+
+
+class JournalWriter:
+    """ Appends messages to an NDJSON file from a background thread (batched writes, interval fsync). """
+    def __init__(self, path, fsync_interval=DEFAULT_FSYNC_INTERVAL, max_batch=DEFAULT_MAX_BATCH, append=False):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self.records_written = 0
+        self.errors = 0
+        self.fsyncs = 0
+        self._queue = queue.Queue()
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8', newline='\n')
+        self._thread = threading.Thread(target=self._run, name="viper-journal", daemon=True)
+        self._thread.start()
+
+    def append(self, message):
+        """ Queues a message for writing. Cheap and thread-safe; never blocks on disk. """
+        self._queue.put(_snapshot(message))
+
+    def close(self, timeout=30):
+        """ Writes everything queued, fsyncs and closes the file. """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        last_fsync = time.monotonic()
+        closing = False
+        while not closing:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.max_batch:
+                try: batch.append(self._queue.get_nowait())
+                except queue.Empty: break
+            if None in batch:
+                closing = True
+                batch = [m for m in batch if m is not None]
+
+            lines = []
+            for message in batch:
+                try: lines.append(json.dumps(message, ensure_ascii=False, default=json_default))
+                except (TypeError, ValueError) as e:
+                    self.errors += 1
+                    log.warning(f"Result journal: could not encode {message.get('type')} message: {e}")
+            try:
+                if lines:
+                    self._file.write('\n'.join(lines) + '\n')
+                    self._file.flush()
+                    self.records_written += len(lines)
+                if closing or (lines and time.monotonic() - last_fsync >= self.fsync_interval):
+                    os.fsync(self._file.fileno())
+                    self.fsyncs += 1; last_fsync = time.monotonic()
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                log.error(f"Result journal: write to {self.path} failed: {e}")
+        try: self._file.close()
+        except OSError: pass
+
+
+def read_journal(path):
+    """ Yields the messages in a journal (plain or gzipped). A torn last line (crash mid-write) is skipped. """
+    f, _ = open_result_file(path)
+    with f:
+        yield from _iter_ndjson(f, path)
+
+
+def iter_journal_results(path):
+    """
+    Yields the deduplicated ApiRecords of a journal (or any result file iter_result_messages
+    reads) in discovery order, with the hit counts/samples of later 'api_hit' lines applied.
+    Two streaming passes: the first only collects the (small) per-key hit totals.
+    """
+    hits = {} # api_key -> [extra hits, sample urls]
+    for message in iter_result_messages(path, records=False):
+        if message.get('type') == 'api_hit' and message.get('key'):
+            entry = hits.setdefault(message['key'], [0, []])
+            entry[0] += 1
+            if message.get('url'): entry[1].append(message['url'])
+    seen = set()
+    for message in iter_result_messages(path):
+        if message['type'] != 'api_found': continue
+        record = message['data']
+        key = record.key
+        if key in seen: continue # Same call found by another batch target
+        seen.add(key)
+        extra = hits.get(key)
+        if extra:
+            record.hits += extra[0]
+            if record.samples is None: record.samples = []
+            for url in extra[1]:
+                if len(record.samples) < DEFAULT_MAX_SAMPLES and url not in record.samples: record.samples.append(url)
+        yield record
+
+
+def open_result_file(path):
+    """ (text stream, underlying binary file) of a saved result file, gunzipped if it starts with the gzip magic bytes. """
+    raw = open(path, 'rb')
+    try:
+        compressed = raw.read(2) == GZIP_MAGIC
+        raw.seek(0)
+        stream = gzip.GzipFile(fileobj=raw, mode='rb') if compressed else raw
+        return io.TextIOWrapper(stream, encoding='utf-8-sig'), raw # -sig: tolerate a BOM from other tools
+    except BaseException:
+        raw.close()
+        raise
+
+
+def iter_json_array(f, head='', chunk_chars=IMPORT_CHUNK_CHARS):
+    """
+    Yields the elements of a top-level JSON array read incrementally from a text file (after
+    `head`, text already read from it), so only the current element and one read chunk are in
+    memory. Bytes markers are decoded. Raises ValueError if the text is not a JSON array.
+    """
+    decoder = json.JSONDecoder(object_hook=_decode_bytes)
+    buf, pos, eof, read_size = head, 0, False, chunk_chars
+    state = 'start' # 'start': before '[', 'first': a value or ']', 'value': a value, 'next': ',' or ']'
+    while True:
+        pos = _WHITESPACE_RE.match(buf, pos).end()
+        if pos == len(buf):
+            if eof: raise ValueError("Unexpected end of the JSON array")
+            chunk = f.read(read_size)
+            buf, pos, eof = chunk, 0, not chunk
+            continue
+        char = buf[pos]
+        if state == 'start':
+            if char != '[': raise ValueError("Not a JSON array")
+            pos += 1; state = 'first'; continue
+        if state in ('first', 'next') and char == ']': return
+        if state == 'next':
+            if char != ',': raise ValueError(f"Expected ',' or ']' in the JSON array, got {char!r}")
+            pos += 1; state = 'value'; continue
+        try: value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof: raise
+            end = None
+        if end is None or end == len(buf) and not eof: # Incomplete (a number may continue in the next chunk)
+            chunk = f.read(read_size)
+            read_size *= 2 # A record larger than the chunk is re-parsed O(log size) times, not once per chunk
+            buf = buf[pos:] + chunk; pos = 0
+            eof = not chunk
+            continue
+        read_size = chunk_chars
+        pos = end; state = 'next'
+        yield value
+
+
+def import_record(data, blob_store=None, inline_body_limit=DEFAULT_INLINE_BODY_LIMIT):
+    """
+    ApiRecord of a saved record dict; its body stays base64 until needed. With a blob store,
+    a body over the inline limit is decoded into it instead, as during a scan.
+    """
+    record = ApiRecord.from_dict(data)
+    if blob_store is not None and record.response_body_b64 is not None and record.body_size > inline_body_limit:
+        try:
+            record.response_body_blob = blob_store.put(record.load_body())
+            record.response_body_b64 = None
+        except (OSError, ValueError) as e: log.warning(f"Could not write body blob for {record.url}, keeping it inline: {e}")
+    return record
+
+
+def iter_result_messages(path, blob_store=None, inline_body_limit=DEFAULT_INLINE_BODY_LIMIT, progress=None, records=True):
+    """
+    Streams a saved result file as the queue messages a scan would have produced:
+    {'type': 'api_found', 'data': ApiRecord} per record and {'type': 'api_hit', 'key', 'url'}
+    per journal hit line. Reads a JSON export (an array of records) or NDJSON (journal
+    messages or bare records, one per line), plain or gzipped. Unreadable NDJSON lines are
+    skipped. `progress(bytes_read)` is called after each message (it may raise to abort);
+    with records=False, 'api_found' messages are skipped without building their records.
+    """
+    f, raw = open_result_file(path)
+    with f:
+        head = f.read(IMPORT_SNIFF_CHARS)
+        if head.lstrip()[:1] == '[':
+            if not records: return # An export: records only, no 'api_hit' lines
+            items = iter_json_array(f, head)
+        else:
+            lines = (head + f.readline()).split('\n') # Whole lines only
+            if not lines[-1]: lines.pop()
+            items = _iter_ndjson(itertools.chain(lines, f), path)
+        for item in items:
+            if not isinstance(item, dict): continue
+            msg_type = item.get('type')
+            if msg_type is None: # A bare record (JSON export or record-per-line NDJSON)
+                data = item
+            elif msg_type == 'api_hit':
+                if item.get('key'): yield {'type': 'api_hit', 'key': item['key'], 'url': item.get('url')}
+                if progress: progress(raw.tell())
+                continue
+            elif msg_type == 'api_found' and isinstance(item.get('data'), dict):
+                data = item['data']
+            else: continue
+            if records: yield {'type': 'api_found', 'data': import_record(data, blob_store, inline_body_limit)}
+            if progress: progress(raw.tell())
+
+
+def _iter_ndjson(lines, path):
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line: continue
+        try:
+            yield json.loads(line, object_hook=_decode_bytes)
+        except json.JSONDecodeError:
+            log.warning(f"Skipping unreadable line {line_no} in {path}.") # E.g. a torn last line (crash mid-write)
+
+
+def is_gzip_name(filename):
+    return filename.lower().endswith('.gz')
+
+
+def open_export_file(filename, newline=None, compress=None):
+    """ Text file (UTF-8) for an export. It is gzip-compressed if `compress`, by default when the name ends in .gz. """
+    if compress is None: compress = is_gzip_name(filename)
+    if compress:
+        return gzip.open(filename, 'wt', encoding='utf-8', newline=newline, compresslevel=EXPORT_GZIP_LEVEL)
+    return open(filename, 'w', encoding='utf-8', newline=newline)
+
+
+def write_json_records(f, records, progress=None):
+    """
+    Writes ApiRecords as a JSON array one at a time, in the same layout as json.dump(..., indent=2).
+    Bodies spilled to the blob store are read while their record is written; a record whose blob
+    is gone is written without its body (the reference is kept). `progress(count)` is called
+    after each record (it may raise to abort). Returns the count.
+    """
+    count = 0
+    f.write('[')
+    for record in records:
+        try: export_item = record.to_dict()
+        except OSError: export_item = record.to_dict(include_body=False) # A marker string would not decode as base64 on import
+        # Use ensure_ascii=False for proper UTF-8 output without escaping non-ASCII chars
+        f.write(',\n  ' if count else '\n  ')
+        f.write(json.dumps(export_item, indent=2, ensure_ascii=False, default=json_default).replace('\n', '\n  '))
+        count += 1
+        if progress: progress(count)
+    f.write('\n]' if count else ']')
+    return count
+
+
+def csv_row(record):
+    """ CSV-friendly dict of a record: decoded request body, truncated base64 response body. """
+    try: row_data = record.to_dict(body_limit=CSV_BODY_LIMIT * 3 // 4 + 1) # Spilled body: read just enough for the truncated column
+    except OSError:
+        row_data = record.to_dict(include_body=False)
+        row_data['raw_response_body_bytes'] = "[Body blob unavailable]"
+    # Decode request body for CSV readability if possible
+    if isinstance(row_data.get('request_body'), bytes):
+        try: row_data['request_body'] = row_data['request_body'].decode('utf-8', errors='replace')
+        except Exception: row_data['request_body'] = "[Binary Data]"
+    # Truncate potentially long base64 body in CSV
+    if row_data.get('raw_response_body_bytes') and len(row_data['raw_response_body_bytes']) > CSV_BODY_LIMIT:
+        row_data['raw_response_body_bytes'] = row_data['raw_response_body_bytes'][:CSV_BODY_LIMIT] + "...(truncated)"
+    else: # Ensure it's a string or None for the writer
+        row_data['raw_response_body_bytes'] = row_data.get('raw_response_body_bytes', None)
+    return row_data
+
+
+def write_csv_records(f, records, progress=None):
+    """
+    Writes ApiRecords as CSV (CSV_HEADERS, all fields quoted) to a file opened with newline=''.
+    One pass: the columns are known up front. `progress` as in write_json_records. Returns the count.
+    """
+    count = 0
+    writer = csv.DictWriter(f, fieldnames=CSV_HEADERS, extrasaction='ignore', quoting=csv.QUOTE_ALL) # Quote all fields
+    writer.writeheader()
+    for record in records:
+        writer.writerow(csv_row(record))
+        count += 1
+        if progress: progress(count)
+    return count
+
+
+def export_json_from_journal(journal_path, filename, query=None):
+    """ Streams a journal's results (those matching a viper_query.Query, if given) into a JSON export file. Returns the number of records. """
+    records = iter_journal_results(journal_path)
+    if query: records = (record for record in records if query.matches(record))
+    with open_export_file(filename) as f:
+        return write_json_records(f, records)
+
+
+class ExportCancelled(Exception):
+    """ Raised inside an export when ExportTask.cancel() was called. """
+
+
+class ExportTask:
+    """
+    One JSON or CSV export on a daemon thread, so the GUI stays responsive. `source()` is
+    called on that thread and returns the records to write. A store-backed export opens its
+    own connection there, and only one record is held at a time. The file is written as
+    <filename>.part and renamed when complete; a cancel or an error removes it. The GUI
+    polls `done` / `total` and is_alive(), then reads `count`, `cancelled` or `error`.
+    """
+    def __init__(self, source, filename, fmt='json', total=None):
+        self.source = source
+        self.filename = filename
+        self.fmt = fmt # 'json' or 'csv'
+        self.total = total # Expected record count, for the progress bar (None if unknown)
+        self.done = 0
+        self.count = None # Records written, once finished successfully
+        self.cancelled = False
+        self.error = None
+        self.started_at = None
+        self.elapsed = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="viper-export", daemon=True)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _progress(self, count):
+        self.done = count
+        if self._cancel.is_set(): raise ExportCancelled()
+
+    def _run(self):
+        partial = self.filename + EXPORT_PARTIAL_SUFFIX
+        records = None
+        try:
+            with open_export_file(partial, newline='' if self.fmt == 'csv' else None, compress=is_gzip_name(self.filename)) as f:
+                records = self.source()
+                if self.fmt == 'csv': self.count = write_csv_records(f, records, self._progress)
+                else: self.count = write_json_records(f, records, self._progress)
+            os.replace(partial, self.filename)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e: # Reported by the GUI; the thread must not die silently
+            log.error(f"Export to {self.filename} failed: {e}", exc_info=True)
+            self.error = e
+        finally:
+            close = getattr(records, 'close', None) # A generator's cleanup (e.g. its store connection) runs now
+            if close: close()
+            if self.count is None or self.error:
+                try: os.remove(partial)
+                except OSError: pass
+            self.elapsed = time.monotonic() - self.started_at
+
+
+class ImportCancelled(Exception):
+    """ Raised inside an import when ImportTask.cancel() was called. """
+
+
+class ImportTask:
+    """
+    Loads a saved result file on a daemon thread. Each message of iter_result_messages is
+    put on `result_queue` (and appended to `store`, a StoreWriter, if given) the way a scan's
+    ScanReporter would, so the GUI adds rows in batches while the file is still being read.
+    Instead of dropping messages when the consumer falls behind, the task waits while
+    `max_queued` are pending; memory stays bounded however large the file is. The store
+    writer is closed when the import ends. The GUI polls `done` / `total` (bytes of the file)
+    and is_alive(), then reads `count`, `cancelled` or `error`.
+    """
+    def __init__(self, path, result_queue, store=None, notify=None, blob_store=None,
+                 inline_body_limit=DEFAULT_INLINE_BODY_LIMIT, max_queued=IMPORT_MAX_QUEUED):
+        self.path = path
+        self.result_queue = result_queue
+        self.store = store
+        self.notify = notify # Called after each queued message (e.g. wakes the GUI)
+        self.blob_store = blob_store # Large bodies are spilled here (dict mode; a store keeps its own)
+        self.inline_body_limit = inline_body_limit
+        self.max_queued = max_queued
+        self.total = os.path.getsize(path) # Bytes on disk (compressed size for .gz)
+        self.done = 0
+        self.count = 0 # Records read so far
+        self.cancelled = False
+        self.error = None
+        self.started_at = None
+        self.elapsed = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="viper-import", daemon=True)
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _progress(self, bytes_read):
+        self.done = bytes_read
+        if self._cancel.is_set(): raise ImportCancelled()
+
+    def _put(self, message):
+        while self.result_queue.qsize() >= self.max_queued or (self.store is not None and self.store.backlog() >= self.max_queued):
+            if self._cancel.wait(IMPORT_WAIT): raise ImportCancelled()
+        if self.store is not None: self.store.append(message)
+        message['ts'] = time.monotonic()
+        self.result_queue.put(message)
+        if self.notify is not None: self.notify()
+
+    def _run(self):
+        messages = None
+        try:
+            messages = iter_result_messages(self.path, self.blob_store, self.inline_body_limit, self._progress)
+            for message in messages:
+                self._put(message)
+                if message['type'] == 'api_found': self.count += 1
+            self.done = self.total
+        except ImportCancelled:
+            self.cancelled = True
+        except Exception as e: # Reported by the GUI; the thread must not die silently
+            log.error(f"Import of {self.path} failed: {e}", exc_info=True)
+            self.error = e
+        finally:
+            if messages is not None: messages.close() # Closes the file
+            if self.store is not None: self.store.close()
+            self.elapsed = time.monotonic() - self.started_at
@@ -0,0 +1,88 @@
+"""
+Viper API Interceptor - compiled URL ignore-list matching.
+
+The response filter used to walk the whole ignore list for every response:
+
+    any(frag in netloc or frag in path for frag in ignore_list)
+
+IgnoreMatcher keeps exactly those semantics (a URL is ignored when any lowercase
+pattern is a substring of its netloc or of its path) but compiles the list once per
+scan. It uses:
+
+  * a host-suffix set, so "google-analytics.com" matches "www.google-analytics.com"
+    with a few set lookups;
+  * an extension set, so ".png"-style entries match "/img/logo.png" with one lookup;
+  * a single trie-shaped regex over all patterns for everything else. It runs once
+    over "netloc\\npath". Patterns come from single lines and never contain "\\n", so
+    nothing can match across the two parts.
+
+The two set lookups only short-circuit positives. The regex alone already gives the
+full answer, so the result is always identical to the any() scan.
+"""
+import re
+from urllib.parse import urlparse
+
+_EXTENSION_RE = re.compile(r'^\.[a-z0-9]+$')
+
+
+def _minimal_patterns(patterns):
+    """ Drops patterns that contain another pattern: if the longer one matches, so does the shorter. """
+    minimal = []
+    for pattern in sorted(set(patterns), key=lambda p: (len(p), p)):
+        if not any(shorter in pattern for shorter in minimal):
+            minimal.append(pattern)
+    return minimal
+
+
+def _trie_regex(patterns):
+    """ Builds one regex whose alternation is shaped like a trie of the patterns (shared prefixes are matched once). """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for ch in pattern:
+            node = node.setdefault(ch, {})
+
+    def build(node):
+        # Patterns are minimal, so no pattern is a prefix of another: every end is a leaf
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        if not alternatives: return ''
+        if len(alternatives) == 1: return alternatives[0]
+        return '(?:' + '|'.join(alternatives) + ')'
+
+    return re.compile(build(trie)) if trie else None
+
+
+class IgnoreMatcher:
+    """ An ignore list compiled once per scan; matches() is a drop-in for the per-URL any() scan. """
+    def __init__(self, patterns):
+        self.patterns = sorted({p.strip().lower() for p in patterns if p and p.strip()})
+        minimal = _minimal_patterns(self.patterns)
+        self._extensions = {p for p in minimal if _EXTENSION_RE.match(p)}
+        self._host_suffixes = {p for p in minimal if '/' not in p and '.' in p.strip('.') and not p.startswith('.')}
+        self._regex = _trie_regex(minimal)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def matches(self, url):
+        """ True if any pattern occurs in the URL's (lowercased) netloc or path. """
+        if self._regex is None: return False
+        parsed_url = urlparse(url.lower())
+        netloc = parsed_url.netloc; path = parsed_url.path
+
+        # Fast positive path 1: extension of the last path segment (".png", ".js", ...)
+        dot = path.rfind('.')
+        if dot > path.rfind('/') and path[dot:] in self._extensions:
+            return True
+        # Fast positive path 2: host or one of its parent domains is a listed domain
+        host = netloc.rpartition('@')[2].partition(':')[0]
+        if host in self._host_suffixes:
+            return True
+        dot = host.find('.')
+        while dot != -1:
+            if host[dot + 1:] in self._host_suffixes:
+                return True
+            dot = host.find('.', dot + 1)
+
+        # Full check: every pattern, substring semantics, one regex pass over both parts
+        return self._regex.search(f"{netloc}\n{path}") is not None
@@ -0,0 +1,304 @@
+"""
+Viper API Interceptor - scan metrics: counters, histograms and gauges.
+
+A ScanMetrics object travels in the scan params (params['metrics']). The scan pipeline
+updates it as it goes:
+
+  * responses seen by the response handler, by outcome (accepted, filtered, duplicate, ...);
+  * the API filter's verdicts by rule (which check of api_call_verdict decided);
+  * time spent in handle_response and waiting for response bodies;
+  * captures in flight and time spent waiting for a capture slot;
+  * response body bytes captured (inline or spilled to the blob store);
+  * scan phase durations (load, forms, clicks, scrolls, final_wait, crawl), which add up to
+    the scan's wall time, and the settle waits that end them (a separate histogram, since
+    they fall inside those phases);
+  * queue depths, read when the metrics are (gauges backed by callables).
+
+The same state can be read as a dict (snapshot(), also what write_json() dumps at scan
+end), as Prometheus text (to_prometheus()), or over HTTP from a MetricsServer. Updates are
+a dict update under a per-family lock, cheap enough for every response.
+"""
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_text(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs: return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if value == float('inf'): return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricFamily:
+    """ Base of one named metric with a fixed set of label names. """
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series = {} # label values tuple -> value (or histogram state)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def _labels(self, key):
+        return dict(zip(self.label_names, key))
+
+    def reset(self):
+        with self._lock: self._series.clear()
+
+
+class Counter(MetricFamily):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def total(self):
+        return sum(self._series.values())
+
+    def series(self):
+        with self._lock:
+            return [{'labels': self._labels(key), 'value': value} for key, value in sorted(self._series.items())]
+
+    def exposition(self):
+        return [f"{self.name}{_label_text(self.label_names, key)} {_number(value)}" for key, value in sorted(self._series.items())]
+
+
+class Gauge(MetricFamily):
+    """ Values set directly, or read from a callable each time the gauge is read (e.g. a queue's qsize). """
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock: self._series[self._key(labels)] = value
+
+    def set_function(self, fn, **labels):
+        with self._lock: self._series[self._key(labels)] = fn
+
+    def _read(self):
+        values = {}
+        with self._lock: items = sorted(self._series.items())
+        for key, value in items:
+            if callable(value):
+                try: value = value()
+                except Exception: continue # Source gone (e.g. widget destroyed)
+            values[key] = value
+        return values
+
+    def series(self):
+        return [{'labels': self._labels(key), 'value': value} for key, value in self._read().items()]
+
+    def exposition(self):
+        return [f"{self.name}{_label_text(self.label_names, key)} {_number(value)}" for key, value in self._read().items()]
+
+
+class Histogram(MetricFamily):
+    """ Cumulative-bucket histogram (Prometheus style) with sum and count per label set. """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None: state = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1; break
+            state[1] += value; state[2] += 1
+
+    def time(self, **labels):
+        """ Context manager observing the wall time of its block. """
+        return _Timer(self, labels)
+
+    def quantile(self, q, **labels):
+        """ Estimated q-quantile (linear within the bucket), None if nothing was observed. """
+        state = self._series.get(self._key(labels))
+        if not state or not state[2]: return None
+        rank = q * state[2]; seen = 0; lower = 0.0
+        for bound, count in zip(self.buckets, state[0]):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count; lower = bound
+        return self.buckets[-1] # In the +Inf bucket
+
+    def series(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in sorted(self._series.items())]
+        out = []
+        for key, (counts, total, count) in items:
+            cumulative = 0; buckets = {}
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n; buckets[_number(bound)] = cumulative
+            buckets["+Inf"] = count
+            out.append({'labels': self._labels(key), 'count': count, 'sum': total, 'buckets': buckets})
+        return out
+
+    def exposition(self):
+        lines = []
+        for entry in self.series():
+            key = tuple(entry['labels'][name] for name in self.label_names)
+            for bound, cumulative in entry['buckets'].items():
+                lines.append(f"{self.name}_bucket{_label_text(self.label_names, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.label_names, key)} {_number(entry['sum'])}")
+            lines.append(f"{self.name}_count{_label_text(self.label_names, key)} {entry['count']}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram; self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class PhaseClock:
+    """ Times consecutive scan phases: enter() ends the current phase (if any) and starts the next. """
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.phase = None
+        self.start = 0.0
+
+    def enter(self, phase):
+        self.close()
+        self.phase = phase; self.start = time.perf_counter()
+
+    def close(self):
+        if self.phase is not None:
+            self.histogram.observe(time.perf_counter() - self.start, phase=self.phase)
+            self.phase = None
+
+
+class ScanMetrics:
+    """ The metric families of one scan (or of a batch of targets sharing it). """
+    def __init__(self):
+        self.started = time.time()
+        self.responses = Counter("viper_responses_total", "Responses seen by the response handler, by outcome.", ("outcome",))
+        self.filter_verdicts = Counter("viper_filter_verdicts_total", "API filter verdicts by deciding rule.", ("rule", "accepted"))
+        self.handler_seconds = Histogram("viper_handle_response_seconds", "Time spent in the response handler per response.")
+        self.body_fetch_seconds = Histogram("viper_body_fetch_seconds", "Time waiting for a response body from the browser.")
+        self.capture_wait_seconds = Histogram("viper_capture_wait_seconds", "Time accepted responses waited for a capture slot.")
+        self.captures_in_flight = Gauge("viper_captures_in_flight", "Accepted responses whose details are being fetched and stored.")
+        self.captured_bytes = Counter("viper_captured_bytes_total", "Response body bytes captured, by storage.", ("storage",))
+        self.messages_dropped = Counter("viper_queue_dropped_total", "Messages dropped because the result queue was full.", ("type",))
+        self.phase_seconds = Histogram("viper_phase_seconds", "Wall time of scan phases.", ("phase",), PHASE_BUCKETS)
+        self.settle_seconds = Histogram("viper_settle_seconds", "Waits for a page to settle (network quiet or fixed delay); part of the enclosing phase's time.",
+                                        buckets=PHASE_BUCKETS)
+        self.queue_depth = Gauge("viper_queue_depth", "Messages waiting in a queue.", ("queue",))
+        self.families = [self.responses, self.filter_verdicts, self.handler_seconds, self.body_fetch_seconds,
+                         self.capture_wait_seconds, self.captures_in_flight, self.captured_bytes, self.messages_dropped, self.phase_seconds, self.settle_seconds, self.queue_depth]
+
+    def snapshot(self):
+        """ {name: {'type', 'help', 'series': [...]}} of every family. """
+        return {family.name: {'type': family.kind, 'help': family.help, 'series': family.series()} for family in self.families}
+
+    def to_prometheus(self):
+        """ Prometheus text exposition format (0.0.4). """
+        lines = []
+        for family in self.families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            lines.extend(family.exposition())
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'started': self.started, 'written': time.time(), 'metrics': self.snapshot()}, f, indent=2)
+
+    def summary_lines(self):
+        """ Short human-readable digest (GUI metrics pane, CLI). """
+        lines = []
+        outcomes = ", ".join(f"{s['labels']['outcome']} {s['value']}" for s in self.responses.series())
+        lines.append(f"Responses: {self.responses.total()} ({outcomes or 'none yet'})")
+        rejected = [s for s in self.filter_verdicts.series() if s['labels']['accepted'] == 'false']
+        if rejected:
+            lines.append("Filtered by: " + ", ".join(f"{s['labels']['rule']} {s['value']}" for s in sorted(rejected, key=lambda s: -s['value'])))
+        for label, histogram in (("handle_response", self.handler_seconds), ("body fetch", self.body_fetch_seconds),
+                                 ("capture slot wait", self.capture_wait_seconds)):
+            p50, p95 = histogram.quantile(0.5), histogram.quantile(0.95)
+            if p50 is not None:
+                lines.append(f"{label}: p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+        captured = self.captured_bytes.total()
+        if captured: lines.append(f"Captured bodies: {captured / 1024:.0f} KB")
+        phases = self.phase_seconds.series()
+        if phases:
+            lines.append("Phases: " + ", ".join(f"{s['labels']['phase']} {s['sum']:.1f}s" + (f" ({s['count']}x)" if s['count'] > 1 else "") for s in phases))
+        settles = self.settle_seconds.series()
+        if settles:
+            lines.append(f"Settle waits: {settles[0]['sum']:.1f}s in {settles[0]['count']} wait(s) (within the phases)")
+        depths = ", ".join(f"{s['labels']['queue']} {s['value']}" for s in self.queue_depth.series())
+        if depths: lines.append(f"Queue depth: {depths}")
+        dropped = self.messages_dropped.total()
+        if dropped: lines.append(f"Dropped messages: {dropped}")
+        return lines
+
+
+class MetricsServer:
+    """
+    Serves metrics on http://<host>:<port>/metrics (Prometheus text) and /metrics.json from a
+    background thread. `source` is a ScanMetrics or a callable returning the current one (or None).
+    """
+    def __init__(self, source, port, host="127.0.0.1"):
+        self.source = source if callable(source) else (lambda: source)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                metrics = server.source()
+                path = self.path.split('?')[0]
+                if path in ("/metrics", "/"):
+                    body = (metrics.to_prometheus() if metrics else "").encode('utf-8'); content_type = PROMETHEUS_CONTENT_TYPE
+                elif path == "/metrics.json":
+                    body = json.dumps(metrics.snapshot() if metrics else {}).encode('utf-8'); content_type = "application/json"
+                else:
+                    self.send_error(404); return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args): pass # Scrapes every few seconds would flood the log
+
+        self._server = ThreadingHTTPServer((host, port), Handler) # Raises OSError if the port is taken
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="viper-metrics", daemon=True)
+        self._thread.start()
+        log.info(f"Serving scan metrics on http://{host}:{self.port}/metrics")
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
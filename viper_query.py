@@ -0,0 +1,256 @@
+"""
+Viper API Interceptor - filter query language for the results table, exports and the CLI.
+
+    method:POST status:2xx host:*.example.com size:>1mb header:authorization graphql
+
+A query is a list of space-separated clauses that must all match. A bare word is the plain
+filter: a case-insensitive substring of the record's search text (method, status, URL,
+template and content type). `field:value` tests one attribute:
+
+  method:GET,POST           one of these methods
+  status:2xx status:404,5xx status:>=400 status:200-299 status:none
+  hits:>10                  template mode hit count (same comparisons)
+  size:>1mb size:<=512 size:10kb-2mb   response body size in bytes (b/kb/mb/gb, 1024-based)
+  host:*.example.com        glob on the host (case-insensitive); path:/api/*/users glob on the path
+  url:text type:json template:text target:text    case-insensitive substrings
+  header:authorization header:content-type=json   request or response header present (value substring)
+
+Commas inside one clause mean "any of". A leading '-' negates a clause, and values with
+spaces go in double quotes. parse_query() compiles the text once into a Query whose clauses
+hold both a predicate and their parsed form, so viper_store can turn them into SQL. Each
+clause also offers literal "hints" (substrings the search text must contain), which the
+results model looks up in its trigram index before running the predicate on the candidates.
+"""
+import fnmatch
+import functools
+import re
+from operator import attrgetter
+from urllib.parse import urlsplit
+
+SEARCH_FIELD_SEPARATOR = '\n' # Not typeable in the filter entry, so a match never spans two fields
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'kb': 1024, 'm': 1024 ** 2, 'mb': 1024 ** 2, 'g': 1024 ** 3, 'gb': 1024 ** 3}
+FIELDS = ('method', 'status', 'hits', 'size', 'host', 'path', 'url', 'type', 'template', 'target', 'header')
+CLAUSE_COST = {'host': 2, 'path': 2, 'header': 3} # Evaluation order; other fields are plain attribute tests
+FIELD_ALIASES = {'content_type': 'type', 'ctype': 'type', 'code': 'status', 'domain': 'host'}
+
+_TOKEN_RE = re.compile(r'(-?)(?:([A-Za-z_]+):)?("[^"]*"?|\S+)')
+_COMPARISON_RE = re.compile(r'(>=|<=|>|<|=)?(.+)')
+_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)([a-z]*)')
+_LOCATION_RE = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*://([^/?#]*)([^?#]*)') # netloc, path (what urlsplit returns)
+_GLOB_SPECIAL_RE = re.compile(r'\[[^\]]*\]|[*?]') # Wildcards and [...] classes
+
+
+class QueryError(ValueError):
+    """ A filter query that cannot be parsed; the message names the offending clause. """
+
+
+def search_text(record):
+    """ Lowercase text searched by the plain filter: method, status, URL, template and content type. """
+    return SEARCH_FIELD_SEPARATOR.join((record.method or '', str(record.status), record.url or '',
+                                        record.template or '', record.content_type or '')).lower()
+
+
+def record_location(record):
+    """ (host, path) a record is filed under: its template's URL in template mode, else its URL. """
+    location = (record.template.partition(' ')[2] if record.template else record.url) or ''
+    match = _LOCATION_RE.match(location) # Per-record cost matters when a query scans every row
+    if match: return match.group(1).lower(), match.group(2)
+    try: parts = urlsplit(location)
+    except ValueError: return None, None
+    return parts.netloc.lower(), parts.path
+
+
+class Clause:
+    """
+    One parsed clause. `field` is None for a bare word. The parsed value is in whichever
+    of text / values / ranges (+ missing) / pattern / name applies to the field.
+    """
+    __slots__ = ('field', 'negate', 'raw', 'text', 'values', 'ranges', 'missing', 'pattern', 'name', 'test', 'hints')
+
+    def __init__(self, field, negate, raw):
+        self.field = field; self.negate = negate; self.raw = raw
+        self.text = None; self.values = None; self.ranges = (); self.missing = False
+        self.pattern = None; self.name = None
+        self.test = None # (record, search_text) -> bool, without negation
+        self.hints = () # Lowercase substrings of the search text implied by a (non-negated) match
+
+    def __repr__(self):
+        return f"<Clause {self.raw!r}>"
+
+
+class Query:
+    """ Parsed filter query: all clauses must match. An empty query matches everything. """
+    __slots__ = ('text', 'clauses')
+
+    def __init__(self, text, clauses):
+        self.text = text # Normalized query text (single spaces), used to detect changes
+        self.clauses = clauses
+
+    def __bool__(self):
+        return bool(self.clauses)
+
+    def __repr__(self):
+        return f"<Query {self.text!r}>"
+
+    def plain_term(self):
+        """ The lowercase term of a one-bare-word query (the plain substring filter), else None. """
+        if len(self.clauses) == 1 and self.clauses[0].field is None and not self.clauses[0].negate:
+            return self.clauses[0].text
+        return None
+
+    def hints(self):
+        """ Lowercase substrings every matching record's search text contains. """
+        return [hint for clause in self.clauses if not clause.negate for hint in clause.hints]
+
+    def matches(self, record, text=None):
+        """ True if the record matches every clause. `text` is its search_text(), if already known. """
+        if text is None and self.clauses: text = search_text(record)
+        for clause in self.clauses:
+            if clause.test(record, text) == clause.negate: return False
+        return True
+
+
+def parse_size(value):
+    match = _NUMBER_RE.fullmatch(value)
+    if not match or match.group(2) not in SIZE_UNITS: raise ValueError(value)
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_ranges(value, number, status=False):
+    """ 'none', '404', '>=400', '<1mb', '200-299', '2xx' (status), comma-separated -> ([(low, high)], missing). None = unbounded. """
+    ranges, missing = [], False
+    for part in value.split(','):
+        part = part.strip()
+        if not part: continue
+        if part == 'none': missing = True; continue
+        if status and len(part) == 3 and part[0].isdigit() and part[1:] == 'xx':
+            base = int(part[0]) * 100
+            ranges.append((base, base + 99)); continue
+        op, operand = _COMPARISON_RE.fullmatch(part).groups()
+        if op is None and '-' in operand:
+            low, _, high = operand.partition('-')
+            ranges.append((number(low), number(high))); continue
+        bound = number(operand)
+        if op == '>': ranges.append((bound + 1, None))
+        elif op == '>=': ranges.append((bound, None))
+        elif op == '<': ranges.append((None, bound - 1))
+        elif op == '<=': ranges.append((None, bound))
+        else: ranges.append((bound, bound))
+    if not ranges and not missing: raise ValueError(value)
+    return ranges, missing
+
+
+def _ranges_test(ranges, missing, attr):
+    """ Predicate of a numeric clause over record.<attr> (an int, None or a numeric string). """
+    bounds = tuple((float('-inf') if low is None else low, float('inf') if high is None else high) for low, high in ranges)
+    value_of = attrgetter(attr)
+    if len(bounds) == 1:
+        (low, high), = bounds
+        def test(record, text):
+            value = value_of(record)
+            if value.__class__ is not int: value = _as_int(value)
+            return missing if value is None else low <= value <= high
+    else:
+        def test(record, text):
+            value = value_of(record)
+            if value.__class__ is not int: value = _as_int(value)
+            if value is None: return missing
+            for low, high in bounds:
+                if low <= value <= high: return True
+            return False
+    return test
+
+
+@functools.lru_cache(maxsize=256)
+def glob_matcher(pattern):
+    """ match() of a host/path glob: fnmatch syntax ([!...] negates), case-sensitive. Shared with viper_store's SQL. """
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def glob_literal(pattern):
+    """ Longest run of a glob pattern without wildcards (a substring every match contains). """
+    return max(_GLOB_SPECIAL_RE.split(pattern), key=len)
+
+
+def _numeric_clause(clause, value, attr, number, status=False):
+    clause.ranges, clause.missing = ranges, missing = parse_ranges(value.lower(), number, status)
+    clause.test = _ranges_test(ranges, missing, 'body_size' if attr == 'size' else attr)
+    if status and not missing and len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        clause.hints = (str(ranges[0][0]),)
+
+
+def _as_int(value):
+    if value is None: return None
+    try: return int(value)
+    except (TypeError, ValueError): return None
+
+
+def _substring_clause(clause, value, attr):
+    clause.text = term = value.lower()
+    clause.test = lambda record, text: term in (getattr(record, attr) or '').lower()
+    if attr in ('url', 'template', 'content_type'): clause.hints = (term,)
+
+
+def _build_clause(field, negate, value, raw):
+    clause = Clause(field, negate, raw)
+    if field is None:
+        clause.text = term = value.lower()
+        clause.test = lambda record, text: term in text
+        clause.hints = (term,)
+    elif field == 'method':
+        clause.values = values = tuple(v.strip().upper() for v in value.split(',') if v.strip())
+        if not values: raise ValueError(value)
+        clause.test = lambda record, text: (record.method or '').upper() in values
+        if len(values) == 1: clause.hints = (values[0].lower(),)
+    elif field == 'status':
+        _numeric_clause(clause, value, 'status', int, status=True)
+    elif field == 'hits':
+        _numeric_clause(clause, value, 'hits', int)
+    elif field == 'size':
+        _numeric_clause(clause, value, 'size', parse_size)
+    elif field in ('host', 'path'):
+        clause.pattern = pattern = value.lower() if field == 'host' else value
+        matcher = glob_matcher(pattern)
+        index = 0 if field == 'host' else 1
+        clause.test = lambda record, text: bool(matcher(record_location(record)[index] or ''))
+        literal = glob_literal(pattern).lower()
+        if literal: clause.hints = (literal,)
+    elif field == 'url': _substring_clause(clause, value, 'url')
+    elif field == 'type': _substring_clause(clause, value, 'content_type')
+    elif field == 'template': _substring_clause(clause, value, 'template')
+    elif field == 'target': _substring_clause(clause, value, 'target')
+    elif field == 'header':
+        name, _, wanted = value.partition('=')
+        clause.name = name = name.strip().lower()
+        if not name: raise ValueError(value)
+        clause.text = wanted = wanted.lower() or None
+        if wanted is None: clause.test = lambda record, text: bool(record.header_values(name))
+        else: clause.test = lambda record, text: any(wanted in str(v).lower() for v in record.header_values(name))
+    return clause
+
+
+def _field_name(name):
+    name = name.lower()
+    return FIELD_ALIASES.get(name, name)
+
+
+def parse_query(text):
+    """ Compiles a filter query. Raises QueryError on a clause it cannot parse (e.g. 'size:>1zb'). """
+    clauses, tokens = [], []
+    for match in _TOKEN_RE.finditer(text or ''):
+        negate, field, value = match.groups()
+        field = _field_name(field) if field else None
+        if field is not None and field not in FIELDS: # 'https://...' is a word, not a field
+            negate, field, value = match.group(1), None, match.group(0)[len(match.group(1)):]
+        elif field is None and value.endswith(':') and _field_name(value[:-1]) in FIELDS:
+            continue # 'status:' while its value is still being typed
+        if value.startswith('"'): value = value[1:-1] if len(value) > 1 and value.endswith('"') else value[1:]
+        if not value:
+            if field is None: continue # A lone '""'
+            raise QueryError(f"'{match.group(0)}' needs a value")
+        try: clauses.append(_build_clause(field, bool(negate), value, match.group(0)))
+        except (ValueError, TypeError):
+            raise QueryError(f"Cannot parse '{match.group(0)}'") from None
+        tokens.append(match.group(0))
+    clauses.sort(key=lambda clause: CLAUSE_COST.get(clause.field, 1)) # Cheap tests first; stable otherwise
+    return Query(' '.join(tokens), clauses)
@@ -0,0 +1,283 @@
+"""
+Viper API Interceptor - compact record type for captured API calls.
+
+A scan can capture 100k+ calls, and the GUI keeps every one of them for the whole session.
+A plain dict per call used about 2-3 KB before counting the body: two header dicts, a
+preformatted snippet and the body as a base64 string (4/3 of its size). ApiRecord stores:
+
+  * fields in __slots__ (no per-instance __dict__);
+  * headers as one flat (name, value, name, value, ...) tuple. Names, short values, the
+    method and the content type are interned, so the copies repeated across thousands of
+    records are shared;
+  * raw response body bytes (or a blob reference, see viper_blobs), never base64 - except
+    for records read back from a saved file, which keep the file's base64 text and decode
+    it only when the body is needed (a re-export writes the text back unchanged);
+  * no snippet. response_snippet is formatted on access, e.g. when a row is selected.
+
+to_dict()/from_dict() convert to and from the JSON layout of journals and exports.
+"""
+import base64
+import codecs
+import logging
+import sys
+
+from viper_blobs import read_blob
+
+log = logging.getLogger(__name__)
+
+INTERN_VALUE_MAX = 256 # Header values up to this length are interned (accept, user-agent, content-type, ...)
+SNIPPET_LIMIT = 300 # Max characters for snippet
+SNIPPET_READ_LIMIT = 4096 # Bytes of a body (at most) decoded to format its snippet
+SNIPPET_CHUNK_BYTES = 512 # Bytes decoded at a time while building a snippet
+JSON_SCALAR_CHARS = frozenset('-+.0123456789eEtruefalsn') # Numbers, true, false, null
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) and len(value) <= INTERN_VALUE_MAX else value
+
+
+def pack_headers(headers):
+    """ {name: value} -> flat (name, value, ...) tuple with interned strings; None/empty -> (). """
+    if not headers: return ()
+    packed = []
+    for name, value in headers.items():
+        packed.append(sys.intern(str(name))); packed.append(_intern(value))
+    return tuple(packed)
+
+
+def unpack_headers(packed):
+    """ Flat header tuple -> new {name: value} dict. """
+    return dict(zip(packed[::2], packed[1::2]))
+
+
+def decode_prefix(body_bytes, max_chars, chunk_size=SNIPPET_CHUNK_BYTES, truncated=False):
+    """
+    Yields decoded text chunks of the start of a body, stopping once about max_chars characters
+    were produced. UTF-8 is decoded incrementally, so a character split across chunks is never
+    mangled and the rest of the body is never touched. Pass truncated=True when `body_bytes` is
+    only a prefix of the body: a character cut off at its end is then dropped, not replaced.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    produced = 0
+    for offset in range(0, len(body_bytes), chunk_size):
+        chunk = body_bytes[offset:offset + chunk_size]
+        text = decoder.decode(chunk, final=not truncated and offset + chunk_size >= len(body_bytes))
+        if text: yield text
+        produced += len(text)
+        if produced >= max_chars: return
+
+
+def pretty_json_prefix(chunks, limit):
+    """
+    Re-indents the JSON text in `chunks` like json.dumps(indent=2) until `limit` characters are
+    produced, without parsing the whole document: a truncated prefix still formats. Returns
+    (text, complete) where complete means all input was consumed, or None if the input is not JSON.
+    Strings and numbers are copied as written (escapes are not normalised).
+    """
+    out = []; size = 0
+    depth = 0
+    opened = False # Just after '{' / '[': an immediate close gives '{}' / '[]'
+    in_string = escaped = False
+    for chunk in chunks:
+        for ch in chunk:
+            if in_string:
+                out.append(ch); size += 1
+                if escaped: escaped = False
+                elif ch == '\\': escaped = True
+                elif ch == '"': in_string = False
+            elif ch in ' \t\r\n':
+                continue
+            elif ch in '}]':
+                if depth == 0: return None
+                depth -= 1
+                piece = ch if opened else '\n' + '  ' * depth + ch
+                out.append(piece); size += len(piece); opened = False
+            else:
+                if opened:
+                    piece = '\n' + '  ' * depth
+                    out.append(piece); size += len(piece); opened = False
+                if ch in '{[':
+                    out.append(ch); size += 1
+                    depth += 1; opened = True
+                elif ch == ',':
+                    if depth == 0: return None
+                    piece = ',\n' + '  ' * depth
+                    out.append(piece); size += len(piece)
+                elif ch == ':':
+                    out.append(': '); size += 2
+                elif ch == '"':
+                    out.append(ch); size += 1; in_string = True
+                elif ch in JSON_SCALAR_CHARS:
+                    out.append(ch); size += 1
+                else:
+                    return None # Not JSON (e.g. an HTML error page served as application/json)
+            if size > limit:
+                return ''.join(out), False
+    return ''.join(out), True
+
+
+def format_response_snippet_pro_thread(body_bytes, content_type, total_size=None):
+    """
+    Generates a display snippet from the response body (UTF-8 focused). `total_size` is the size of a body given only partially.
+    Only the start of the body is decoded, so the cost is bounded by SNIPPET_LIMIT, not by the body size.
+    """
+    if body_bytes is None: return "[No Response Body Captured]"
+    if not body_bytes: return "[Empty Response Body]"
+
+    limit = SNIPPET_LIMIT
+    size = len(body_bytes) if total_size is None else total_size
+    try:
+        content_type = content_type.lower() if content_type else ''
+        # Try decoding as UTF-8 if it's likely text
+        is_text_based = content_type.startswith('text/') or any(sub in content_type for sub in ['json', 'xml', 'javascript', 'html'])
+
+        if is_text_based:
+            prefix = body_bytes[:SNIPPET_READ_LIMIT] # Enough for `limit` characters, even pretty-printed
+            whole = len(prefix) >= size
+            if 'json' in content_type:
+                # Re-indent the start of the document; a cut-off prefix still formats
+                pretty = pretty_json_prefix(decode_prefix(prefix, SNIPPET_READ_LIMIT, truncated=not whole), limit)
+                if pretty is not None:
+                    snippet, complete = pretty
+                    return snippet[:limit] + ('...' if len(snippet) > limit or not (complete and whole) else '')
+            # Raw text for other text types, or when the JSON content-type lies
+            snippet = ''.join(decode_prefix(prefix, limit + 1, truncated=not whole))
+            return snippet[:limit] + ('...' if len(snippet) > limit or not whole else '')
+        else:
+            # For binary or unknown, show type and size
+            size_kb = size / 1024
+            return f"[Binary Data ({content_type or 'Unknown Type'}), Size: {size_kb:.2f} KB]"
+    except Exception as e:
+        # Log the error? maybe just return a placeholder
+        log.debug(f"Error formatting snippet (size {size}): {e}")
+        return f"[Error formatting snippet, Size: {size} bytes]"
+
+
+class ApiRecord:
+    """ One captured API call. Records are created on the scan thread and handed to the GUI/CLI through the queue. """
+    __slots__ = ('method', 'url', 'status', 'content_type', 'request_body', 'response_body', 'response_body_blob',
+                 'response_body_b64', 'template', 'hits', 'samples', 'target', '_request_headers', '_response_headers')
+
+    def __init__(self, method, url, status=None, content_type='', request_headers=None, request_body=None,
+                 response_headers=None, response_body=None, response_body_blob=None, template=None, hits=1,
+                 samples=None, target=None):
+        self.method = sys.intern(method) if method else method
+        self.url = url
+        self.status = status
+        self.content_type = _intern(content_type or '')
+        self._request_headers = pack_headers(request_headers)
+        self.request_body = request_body or None # Raw bytes (or None)
+        self._response_headers = pack_headers(response_headers)
+        self.response_body = response_body # Raw bytes, None if not captured or spilled to the blob store
+        self.response_body_blob = response_body_blob # {'sha256', 'size', 'path'} of a spilled body
+        self.response_body_b64 = None # Base64 text of a body read from a saved file, decoded on demand (see from_dict)
+        self.template = template # Endpoint template (template mode), also the record's key
+        self.hits = hits
+        self.samples = samples # Concrete URLs of a template (template mode)
+        self.target = target # Batch target that produced this call
+
+    def __repr__(self):
+        return f"<ApiRecord {self.method} {self.url} {self.status}>"
+
+    @property
+    def key(self):
+        """ The key results are deduplicated on: the endpoint template, or 'METHOD URL'. """
+        return self.template or f"{self.method} {self.url}"
+
+    @property
+    def request_headers(self):
+        return unpack_headers(self._request_headers)
+
+    @property
+    def response_headers(self):
+        return unpack_headers(self._response_headers)
+
+    def header_values(self, name):
+        """ Values of the request and response headers called `name` (case-insensitive), without unpacking them. """
+        name = name.lower()
+        packed = self._request_headers + self._response_headers
+        return [packed[i + 1] for i in range(0, len(packed), 2) if packed[i].lower() == name]
+
+    @property
+    def body_size(self):
+        if self.response_body_blob: return self.response_body_blob['size']
+        if self.response_body_b64 is not None:
+            b64 = self.response_body_b64
+            return len(b64) * 3 // 4 - b64[-2:].count('=')
+        return len(self.response_body) if self.response_body is not None else None
+
+    def load_body(self, limit=None):
+        """ Raw response body (at most `limit` bytes), inline or read from its blob; None if no body was captured. Raises OSError if the blob is gone. """
+        if self.response_body_blob:
+            return read_blob(self.response_body_blob, limit)
+        if self.response_body_b64 is not None: # Not cached: the text is the only copy kept
+            if limit is None: return base64.b64decode(self.response_body_b64)
+            return base64.b64decode(self.response_body_b64[:-(-limit // 3) * 4])[:limit]
+        if self.response_body is None: return None
+        return self.response_body if limit is None else self.response_body[:limit]
+
+    def body_base64(self, limit=None):
+        """ The response body as a base64 string (for exports), or None. """
+        if self.response_body_b64 is not None and limit is None: return self.response_body_b64
+        body = self.load_body(limit)
+        return base64.b64encode(body).decode('ascii') if body else None
+
+    @property
+    def response_snippet(self):
+        """ Short display text of the response body, formatted on each access (never stored). """
+        if self.response_body_blob:
+            try: body = self.load_body(SNIPPET_READ_LIMIT)
+            except OSError as e: return f"[Response body blob unavailable: {e}]"
+            return format_response_snippet_pro_thread(body, self.content_type, total_size=self.response_body_blob['size'])
+        if self.response_body_b64 is not None:
+            return format_response_snippet_pro_thread(self.load_body(SNIPPET_READ_LIMIT), self.content_type, total_size=self.body_size)
+        return format_response_snippet_pro_thread(self.response_body, self.content_type)
+
+    def copy(self):
+        """ Shallow copy with its own samples list (e.g. a snapshot taken for the journal). """
+        clone = ApiRecord.__new__(ApiRecord)
+        for name in ApiRecord.__slots__:
+            setattr(clone, name, getattr(self, name))
+        if self.samples is not None: clone.samples = list(self.samples)
+        return clone
+
+    def field_names(self):
+        """ Keys of to_dict(), without building it. """
+        names = ['method', 'url', 'status', 'content_type', 'request_headers', 'request_body', 'response_headers', 'raw_response_body_bytes']
+        if self.response_body_blob: names.append('response_body_blob')
+        if self.template is not None: names += ['template', 'hits', 'samples']
+        if self.target is not None: names.append('target')
+        return names
+
+    def to_dict(self, body_limit=None, include_body=True):
+        """
+        Export/journal layout: header dicts and a base64 'raw_response_body_bytes' (request_body stays bytes).
+        A spilled body is read from its blob unless include_body is False; the blob reference is kept too.
+        """
+        data = {
+            "method": self.method, "url": self.url, "status": self.status, "content_type": self.content_type,
+            "request_headers": self.request_headers, "request_body": self.request_body,
+            "response_headers": self.response_headers,
+            "raw_response_body_bytes": self.body_base64(body_limit) if include_body or not self.response_body_blob else None,
+        }
+        if self.response_body_blob: data["response_body_blob"] = self.response_body_blob
+        if self.template is not None: data.update(template=self.template, hits=self.hits, samples=list(self.samples or ()))
+        if self.target is not None: data["target"] = self.target
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a record from the export/journal layout (unknown keys are ignored). The base64
+        body is kept as is and decoded when the body is needed (load_body).
+        """
+        raw_body_b64 = data.get('raw_response_body_bytes')
+        blob_ref = None if raw_body_b64 else data.get('response_body_blob') # An inline copy beats a blob path from another run
+        request_body = data.get('request_body')
+        if isinstance(request_body, str): request_body = request_body.encode('utf-8')
+        record = cls(
+            data.get('method') or 'GET', data.get('url', ''), data.get('status'), data.get('content_type') or '',
+            data.get('request_headers'), request_body, data.get('response_headers'), None,
+            blob_ref, data.get('template'), data.get('hits', 1), data.get('samples'), data.get('target'))
+        if raw_body_b64: record.response_body_b64 = raw_body_b64
+        return record
@@ -0,0 +1,267 @@
+"""
+Viper API Interceptor - data model behind the results table.
+
+The table used to keep one ttk.Treeview item per result. Filtering detached every item and
+moved each match back, and sorting moved every row again, so each keystroke cost
+O(rows) Tk calls. That took seconds past ~20k rows. ResultsModel keeps the row order in
+plain Python lists:
+
+  * `view` holds the api_keys of the visible rows in display order (filtered, maybe sorted);
+  * each record has one lowercase search string, and a SubstringIndex keeps the trigrams of
+    those strings (updated as records arrive), so a term is tested against the rows holding
+    its rarest trigram instead of every row. When the new term extends the old one and the
+    current view is smaller, only the view is searched;
+  * a structured query (viper_query: `method:POST status:2xx ...`) looks up its most
+    selective literal hint in the same index and runs its compiled predicate on those
+    candidates only;
+  * key -> row lookups are built lazily and dropped when the order changes.
+
+The GUI's virtual table asks the model only for the rows in its viewport.
+
+StoreResultsModel is the same interface over a viper_store.ResultStore: its rows are store
+row ids, and filtering/sorting are SQL queries, so only the ids of the visible rows are held.
+"""
+
+from array import array
+
+from viper_query import SEARCH_FIELD_SEPARATOR, parse_query, search_text
+
+NGRAM = 3 # Index gram length; shorter terms are matched by scanning
+NARROW_COST = 3 # Re-testing a view row (dict lookup) costs about this many index candidates
+SHORT_TERM_UNION_LIMIT = 1.5 # Above this many posting entries per row, scanning is faster than the union
+
+
+def text_grams(text):
+    """ Distinct NGRAM-character substrings of each field of a search text; a shorter field is a gram of its own. """
+    grams = set()
+    for field in text.split(SEARCH_FIELD_SEPARATOR):
+        if len(field) >= NGRAM: grams.update([field[i:i + NGRAM] for i in range(len(field) - NGRAM + 1)])
+        elif field: grams.add(field)
+    return grams
+
+
+class SubstringIndex:
+    """
+    Trigram index of search texts in insertion order. Each gram maps to the ascending
+    ordinals of the texts containing it (an array of ints, 4 bytes per entry), so results
+    come out in insertion order. A term of NGRAM+ characters is tested only against the
+    texts of its rarest gram. Every occurrence of a shorter term lies inside some gram, so
+    its rows are the union of the postings of the grams containing it. That union is used
+    while it is smaller than a plain scan; broad terms such as a single letter are scanned.
+    Texts are only ever added; Clear/Load build a new index.
+    """
+    def __init__(self):
+        self.keys = [] # ordinal -> key
+        self.texts = [] # ordinal -> search text
+        self.postings = {} # gram -> array('i') of ordinals
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, text):
+        ordinal = len(self.keys)
+        self.keys.append(key); self.texts.append(text)
+        postings = self.postings
+        for gram in text_grams(text):
+            try: postings[gram].append(ordinal)
+            except KeyError: postings[gram] = array('i', (ordinal,))
+
+    def rarest(self, term):
+        """ Smallest posting among the grams of an NGRAM+ character term (empty if a gram is missing). """
+        postings = self.postings
+        best = None
+        for gram in text_grams(term):
+            posting = postings.get(gram)
+            if posting is None: return ()
+            if best is None or len(posting) < len(best): best = posting
+        return best
+
+    def cost(self, term):
+        """ Rows search() tests for `term`, for choosing between it and narrowing a smaller view. """
+        if len(term) >= NGRAM and SEARCH_FIELD_SEPARATOR not in term: return len(self.rarest(term))
+        return len(self.keys)
+
+    def search(self, term):
+        """ Keys whose text contains `term`, in insertion order. """
+        keys, texts = self.keys, self.texts
+        if SEARCH_FIELD_SEPARATOR not in term: # Otherwise only a scan finds it
+            if len(term) >= NGRAM:
+                ordinals = self.rarest(term)
+                if len(term) == NGRAM: return [keys[o] for o in ordinals] # The gram is the term
+                return [keys[o] for o in ordinals if term in texts[o]]
+            postings = [posting for gram, posting in self.postings.items() if term in gram]
+            if sum(map(len, postings)) <= SHORT_TERM_UNION_LIMIT * len(keys):
+                found = set()
+                for posting in postings: found.update(posting)
+                return [keys[o] for o in sorted(found)]
+        return [key for key, text in zip(keys, texts) if term in text]
+
+
+class ResultsModel:
+    """ Visible row order of the results table: insertion order, narrowed by the filter, optionally sorted. """
+    def __init__(self, records=None):
+        self.reset(records if records is not None else {})
+
+    def reset(self, records):
+        """ Switches to a new {api_key: ApiRecord} store (e.g. after Clear) and rebuilds the view. """
+        self.records = records
+        self._search = {}
+        self._index = SubstringIndex()
+        for key, record in records.items():
+            text = self._search[key] = search_text(record)
+            self._index.add(key, text)
+        self.query = parse_query('')
+        self.filter_term = '' # Normalized text of the query
+        self._plain = '' # Lowercase term of a plain (one bare word) query, None for structured queries
+        self.sort_attr = None; self.sort_reverse = False
+        self.view = list(records)
+        self._rows = None
+
+    def __len__(self):
+        return len(self.view)
+
+    def key_at(self, row):
+        return self.view[row]
+
+    def row_of(self, key):
+        """ Row index of a key in the current view, or None if it is filtered out. """
+        if self._rows is None:
+            self._rows = {k: i for i, k in enumerate(self.view)}
+        return self._rows.get(key)
+
+    def matches(self, key):
+        if self._plain is not None: return self._plain in self._search[key]
+        return self.query.matches(self.records[key], self._search[key])
+
+    def row_record(self, key):
+        """ Record whose table columns are shown for a row. """
+        return self.records[key]
+
+    def visible_records(self):
+        """ {key: record} of the visible rows in table order (export visible). """
+        return {key: self.records[key] for key in self.view}
+
+    def add(self, key):
+        """ Registers a record already stored under `key`. Returns its row, or None if the filter hides it. """
+        text = self._search[key] = search_text(self.records[key])
+        self._index.add(key, text)
+        if not self.matches(key): return None
+        self.view.append(key) # New rows go to the end, as with the Treeview, even when sorted
+        if self._rows is not None: self._rows[key] = len(self.view) - 1
+        return len(self.view) - 1
+
+    def set_filter(self, term):
+        """
+        Applies a filter query (a plain word is a case-insensitive substring); rows come back in
+        insertion order. Returns True if the view changed. Raises viper_query.QueryError, leaving the view as it was.
+        """
+        query = parse_query(term)
+        if query.text == self.filter_term: return False
+        plain = query.plain_term()
+        if not query:
+            self.view = list(self.records)
+        elif plain is None:
+            self.view = self._query_view(query)
+        elif self._plain and self._plain in plain and self.sort_attr is None and len(self.view) * NARROW_COST < self._index.cost(plain):
+            search = self._search # Only rows matching the old term can match the new one
+            self.view = [key for key in self.view if plain in search[key]]
+        else:
+            self.view = self._index.search(plain)
+        self.query = query; self.filter_term = query.text; self._plain = plain
+        self.sort_attr = None; self.sort_reverse = False
+        self._rows = None
+        return True
+
+    def _query_view(self, query):
+        """ Keys matching a structured query: candidates of its most selective hint, checked by its predicate. """
+        index, records, search = self._index, self.records, self._search
+        hints = query.hints()
+        if not hints: return [key for key in records if query.matches(records[key], search[key])]
+        best = min(hints, key=index.cost)
+        candidates = index.search(best)
+        for hint in hints: # Plain substring tests, much cheaper than the predicate
+            if hint != best: candidates = [key for key in candidates if hint in search[key]]
+        return [key for key in candidates if query.matches(records[key], search[key])]
+
+    def sort(self, attr, reverse=False, numeric=False):
+        """ Sorts the visible rows by a record attribute. Missing/non-numeric values always go last. """
+        records = self.records
+        missing = float('inf') if not reverse else float('-inf')
+
+        def sort_key(key):
+            val = getattr(records[key], attr, None)
+            if val is None: return missing # Handle missing values (sort Nones last)
+            if numeric:
+                try: return int(val)
+                except (ValueError, TypeError): return missing # Non-numeric status codes last
+            return str(val).lower() # Case-insensitive string sort
+
+        if numeric:
+            self.view.sort(key=sort_key, reverse=reverse)
+        else: # Strings and the +/-inf placeholder do not compare; keep them apart
+            present = [key for key in self.view if getattr(records[key], attr, None) is not None]
+            absent = [key for key in self.view if getattr(records[key], attr, None) is None]
+            present.sort(key=sort_key, reverse=reverse)
+            self.view = present + absent
+        self.sort_attr = attr; self.sort_reverse = reverse
+        self._rows = None
+
+
+class StoreResultsModel:
+    """ ResultsModel over a ResultStore. Keys are row ids; new rows are picked up by poll(). """
+    def __init__(self, store, records):
+        self.reset(store, records)
+
+    def reset(self, store, records):
+        """ Switches to a (possibly different) store and rebuilds the view. `records` is its StoreRecords. """
+        self.store = store
+        self.records = records
+        self.query = parse_query('')
+        self.filter_term = ''
+        self.sort_attr = None; self.sort_reverse = False
+        self.last_id = store.max_id()
+        self.view = store.query_ids(upto_id=self.last_id)
+        self._rows = None # {row id: row}, built on first row_of()
+
+    def __len__(self):
+        return len(self.view)
+
+    def key_at(self, row):
+        return self.view[row]
+
+    def row_of(self, key):
+        """ Row index of a row id in the current view, or None if it is filtered out. """
+        if self._rows is None:
+            self._rows = {k: i for i, k in enumerate(self.view)}
+        return self._rows.get(key)
+
+    def row_record(self, key):
+        return self.store.summary(key) # Table columns only; bodies stay in the file
+
+    def visible_records(self):
+        return self.records.subset(self.view) # Streamed by id on export
+
+    def poll(self):
+        """ Appends rows committed since the last poll (if they match the filter). Returns how many were added. """
+        last_id = self.store.max_id()
+        if last_id <= self.last_id: return 0
+        new = self.store.query_ids(self.query, after_id=self.last_id, upto_id=last_id)
+        if self._rows is not None:
+            self._rows.update((k, i) for i, k in enumerate(new, len(self.view)))
+        self.view.extend(new) # New rows go to the end, even when sorted (as in ResultsModel)
+        self.last_id = last_id
+        return len(new)
+
+    def set_filter(self, term):
+        query = parse_query(term) # Raises QueryError, like ResultsModel.set_filter
+        if query.text == self.filter_term: return False
+        self.view = self.store.query_ids(query, upto_id=self.last_id)
+        self._rows = None
+        self.query = query; self.filter_term = query.text
+        self.sort_attr = None; self.sort_reverse = False
+        return True
+
+    def sort(self, attr, reverse=False, numeric=False):
+        self.view = self.store.query_ids(self.query, sort=attr, reverse=reverse, upto_id=self.last_id)
+        self._rows = None
+        self.sort_attr = attr; self.sort_reverse = reverse
@@ -0,0 +1,337 @@
+"""
+Viper API Interceptor - incremental JSON schema inference and OpenAPI export.
+
+Every captured JSON request/response body is merged into a running schema for its endpoint
+(method + templated path, see viper_endpoints). Nothing is kept per capture, only per schema
+node: JSON types seen and how often, object properties (with how often each one was present,
+which gives `required`), one merged item schema per array, a few distinct short strings (enum
+candidates) and a string format candidate. Hard caps on depth, properties per object, array
+items merged and enum values keep the state bounded no matter how many bodies are merged.
+
+SchemaRegistry.to_openapi() renders an OpenAPI 3 document from that state at any time.
+SchemaCollector does the JSON parsing and merging on a background thread during a scan.
+"""
+import json
+import logging
+import queue
+import re
+import threading
+from urllib.parse import parse_qsl, urlsplit
+
+from viper_endpoints import template_value
+
+log = logging.getLogger(__name__)
+
+SCHEMA_MAX_DEPTH = 16 # Deeper values are merged as "any"
+SCHEMA_MAX_PROPERTIES = 256 # Properties tracked per object; more become additionalProperties
+SCHEMA_ARRAY_ITEMS = 32 # Items merged per array (the first ones)
+SCHEMA_ENUM_VALUES = 12 # Distinct strings kept as enum candidates
+SCHEMA_ENUM_VALUE_LENGTH = 64 # Longer strings are never enum candidates
+SCHEMA_ENUM_MIN_SAMPLES = 8 # Strings seen before a small value set is reported as an enum
+SCHEMA_BODY_LIMIT = 2 * 1024 * 1024 # Larger bodies are not parsed
+SCHEMA_SAMPLES_PER_ENDPOINT = 500 # Bodies merged per endpoint and status; later ones are not even fetched
+SCHEMA_QUEUE_SIZE = 2000 # Captures waiting for the collector thread; more are dropped (and counted)
+
+JSON_TYPES = ('null', 'boolean', 'integer', 'number', 'string', 'object', 'array')
+_STRING_FORMATS = [ # First match wins; checked on strings up to 100 chars
+    ('date-time', re.compile(r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?$')),
+    ('date', re.compile(r'^\d{4}-\d{2}-\d{2}$')),
+    ('uuid', re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')),
+    ('email', re.compile(r'^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$')),
+    ('uri', re.compile(r'^https?://\S+$')),
+]
+_PLACEHOLDER_SCHEMAS = {
+    '{int}': {'type': 'integer'}, '{uuid}': {'type': 'string', 'format': 'uuid'},
+    '{date}': {'type': 'string', 'format': 'date'}, '{hash}': {'type': 'string'}, '{token}': {'type': 'string'},
+}
+
+
+def string_format(value):
+    if len(value) > 100: return None
+    for name, pattern in _STRING_FORMATS:
+        if pattern.match(value): return name
+    return None
+
+
+_JSON_TYPE_NAMES = {type(None): 'null', bool: 'boolean', int: 'integer', float: 'number', str: 'string', dict: 'object', list: 'array'}
+
+
+def json_type(value):
+    """ JSON type name of a json.loads() value (exact types, so one dict lookup), or None. """
+    return _JSON_TYPE_NAMES.get(type(value))
+
+
+class SchemaNode:
+    """ Merged shape of every value seen at one position of a document. """
+    __slots__ = ('seen', 'types', 'properties', 'overflow', 'items', 'objects', 'strings', 'enum', 'format')
+
+    def __init__(self):
+        self.seen = 0
+        self.types = {} # JSON type -> count
+        self.properties = None # name -> SchemaNode (objects)
+        self.overflow = False # Properties beyond SCHEMA_MAX_PROPERTIES were dropped
+        self.objects = 0 # Objects merged (a property is required if its node saw all of them)
+        self.items = None # SchemaNode merged from array items
+        self.strings = 0 # Strings merged
+        self.enum = {} # Distinct short strings (None once there are too many)
+        self.format = '' # Format shared by every string so far ('' = none seen yet, None = mixed)
+
+    def merge(self, value, depth=0):
+        self.seen += 1
+        kind = _JSON_TYPE_NAMES.get(type(value)) # json_type(), inlined: this runs for every value of every body
+        if kind is None: return
+        self.types[kind] = self.types.get(kind, 0) + 1
+        if depth >= SCHEMA_MAX_DEPTH: return
+        if kind == 'object':
+            self.objects += 1
+            props = self.properties
+            if props is None: props = self.properties = {}
+            for name, child in value.items():
+                node = props.get(name)
+                if node is None:
+                    if len(props) >= SCHEMA_MAX_PROPERTIES:
+                        self.overflow = True; continue
+                    node = props[name] = SchemaNode()
+                node.merge(child, depth + 1)
+        elif kind == 'array':
+            if self.items is None: self.items = SchemaNode()
+            for item in value[:SCHEMA_ARRAY_ITEMS]:
+                self.items.merge(item, depth + 1)
+        elif kind == 'string':
+            self.strings += 1
+            if self.enum is not None:
+                if len(value) > SCHEMA_ENUM_VALUE_LENGTH: self.enum = None
+                elif value not in self.enum:
+                    if len(self.enum) >= SCHEMA_ENUM_VALUES: self.enum = None
+                    else: self.enum[value] = None
+            if self.format is not None:
+                fmt = string_format(value)
+                if self.format == '': self.format = fmt
+                elif fmt != self.format: self.format = None
+
+    def to_schema(self):
+        """ OpenAPI 3.0 schema object of this node. """
+        types = set(self.types)
+        nullable = 'null' in types
+        types.discard('null')
+        if 'integer' in types and 'number' in types: types.discard('integer')
+        schemas = [self._typed_schema(kind) for kind in JSON_TYPES if kind in types]
+        if not schemas:
+            schema = {'nullable': True} if nullable else {} # Only nulls (or nothing) seen: any type
+        elif len(schemas) == 1:
+            schema = schemas[0]
+        else:
+            schema = {'oneOf': schemas}
+        if nullable and schemas: schema['nullable'] = True
+        return schema
+
+    def _typed_schema(self, kind):
+        schema = {'type': kind}
+        if kind == 'object' and self.properties is not None:
+            schema['properties'] = {name: node.to_schema() for name, node in self.properties.items()}
+            required = [name for name, node in self.properties.items() if node.seen >= self.objects]
+            if required: schema['required'] = required
+            if self.overflow: schema['additionalProperties'] = True
+        elif kind == 'array':
+            schema['items'] = self.items.to_schema() if self.items is not None and self.items.seen else {}
+        elif kind == 'string':
+            if self.format: schema['format'] = self.format
+            # A few values, each seen repeatedly: likely an enum (a single constant value is not reported)
+            if self.enum and not self.format and self.strings >= SCHEMA_ENUM_MIN_SAMPLES and 1 < len(self.enum) <= self.strings // 2:
+                schema['enum'] = list(self.enum)
+        return schema
+
+
+class EndpointSchema:
+    """ Request body, query parameters and per-status response bodies of one method + path. """
+    __slots__ = ('method', 'path', 'origins', 'calls', 'query', 'request', 'request_type', 'responses', 'response_types', 'merged')
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path # Templated, e.g. /api/items/{int}
+        self.origins = {} # scheme://host -> calls
+        self.calls = 0
+        self.query = {} # name -> SchemaNode of its values
+        self.request = None # SchemaNode of JSON/form request bodies
+        self.request_type = None
+        self.responses = {} # status -> SchemaNode (None if no JSON body was seen)
+        self.response_types = {} # status -> content type
+        self.merged = {} # status -> bodies merged (bounded by SCHEMA_SAMPLES_PER_ENDPOINT)
+
+
+def schema_key(method, url):
+    """ (METHOD, scheme://host, templated path) of a request URL. """
+    parts = urlsplit(url)
+    path = '/'.join(template_value(segment) if segment else segment for segment in parts.path.split('/'))
+    return method.upper(), f"{parts.scheme}://{parts.netloc.lower()}", path or '/'
+
+
+def parse_json_body(body, content_type):
+    """ Parsed JSON (or form) body, or None if the body is not JSON/form data. """
+    if not body: return None
+    content_type = (content_type or '').lower()
+    if 'x-www-form-urlencoded' in content_type:
+        try: return dict(parse_qsl(body.decode('utf-8', errors='replace'), keep_blank_values=True))
+        except ValueError: return None
+    if 'json' not in content_type and body.lstrip()[:1] not in (b'{', b'['):
+        return None
+    try: return json.loads(body)
+    except (ValueError, RecursionError): return None
+
+
+class SchemaRegistry:
+    """ Endpoint schemas of everything merged so far. Thread-safe: merged on the collector thread, exported from any. """
+    def __init__(self, samples_per_endpoint=SCHEMA_SAMPLES_PER_ENDPOINT):
+        self.samples_per_endpoint = samples_per_endpoint
+        self.endpoints = {} # (method, path) -> EndpointSchema
+        self.bodies_merged = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def wants(self, method, url, status):
+        """ True while the endpoint's response schema for this status still takes samples (checked before a body is fetched). """
+        method, _, path = schema_key(method, url)
+        endpoint = self.endpoints.get((method, path))
+        return endpoint is None or endpoint.merged.get(status, 0) < self.samples_per_endpoint
+
+    def observe(self, method, url, status, request_type=None, request_body=None, response_type=None, response_body=None):
+        """ Merges one capture. Bodies are raw bytes; non-JSON bodies only count the call. """
+        method, origin, path = schema_key(method, url)
+        request_data = parse_json_body(request_body, request_type)
+        response_data = parse_json_body(response_body, response_type)
+        query = parse_qsl(urlsplit(url).query, keep_blank_values=True)
+        with self._lock:
+            endpoint = self.endpoints.get((method, path))
+            if endpoint is None:
+                endpoint = self.endpoints[(method, path)] = EndpointSchema(method, path)
+            endpoint.calls += 1
+            endpoint.origins[origin] = endpoint.origins.get(origin, 0) + 1
+            for name, value in query[:SCHEMA_MAX_PROPERTIES]:
+                node = endpoint.query.get(name)
+                if node is None: node = endpoint.query[name] = SchemaNode()
+                node.merge(value)
+            if endpoint.merged.get(status, 0) >= self.samples_per_endpoint: return
+            endpoint.merged[status] = endpoint.merged.get(status, 0) + 1
+            if request_data is not None:
+                if endpoint.request is None: endpoint.request = SchemaNode()
+                endpoint.request.merge(request_data)
+                endpoint.request_type = endpoint.request_type or content_type_name(request_type, 'application/json')
+            node = endpoint.responses.get(status)
+            if response_data is not None:
+                if node is None: node = endpoint.responses[status] = SchemaNode()
+                node.merge(response_data)
+                endpoint.response_types.setdefault(status, content_type_name(response_type, 'application/json'))
+                self.bodies_merged += 1
+            elif status not in endpoint.responses:
+                endpoint.responses[status] = None
+
+    def observe_record(self, record, body_limit=SCHEMA_BODY_LIMIT):
+        """ Merges an ApiRecord (spilled bodies are read back, up to body_limit bytes). """
+        body = None
+        if record.body_size and record.body_size <= body_limit and 'json' in (record.content_type or '').lower():
+            try: body = record.load_body()
+            except OSError: body = None
+        request_type = next((value for name, value in record.request_headers.items() if name.lower() == 'content-type'), None)
+        self.observe(record.method, record.url, record.status, request_type, record.request_body, record.content_type, body)
+
+    def clear(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.bodies_merged = 0
+
+    def to_openapi(self, title="Inferred API", version="1.0.0"):
+        """ OpenAPI 3.0 document (a dict) of everything merged so far. """
+        with self._lock:
+            origin_calls = {}
+            for endpoint in self.endpoints.values():
+                for origin, calls in endpoint.origins.items():
+                    origin_calls[origin] = origin_calls.get(origin, 0) + calls
+            servers = sorted(origin_calls, key=origin_calls.get, reverse=True)
+            paths = {}
+            for (method, path), endpoint in sorted(self.endpoints.items(), key=lambda item: (item[0][1], item[0][0])):
+                openapi_path, path_params = openapi_path_params(path)
+                operation = paths.setdefault(openapi_path, {})[method.lower()] = operation_for(endpoint, path_params)
+                if set(endpoint.origins) != {servers[0]}: # Not (only) on the main server
+                    operation['servers'] = [{'url': origin} for origin in sorted(endpoint.origins)]
+            calls = sum(endpoint.calls for endpoint in self.endpoints.values())
+            return {
+                'openapi': '3.0.3',
+                'info': {'title': title, 'version': version,
+                         'description': f"Inferred from {calls} captured call(s) ({self.bodies_merged} JSON response bodies)."},
+                'servers': [{'url': origin} for origin in servers],
+                'paths': paths,
+            }
+
+
+def content_type_name(content_type, default):
+    """ Media type without parameters ('application/json; charset=utf-8' -> 'application/json'). """
+    return (content_type or '').split(';')[0].strip().lower() or default
+
+
+def openapi_path_params(path):
+    """ /items/{int}/reviews/{uuid} -> (/items/{itemsId}/reviews/{reviewsId}, [parameter objects]). """
+    segments = path.split('/')
+    params = []
+    for i, segment in enumerate(segments):
+        if segment not in _PLACEHOLDER_SCHEMAS: continue
+        previous = re.sub(r'\W', '', segments[i - 1]) if i > 0 else ''
+        name = f"{previous}Id" if previous and not previous.startswith('{') else f"param{len(params) + 1}"
+        while any(p['name'] == name for p in params): name += '_'
+        params.append({'name': name, 'in': 'path', 'required': True, 'schema': dict(_PLACEHOLDER_SCHEMAS[segment])})
+        segments[i] = '{' + name + '}'
+    return '/'.join(segments), params
+
+
+def operation_for(endpoint, path_params):
+    operation = {'summary': f"{endpoint.method} {endpoint.path}", 'x-viper-calls': endpoint.calls}
+    parameters = list(path_params)
+    for name, node in sorted(endpoint.query.items()):
+        schema = {'type': 'string'} # Query values are always strings; keep an enum if the values form one
+        enum = node.to_schema().get('enum')
+        if enum: schema['enum'] = enum
+        parameters.append({'name': name, 'in': 'query', 'required': node.seen >= endpoint.calls, 'schema': schema})
+    if parameters: operation['parameters'] = parameters
+    if endpoint.request is not None:
+        operation['requestBody'] = {'content': {endpoint.request_type: {'schema': endpoint.request.to_schema()}}}
+    responses = {}
+    for status in sorted(endpoint.responses, key=lambda s: (s is None, str(s))):
+        node = endpoint.responses[status]
+        response = {'description': f"Observed {endpoint.merged.get(status, 0)} time(s)"}
+        if node is not None:
+            response['content'] = {endpoint.response_types[status]: {'schema': node.to_schema()}}
+        responses[str(status) if status is not None else 'default'] = response
+    operation['responses'] = responses or {'default': {'description': "No response observed"}}
+    return operation
+
+
+class SchemaCollector:
+    """ Parses and merges captures into a SchemaRegistry on a background thread, so scans never wait on json.loads. """
+    def __init__(self, registry, max_queue=SCHEMA_QUEUE_SIZE):
+        self.registry = registry
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="viper-schema", daemon=True)
+        self._thread.start()
+
+    def wants(self, method, url, status):
+        return self.registry.wants(method, url, status)
+
+    def submit(self, record):
+        """ Queues an ApiRecord for merging. Never blocks; drops the record if the collector is behind. """
+        try: self._queue.put_nowait(record)
+        except queue.Full: self.dropped += 1
+
+    def close(self, timeout=30):
+        """ Merges everything queued, then stops the thread. """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None: return
+            try: self.registry.observe_record(record)
+            except Exception as e:
+                log.debug(f"Schema inference failed for {record.method} {record.url}: {e}")
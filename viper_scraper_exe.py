@@ -3,60 +3,52 @@ import customtkinter as ctk
 from tkinter import filedialog, messagebox, Menu, ttk # Import ttk here
 import threading
 import queue
-import asyncio
-import json
 import logging
-import re
-import time
-import random
-from urllib.parse import urlparse, urljoin, quote
 import os
-import base64
-import csv
 import sys
-import binascii
-import traceback # Import for logging tracebacks
+import time
+from array import array
+from collections import deque
 
-from playwright.async_api import async_playwright, Error as PlaywrightError, Page, Locator, TimeoutError as PlaywrightTimeoutError
 from pyfiglet import Figlet
 
+from viper_core import (
+    __version__, TOOL_NAME, DEFAULT_OUTPUT_FILE, DEFAULT_LOG_FILE, log, log_formatter,
+    RESOURCE_TYPES, DEFAULT_RESOURCE_TYPES, INTERESTING_HEADERS, USER_AGENTS,
+    ROUTE_BLOCK_DEFAULT_TYPES, ROUTE_PROTECTED_TYPES, DEFAULT_QUIET_WINDOW, DEFAULT_QUIET_CAP,
+    DEFAULT_CRAWL_MAX_DEPTH, DEFAULT_CRAWL_MAX_PAGES, DEFAULT_CRAWL_CONCURRENCY, DEFAULT_CAPTURE_CONCURRENCY,
+    sanitize_url, parse_status_codes, build_proxy_config, parse_pattern_lines, parse_csv_list, build_scan_params,
+    apply_api_hit, run_playwright_discover_thread, save_journal_results, save_openapi_spec, ScanRuntime,
+    open_rotating_log, close_rotating_log, log_record_from_message,
+)
+from viper_blobs import DEFAULT_INLINE_BODY_LIMIT, BlobStore
+from viper_journal import ExportTask, ImportTask, journal_path_for
+from viper_query import QueryError
+from viper_results import ResultsModel, StoreResultsModel
+from viper_store import DEFAULT_STORE_FILE, ResultStore, StoreRecords, StoreWriter, iter_store_file
+from viper_schema import SchemaRegistry
+from viper_details import DETAIL_PAGE_CHARS, DETAIL_SYNC_BYTES, DetailRenderer, render_details
+from viper_metrics import MetricsServer, ScanMetrics
 
-__version__ = "3.4.0-viper-enhanced" # Updated version
-TOOL_NAME = "Viper API Interceptor"
-DEFAULT_OUTPUT_FILE = "viper_discovered_apis.json"
 
 # --- Appearance ---
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("green")
 
-# --- Logging Setup ---
-log_formatter = logging.Formatter('%(asctime)s [%(levelname)-7s] %(message)s', datefmt='%H:%M:%S')
-log = logging.getLogger(__name__)
-log.setLevel(logging.DEBUG) # Default level, GUI can override
-
 # --- Constants ---
-RESOURCE_TYPES = ["xhr", "fetch", "document", "script", "stylesheet", "image", "font", "media", "websocket", "other"]
 MONOSPACE_FONT = ("Consolas", 11) if sys.platform == "win32" else ("monospace", 10)
-DEFAULT_IGNORE_PATTERNS = [
-    'google-analytics.com', 'googletagmanager.com', 'facebook.net', 'connect.facebook.net',
-    'fbcdn.net', 'doubleclick.net', 'googleadservices.com', 'adservice.google.com',
-    'googlesyndication.com', 'fonts.googleapis.com', 'fonts.gstatic.com',
-    'gstatic.com/recaptcha', 'criteo.com', 'scorecardresearch.com', 'krxd.net',
-    'cdn-cgi/challenge-platform', 'cdn-cgi/rum', 'cdn.jsdelivr.net', 'cdnjs.cloudflare.com',
-    '.js', '.css', '.woff', '.woff2', '.ttf', '.svg', '.png', '.jpg', '.jpeg',
-    '.gif', '.ico', '.webp', '.avif', '.mp4', '.webm', '.css.map', '.js.map',
-    'google.com/ads', 'youtube.com/api/stats', 'googlevideo.com', 'ytimg.com',
-    'imasdk.googleapis.com', '/beacon', '/track', '/pixel', 'analytics', 'metrics', 'segment.com'
-]
-INTERESTING_HEADERS = ['authorization', 'set-cookie', 'cookie', 'x-csrf-token', 'x-api-key', 'x-auth-token', 'bearer', 'jwt', 'api-key', 'apikey']
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Safari/605.1.15",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Mobile/15E148 Safari/604.1",
-    "Mozilla/5.0 (Linux; Android 13; Pixel 7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Mobile Safari/537.36",
-    "Custom"
-]
+GUI_POLL_INTERVAL_MS = 100 # Idle poll of the queues (the scan thread also wakes the GUI directly)
+GUI_BUSY_INTERVAL_MS = 10 # Next drain when the last one ran out of time with messages left
+GUI_DRAIN_BUDGET = 0.03 # Seconds of queue work per drain, so input and redraws stay smooth under floods
+GUI_STATS_INTERVAL = 0.5 # Seconds between queue depth/latency label updates
+GUI_METRICS_INTERVAL = 2.0 # Seconds between refreshes of the scan metrics summary
+CLOSE_SCAN_TIMEOUT = 10.0 # Seconds on_closing waits for a stopped scan to exit before releasing its resources
+FILE_TASK_POLL_MS = 100 # Progress bar refresh while an export or import thread runs
+FILTER_DEBOUNCE_MS = 150 # The table filter runs once typing pauses this long (Enter applies it at once)
+DEFAULT_METRICS_PORT = 9464
+QUEUE_WAKE_EVENT = "<<ViperQueueWake>>"
+LOG_PANE_MAX_LINES = 5000 # The log pane keeps only the newest lines (the optional log file keeps everything)
+LOG_PANE_TRIM_SLACK = 500 # Old lines are trimmed in chunks of at least this many
 
 # --- Tooltip Widget ---
 class ToolTip:
@@ -108,6 +100,143 @@ class ToolTip:
                  pass # Window might already be destroyed
             self.tooltip = None
 
+# --- Virtual Results Table ---
+class VirtualTable:
+    """
+    ttk.Treeview that shows a ResultsModel through a fixed pool of row items, one per visible line.
+    Scrolling, filtering and sorting re-fill the pool instead of inserting/moving items, so the
+    Tk work per update depends on the window height, not on the number of results.
+    """
+    WHEEL_ROWS = 3 # Rows scrolled per mouse wheel notch
+
+    def __init__(self, master, model, columns, row_values, on_select):
+        self.model = model
+        self.row_values = row_values # api_key -> tuple of column values
+        self.on_select = on_select # Called with the api_key of a newly selected row
+        self.tree = ttk.Treeview(master, columns=columns, show="headings", selectmode="browse") # Style set in configure_styles
+        self.vsb = ttk.Scrollbar(master, orient="vertical", command=self.yview)
+        self.top = 0 # Model row shown in the first pool item
+        self.pool = [] # Row item iids, top to bottom
+        self.pool_keys = [] # api_key shown by each attached pool item
+        self._attached = 0 # Pool items currently attached (always the first ones)
+        self.selected_key = None
+        self._redraw_pending = False
+
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel) # Windows/macOS
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-self.WHEEL_ROWS)) # X11 wheel up
+        self.tree.bind("<Button-5>", lambda e: self.scroll(self.WHEEL_ROWS)) # X11 wheel down
+        for keysym in ("Up", "Down", "Prior", "Next", "Home", "End"):
+            self.tree.bind(f"<{keysym}>", self._on_key)
+
+    # --- Model -> pool ---
+    def refresh(self):
+        """ Schedules one redraw for the next idle moment (many updates per GUI tick cost one redraw). """
+        if self._redraw_pending: return
+        self._redraw_pending = True
+        try: self.tree.after_idle(self._redraw)
+        except tk.TclError: pass # Widget closing
+
+    def refresh_key(self, api_key):
+        """ Redraws if the row of `api_key` is currently on screen (e.g. its hit count changed). """
+        if api_key in self.pool_keys: self.refresh()
+
+    def visible_rows(self):
+        """ Number of rows that fit in the widget. """
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        header = rowheight # Until a row has been drawn and its offset can be measured
+        if self.pool:
+            bbox = self.tree.bbox(self.pool[0])
+            if bbox: header = bbox[1]
+        return max(1, (self.tree.winfo_height() - header) // rowheight)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        try:
+            rows = self.visible_rows()
+            while len(self.pool) < rows:
+                iid = self.tree.insert("", tk.END, values=())
+                self.tree.detach(iid) # Pool items past the last shown row stay detached
+                self.pool.append(iid)
+            total = len(self.model)
+            self.top = max(0, min(self.top, total - rows))
+            shown = min(rows, total - self.top)
+            for i in range(self._attached, shown): self.tree.move(self.pool[i], "", i) # Re-attach lines needed again
+            if shown < self._attached: self.tree.detach(*self.pool[shown:self._attached]) # Nothing to show there
+            self._attached = shown
+            self.pool_keys = [self.model.key_at(self.top + i) for i in range(shown)]
+            for iid, key in zip(self.pool, self.pool_keys):
+                self.tree.item(iid, values=self.row_values(key))
+            self.tree.yview_moveto(0) # The pool never scrolls itself
+            selected = [self.pool[i] for i, key in enumerate(self.pool_keys) if key == self.selected_key]
+            if tuple(selected) != self.tree.selection(): self.tree.selection_set(selected)
+            self.vsb.set(*((self.top / total, (self.top + shown) / total) if total else (0.0, 1.0)))
+        except tk.TclError:
+            log.debug("Results table redraw skipped (widget might be closing).")
+
+    # --- Scrolling ---
+    def yview(self, *args):
+        """ Scrollbar command: 'moveto fraction' or 'scroll n units|pages'. """
+        if not args: return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.model))
+            self.refresh()
+        elif args[0] == "scroll":
+            self.scroll(int(args[1]) * (self.visible_rows() if args[2] == "pages" else 1))
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+        return "break"
+
+    def _on_wheel(self, event):
+        return self.scroll(-self.WHEEL_ROWS if event.delta > 0 else self.WHEEL_ROWS)
+
+    def see_row(self, row):
+        rows = self.visible_rows()
+        if row < self.top: self.top = row
+        elif row >= self.top + rows: self.top = row - rows + 1
+
+    # --- Selection ---
+    def key_at_y(self, y):
+        """ api_key of the row under a y coordinate (e.g. a right-click), or None. """
+        iid = self.tree.identify_row(y)
+        if iid in self.pool and self.pool.index(iid) < len(self.pool_keys):
+            return self.pool_keys[self.pool.index(iid)]
+        return None
+
+    def select_key(self, api_key):
+        """ Selects the row of `api_key` and notifies on_select if the selection changed. """
+        if api_key == self.selected_key: return
+        self.selected_key = api_key
+        self.refresh()
+        if api_key is not None: self.on_select(api_key)
+
+    def clear_selection(self):
+        self.selected_key = None
+        self.refresh()
+
+    def _on_tree_select(self, event):
+        # Also fired by selection_set() in _redraw; only a click on another row changes anything
+        selection = self.tree.selection()
+        if selection and selection[0] in self.pool and self.pool.index(selection[0]) < len(self.pool_keys):
+            self.select_key(self.pool_keys[self.pool.index(selection[0])])
+
+    def _on_key(self, event):
+        total = len(self.model)
+        if not total: return "break"
+        row = self.model.row_of(self.selected_key) if self.selected_key is not None else None
+        page = self.visible_rows()
+        if event.keysym == "Home": target = 0
+        elif event.keysym == "End": target = total - 1
+        elif row is None: target = self.top
+        else: target = row + {"Up": -1, "Down": 1, "Prior": -page, "Next": page}[event.keysym]
+        target = max(0, min(total - 1, target))
+        self.see_row(target)
+        self.select_key(self.model.key_at(target))
+        return "break"
+
 # --- Queue Handler for Logging ---
 class QueueHandler(logging.Handler):
     """ Sends log records to a queue for processing by the GUI thread. """
@@ -132,17 +261,38 @@ class ViperApiGuiPro(ctk.CTk):
         self.stop_event = threading.Event() # Used to signal the scan thread to stop
         self.result_queue = queue.Queue() # For results and thread->GUI communication
         self.log_queue = queue.Queue() # For log messages from thread->GUI
-        self.api_results_data = {} # Holds {api_key: api_data} for all found APIs
-        self.current_selection_iid = None # iid of selected item in Treeview
+        self.api_results_data = {} # Holds {api_key: ApiRecord} for all found APIs
+        self.results_model = ResultsModel(self.api_results_data) # Filtered/sorted row order of the results table
+        self.result_store = None # Open viper_store.ResultStore in store mode (results then live in SQLite, keyed by row id)
+        self.current_selection_iid = None # api_key of the selected table row
+        self.detail_queue = queue.Queue() # Rendered detail views from the details worker
+        self.detail_renderer = DetailRenderer(self.on_details_rendered) # Formats bodies off the GUI thread (with an LRU cache)
+        self.raw_body_view = None; self.raw_body_shown = 0 # Raw Body pane paging ("Load more")
+        self.schema_registry = SchemaRegistry() # Endpoint schemas inferred from JSON bodies (OpenAPI export)
         self.user_ignore_list = [] # Custom ignore patterns from user
         self.allowed_resource_types = set(RESOURCE_TYPES) # Initialize with all types
         self.allowed_status_codes = set() # Empty means default (allow <400)
+        self.scan_runtime = None # Warm ScanRuntime (browser pool), created on demand
+        self.blob_store = None # On-disk store for large response bodies, created on demand
+        self.scan_journal_path = None # NDJSON journal of the current/last scan
+        self._drain_after_id = None # Pending after() of the next queue drain (None while draining)
+        self._filter_after_id = None # Pending debounced apply_filter
+        self.export_task = None # Running viper_journal.ExportTask (one at a time)
+        self._export_notify = True # Pop up the result of the current export
+        self.import_task = None # Running viper_journal.ImportTask (Open Results...)
+        self._wake_pending = False # Set by the scan thread once per drain, see wake_gui
+        self._last_latency = None # Seconds from queueing to display of the latest result
+        self._stats_shown_at = 0.0
+        self.file_log_handler = None # Rotating on-disk log (full history), when enabled
+        self.scan_metrics = None # viper_metrics.ScanMetrics of the current/last scan
+        self.metrics_server = None # Local Prometheus endpoint, when enabled
+        self._metrics_shown_at = 0.0
 
         # --- Logging Setup ---
         self.queue_handler = QueueHandler(self.log_queue)
         self.queue_handler.setFormatter(log_formatter)
-        log.addHandler(self.queue_handler) # Add handler to the root logger
-        log.setLevel(logging.DEBUG) # Let handler filter later if needed by GUI setting
+        self.queue_handler.setLevel(logging.INFO) # Records below the pane's level are never queued (see set_log_level)
+        log.addHandler(self.queue_handler) # Add handler to the tool's logger (which stays at DEBUG for the log file)
 
         # --- GUI Variables ---
         self.output_file_var = tk.StringVar(value=DEFAULT_OUTPUT_FILE)
@@ -153,25 +303,53 @@ class ViperApiGuiPro(ctk.CTk):
         self.display_banner_in_log()
         self.update_status("Idle. Configure and click Start Scan.")
 
-        # Start polling the queues
-        self.after(100, self.process_gui_queue)
+        # Start polling the queues (the scan thread can also wake the drain early)
+        self.bind(QUEUE_WAKE_EVENT, self.on_queue_wake)
+        self._drain_after_id = self.after(GUI_POLL_INTERVAL_MS, self.process_gui_queue)
 
         # Handle window close event gracefully
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
     def on_closing(self):
-        """ Handle window closing: stop scan if running. """
-        if self.scan_thread and self.scan_thread.is_alive():
-             # Ask user only if a scan is actively running
-             if messagebox.askyesno("Scan Running", "A scan is currently running. Do you want to stop it and exit?", parent=self):
-                 self.stop_scan()
-                 # Give a brief moment for the stop signal to potentially be processed
-                 # Note: The thread might not stop instantly.
-                 self.after(500, self.destroy) # Schedule destroy after a delay
-             else:
-                 return # Don't close if user cancels
+        """ Handle window closing: stop a running scan (and wait for it to wind down), then release everything. """
+        scanning = self.scan_thread and self.scan_thread.is_alive()
+        if scanning and not messagebox.askyesno("Scan Running", "A scan is currently running. Do you want to stop it and exit?", parent=self):
+            return # Don't close if user cancels
+        if self.export_running() and not messagebox.askyesno("Export Running", "An export is still running. Cancel it and exit?", parent=self):
+            return
+        if scanning:
+            self.stop_scan()
+            self.close_when_stopped(time.monotonic() + CLOSE_SCAN_TIMEOUT)
         else:
-             self.destroy() # Close normally if no scan is running
+            self.release_resources()
+            self.destroy()
+
+    def close_when_stopped(self, deadline):
+        """ Polls (keeping the GUI responsive) until the stopped scan thread has exited or `deadline` passes, then closes. """
+        if self.scan_thread and self.scan_thread.is_alive() and time.monotonic() < deadline:
+            self.after(GUI_POLL_INTERVAL_MS, self.close_when_stopped, deadline)
+            return
+        if self.scan_thread and self.scan_thread.is_alive():
+            log.warning("Scan thread did not stop in time; closing anyway.")
+        self.release_resources()
+        self.destroy()
+
+    def release_resources(self):
+        """ Everything on_closing must release, whether or not a scan was running: tasks, browsers, temp files, servers. """
+        if self.export_running():
+            self.export_task.cancel()
+            self.export_task.join(timeout=5) # Removes its partial file
+        if self.import_running():
+            self.import_task.cancel()
+            self.import_task.join(timeout=5) # Closes its store writer
+        if self.scan_runtime:
+            self.scan_runtime.shutdown(timeout=5) # Close pooled browsers before exiting
+        if self.blob_store:
+            self.blob_store.close() # Remove spilled response bodies
+        self.set_file_log(False)
+        self.set_metrics_server(False)
+        self.detail_renderer.close()
+        if self.result_store: self.result_store.close()
 
     def display_banner_in_log(self):
         """ Displays the tool banner in the log text area using pyfiglet. """
@@ -271,6 +449,7 @@ class ViperApiGuiPro(ctk.CTk):
         # Form and Ignore Textboxes styling
         self.form_values_textbox.configure(font=MONOSPACE_FONT, border_width=1, fg_color=text_bg, text_color=text_fg, border_color=text_border)
         self.ignore_textbox.configure(font=MONOSPACE_FONT, border_width=1, fg_color=text_bg, text_color=text_fg, border_color=text_border)
+        self.batch_targets_textbox.configure(font=MONOSPACE_FONT, border_width=1, fg_color=text_bg, text_color=text_fg, border_color=text_border)
 
 
     def create_widgets(self):
@@ -356,7 +535,7 @@ class ViperApiGuiPro(ctk.CTk):
         self.wait_time_entry.grid(row=row_idx, column=3, padx=5, pady=3, sticky="w")
         ToolTip(lbl_act_to, "Default timeout (ms) for actions like click, fill.")
         ToolTip(self.action_timeout_entry, "Timeout in milliseconds (e.g., 30000 = 30s).")
-        ToolTip(lbl_xtra_wait, "Additional static wait time after load/interactions (s).")
+        ToolTip(lbl_xtra_wait, "Additional static wait time after load/interactions (s). Only used when Adaptive waits is off.")
         ToolTip(self.wait_time_entry, "Seconds to wait after main load and interaction phases.")
         row_idx += 1
 
@@ -365,6 +544,9 @@ class ViperApiGuiPro(ctk.CTk):
         config_tabs.grid(row=row_idx, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
         tab_interact = config_tabs.add("Interaction")
         tab_filter = config_tabs.add("Filtering")
+        tab_batch = config_tabs.add("Batch")
+        tab_crawl = config_tabs.add("Crawl")
+        tab_runtime = config_tabs.add("Runtime")
         row_idx += 1 # Increment row index after adding tabs
 
         # --- Interaction Tab Content ---
@@ -424,6 +606,23 @@ class ViperApiGuiPro(ctk.CTk):
         ToolTip(self.form_delay_entry, "Time in seconds.")
         _row += 1
 
+        # Adaptive Waits
+        adaptive_frame = ctk.CTkFrame(tab_interact, fg_color="transparent")
+        adaptive_frame.grid(row=_row, column=0, columnspan=3, padx=10, pady=5, sticky="ew")
+        self.adaptive_waits_var = tk.BooleanVar(value=True)
+        cb_adaptive = ctk.CTkCheckBox(adaptive_frame, text="Adaptive waits", variable=self.adaptive_waits_var)
+        cb_adaptive.grid(row=0, column=0, padx=(0,10), pady=2, sticky="w")
+        ToolTip(cb_adaptive, "End each phase as soon as network traffic goes quiet instead of sleeping the fixed delays. Uncheck to use the Extra Wait/Delay values and networkidle waits.")
+        lbl_quiet = ctk.CTkLabel(adaptive_frame, text="Quiet (s):"); lbl_quiet.grid(row=0, column=1, padx=(0,5), pady=2, sticky="w")
+        self.quiet_window_var = tk.DoubleVar(value=DEFAULT_QUIET_WINDOW)
+        ctk.CTkEntry(adaptive_frame, textvariable=self.quiet_window_var, width=50).grid(row=0, column=2, padx=(0,10), pady=2, sticky="w")
+        ToolTip(lbl_quiet, "How long the page must have no requests in flight (ignoring streams, long-polls and ignored URLs).")
+        lbl_quiet_cap = ctk.CTkLabel(adaptive_frame, text="Max (s):"); lbl_quiet_cap.grid(row=0, column=3, padx=(0,5), pady=2, sticky="w")
+        self.quiet_cap_var = tk.DoubleVar(value=DEFAULT_QUIET_CAP)
+        ctk.CTkEntry(adaptive_frame, textvariable=self.quiet_cap_var, width=50).grid(row=0, column=4, pady=2, sticky="w")
+        ToolTip(lbl_quiet_cap, "Hard cap on each wait, for pages that never go quiet.")
+        _row += 1
+
         # --- Filtering Tab Content ---
         tab_filter.grid_columnconfigure(1, weight=1) # Allow entries/textboxes to expand
 
@@ -444,7 +643,7 @@ class ViperApiGuiPro(ctk.CTk):
         res_frame.grid(row=_row, column=0, columnspan=2, padx=10, pady=0, sticky="ew")
         num_cols = 4 # Adjust number of columns for checkboxes
         for i, res_type in enumerate(RESOURCE_TYPES):
-            var = tk.BooleanVar(value=(res_type in ["xhr", "fetch"])) # Default check common API types
+            var = tk.BooleanVar(value=(res_type in DEFAULT_RESOURCE_TYPES)) # Default check common API types
             cb = ctk.CTkCheckBox(res_frame, text=res_type, variable=var, command=self.update_allowed_resource_types)
             cb.grid(row=i // num_cols, column=i % num_cols, padx=5, pady=2, sticky="w")
             ToolTip(cb, f"Include requests of type '{res_type}'.")
@@ -462,6 +661,153 @@ class ViperApiGuiPro(ctk.CTk):
         ToolTip(self.ignore_textbox, "Enter parts of URLs or domains (one per line) to ignore. Lines starting with # are comments. Defaults are also applied.")
         _row += 1
 
+        # Endpoint Templates
+        self.dedup_templates_var = tk.BooleanVar(value=False)
+        cb_templates = ctk.CTkCheckBox(tab_filter, text="Group URLs into endpoint templates", variable=self.dedup_templates_var)
+        cb_templates.grid(row=_row, column=0, columnspan=2, padx=10, pady=(5,0), sticky="w")
+        ToolTip(cb_templates, "One row per endpoint (/api/items/{int}?page={int}) with a hit count and sample URLs, instead of one row per exact URL. IDs, UUIDs, hashes and cache-busters are collapsed.")
+        _row += 1
+        self.infer_schemas_var = tk.BooleanVar(value=True)
+        cb_schemas = ctk.CTkCheckBox(tab_filter, text="Infer JSON schemas (for OpenAPI export)", variable=self.infer_schemas_var)
+        cb_schemas.grid(row=_row, column=0, columnspan=2, padx=10, pady=(5,0), sticky="w")
+        ToolTip(cb_schemas, "Merge every captured JSON request/response body into a per-endpoint schema (types, optional fields, enums). Export with 'Export OpenAPI Spec'.")
+        _row += 1
+
+        # Network-level Blocking (opt-in)
+        block_frame = ctk.CTkFrame(tab_filter, fg_color="transparent")
+        block_frame.grid(row=_row, column=0, columnspan=2, padx=10, pady=(5,0), sticky="ew")
+        block_frame.grid_columnconfigure(2, weight=1)
+        self.block_resources_var = tk.BooleanVar(value=False)
+        cb_block = ctk.CTkCheckBox(block_frame, text="Block at network level", variable=self.block_resources_var)
+        cb_block.grid(row=0, column=0, padx=(0,10), pady=2, sticky="w")
+        ToolTip(cb_block, "Abort unwanted requests before they are sent (saves time and proxy bandwidth) instead of downloading and discarding them.")
+        ctk.CTkLabel(block_frame, text="Types:").grid(row=0, column=1, padx=(0,5), pady=2, sticky="w")
+        self.block_types_entry = ctk.CTkEntry(block_frame, placeholder_text="image,media,font")
+        self.block_types_entry.insert(0, ",".join(ROUTE_BLOCK_DEFAULT_TYPES))
+        self.block_types_entry.grid(row=0, column=2, pady=2, sticky="ew")
+        ToolTip(self.block_types_entry, "Resource types always aborted when blocking is on (comma-separated).")
+        self.block_ignored_var = tk.BooleanVar(value=True)
+        cb_block_ignored = ctk.CTkCheckBox(block_frame, text="Also block ignore-list matches", variable=self.block_ignored_var)
+        cb_block_ignored.grid(row=1, column=0, columnspan=3, pady=2, sticky="w")
+        ToolTip(cb_block_ignored, f"Abort requests matching the ignore patterns, except protected types the page needs: {', '.join(ROUTE_PROTECTED_TYPES)}.")
+        _row += 1
+
+        # --- Batch Tab Content ---
+        tab_batch.grid_columnconfigure(1, weight=1) # Allow targets textbox to expand
+
+        _row = 0 # Reset row counter for this tab
+        lbl_targets = ctk.CTkLabel(tab_batch, text="Batch Targets (one URL per line):"); lbl_targets.grid(row=_row, column=0, columnspan=4, padx=10, pady=(5,0), sticky="w")
+        ToolTip(lbl_targets, "When any targets are listed here, Start Scan runs them all on one shared browser instead of the single Target URL.")
+        _row += 1
+        self.batch_targets_textbox = ctk.CTkTextbox(tab_batch, height=100, border_width=1)
+        self.batch_targets_textbox.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+        ToolTip(self.batch_targets_textbox, "One URL per line. Lines starting with # are comments. Each target gets its own browser context.")
+        _row += 1
+        lbl_concurrency = ctk.CTkLabel(tab_batch, text="Concurrency:"); lbl_concurrency.grid(row=_row, column=0, padx=(10,5), pady=5, sticky="w")
+        self.batch_concurrency_var = tk.IntVar(value=4)
+        self.batch_concurrency_entry = ctk.CTkEntry(tab_batch, textvariable=self.batch_concurrency_var, width=60)
+        self.batch_concurrency_entry.grid(row=_row, column=1, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_concurrency, "Maximum number of targets scanned at the same time.")
+        lbl_target_to = ctk.CTkLabel(tab_batch, text="Per-Target Timeout (s):"); lbl_target_to.grid(row=_row, column=2, padx=(10,5), pady=5, sticky="w")
+        self.batch_timeout_var = tk.DoubleVar(value=180.0)
+        self.batch_timeout_entry = ctk.CTkEntry(tab_batch, textvariable=self.batch_timeout_var, width=70)
+        self.batch_timeout_entry.grid(row=_row, column=3, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_target_to, "Time budget for each target (load + interactions). 0 = no limit.")
+        _row += 1
+
+        # --- Crawl Tab Content ---
+        _row = 0 # Reset row counter for this tab
+        self.crawl_var = tk.BooleanVar(value=False)
+        cb_crawl = ctk.CTkCheckBox(tab_crawl, text="Crawl same-origin pages after the target page", variable=self.crawl_var)
+        cb_crawl.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="w")
+        ToolTip(cb_crawl, "Follow links and SPA route changes on the same origin (logout links and downloads are skipped). Crawled pages are loaded and scrolled; clicks and form input only run on the target page.")
+        _row += 1
+        lbl_depth = ctk.CTkLabel(tab_crawl, text="Max Depth:"); lbl_depth.grid(row=_row, column=0, padx=(10,5), pady=5, sticky="w")
+        self.crawl_depth_var = tk.IntVar(value=DEFAULT_CRAWL_MAX_DEPTH)
+        ctk.CTkEntry(tab_crawl, textvariable=self.crawl_depth_var, width=50).grid(row=_row, column=1, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_depth, "How many links away from the target page to go.")
+        lbl_pages = ctk.CTkLabel(tab_crawl, text="Max Pages:"); lbl_pages.grid(row=_row, column=2, padx=(10,5), pady=5, sticky="w")
+        self.crawl_pages_var = tk.IntVar(value=DEFAULT_CRAWL_MAX_PAGES)
+        ctk.CTkEntry(tab_crawl, textvariable=self.crawl_pages_var, width=60).grid(row=_row, column=3, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_pages, "Total page budget per target, including the target page itself.")
+        _row += 1
+        lbl_crawl_conc = ctk.CTkLabel(tab_crawl, text="Pages At Once:"); lbl_crawl_conc.grid(row=_row, column=0, padx=(10,5), pady=5, sticky="w")
+        self.crawl_concurrency_var = tk.IntVar(value=DEFAULT_CRAWL_CONCURRENCY)
+        ctk.CTkEntry(tab_crawl, textvariable=self.crawl_concurrency_var, width=50).grid(row=_row, column=1, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_crawl_conc, "Number of pages open at the same time while crawling.")
+        _row += 1
+
+        # --- Runtime Tab Content ---
+        tab_runtime.grid_columnconfigure(3, weight=1)
+
+        _row = 0 # Reset row counter for this tab
+        self.warm_runtime_var = tk.BooleanVar(value=False)
+        cb_warm = ctk.CTkCheckBox(tab_runtime, text="Keep browsers warm between scans", variable=self.warm_runtime_var, command=self.on_warm_runtime_toggle)
+        cb_warm.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="w")
+        ToolTip(cb_warm, "Keep the event loop, Playwright driver and a pool of launched browsers alive between scans. New scans only create a fresh context.")
+        _row += 1
+        lbl_pool = ctk.CTkLabel(tab_runtime, text="Pool Size:"); lbl_pool.grid(row=_row, column=0, padx=(10,5), pady=5, sticky="w")
+        self.runtime_pool_size_var = tk.IntVar(value=2)
+        ctk.CTkEntry(tab_runtime, textvariable=self.runtime_pool_size_var, width=50).grid(row=_row, column=1, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_pool, "Maximum number of idle browsers kept warm (per proxy setting).")
+        lbl_recycle = ctk.CTkLabel(tab_runtime, text="Recycle After (scans):"); lbl_recycle.grid(row=_row, column=2, padx=(10,5), pady=5, sticky="w")
+        self.runtime_max_scans_var = tk.IntVar(value=50)
+        ctk.CTkEntry(tab_runtime, textvariable=self.runtime_max_scans_var, width=60).grid(row=_row, column=3, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_recycle, "A pooled browser is closed and relaunched after this many scans.")
+        _row += 1
+        lbl_rss = ctk.CTkLabel(tab_runtime, text="Recycle Above (MB RSS):"); lbl_rss.grid(row=_row, column=0, padx=(10,5), pady=5, sticky="w")
+        self.runtime_max_rss_var = tk.IntVar(value=2048)
+        ctk.CTkEntry(tab_runtime, textvariable=self.runtime_max_rss_var, width=70).grid(row=_row, column=1, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_rss, "Recycle pooled browsers once the browser processes use more memory than this (requires psutil). 0 = never.")
+        _row += 1
+        self.runtime_stats_label = ctk.CTkLabel(tab_runtime, text="Runtime: not started", anchor="w", font=(MONOSPACE_FONT[0], 9))
+        self.runtime_stats_label.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+        ToolTip(self.runtime_stats_label, "Browser launches, reuses and the estimated startup time saved by the warm pool.")
+        _row += 1
+        lbl_inline = ctk.CTkLabel(tab_runtime, text="Keep Bodies In Memory Up To (KB):"); lbl_inline.grid(row=_row, column=0, columnspan=2, padx=(10,5), pady=5, sticky="w")
+        self.inline_body_kb_var = tk.IntVar(value=DEFAULT_INLINE_BODY_LIMIT // 1024)
+        ctk.CTkEntry(tab_runtime, textvariable=self.inline_body_kb_var, width=70).grid(row=_row, column=2, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_inline, "Larger response bodies are written to a temporary on-disk store and only read when viewed or exported.")
+        _row += 1
+        lbl_captures = ctk.CTkLabel(tab_runtime, text="Concurrent Captures:"); lbl_captures.grid(row=_row, column=0, columnspan=2, padx=(10,5), pady=5, sticky="w")
+        self.capture_concurrency_var = tk.IntVar(value=DEFAULT_CAPTURE_CONCURRENCY)
+        ctk.CTkEntry(tab_runtime, textvariable=self.capture_concurrency_var, width=70).grid(row=_row, column=2, padx=5, pady=5, sticky="w")
+        ToolTip(lbl_captures, "Accepted responses whose body and headers are fetched at the same time. Others wait, which keeps memory flat during bursts.")
+        _row += 1
+        self.file_log_var = tk.BooleanVar(value=False)
+        cb_file_log = ctk.CTkCheckBox(tab_runtime, text="Write Full Log To File:", variable=self.file_log_var,
+                                      command=lambda: self.set_file_log(self.file_log_var.get()))
+        cb_file_log.grid(row=_row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        self.log_file_var = tk.StringVar(value=DEFAULT_LOG_FILE)
+        ctk.CTkEntry(tab_runtime, textvariable=self.log_file_var).grid(row=_row, column=2, columnspan=2, padx=5, pady=5, sticky="ew")
+        ToolTip(cb_file_log, f"Keep every message, including DEBUG, in a rotating log file. The log pane only keeps the last {LOG_PANE_MAX_LINES} lines.")
+        _row += 1
+        self.store_var = tk.BooleanVar(value=False)
+        cb_store = ctk.CTkCheckBox(tab_runtime, text="Keep Results In SQLite Store:", variable=self.store_var)
+        cb_store.grid(row=_row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        self.store_path_var = tk.StringVar(value=DEFAULT_STORE_FILE)
+        ctk.CTkEntry(tab_runtime, textvariable=self.store_path_var).grid(row=_row, column=2, columnspan=2, padx=5, pady=5, sticky="ew")
+        ToolTip(cb_store, "Write results to an SQLite file instead of keeping them in memory. Filtering, sorting and exports become "
+                          "indexed queries, memory stays flat on long scans, and the file can be reopened later (Open Store...).")
+        _row += 1
+        self.metrics_file_var = tk.BooleanVar(value=False)
+        cb_metrics_file = ctk.CTkCheckBox(tab_runtime, text="Save Scan Metrics (JSON) Next To Output", variable=self.metrics_file_var)
+        cb_metrics_file.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="w")
+        ToolTip(cb_metrics_file, "When a scan ends, write its counters and histograms to <output>.metrics.json.")
+        _row += 1
+        self.metrics_server_var = tk.BooleanVar(value=False)
+        cb_metrics_server = ctk.CTkCheckBox(tab_runtime, text="Serve Metrics On Port:", variable=self.metrics_server_var,
+                                            command=lambda: self.set_metrics_server(self.metrics_server_var.get()))
+        cb_metrics_server.grid(row=_row, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        self.metrics_port_var = tk.IntVar(value=DEFAULT_METRICS_PORT)
+        ctk.CTkEntry(tab_runtime, textvariable=self.metrics_port_var, width=70).grid(row=_row, column=2, padx=5, pady=5, sticky="w")
+        ToolTip(cb_metrics_server, "Serve the current scan's metrics on http://127.0.0.1:<port>/metrics (Prometheus text) and /metrics.json.")
+        _row += 1
+        self.metrics_label = ctk.CTkLabel(tab_runtime, text="Metrics: no scan yet", anchor="w", justify="left", font=(MONOSPACE_FONT[0], 9))
+        self.metrics_label.grid(row=_row, column=0, columnspan=4, padx=10, pady=5, sticky="ew")
+        ToolTip(self.metrics_label, "Responses by outcome, filter rejections by rule, handler and body-fetch latency, captured bytes, phase times and queue depths.")
+        _row += 1
+
         # --- Log Frame ---
         log_frame = ctk.CTkFrame(left_pane, corner_radius=5)
         log_frame.grid(row=1, column=0, padx=0, pady=0, sticky="nsew")
@@ -506,36 +852,43 @@ class ViperApiGuiPro(ctk.CTk):
         filter_frame.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="ew") # Span scrollbar column
         lbl_filter = ctk.CTkLabel(filter_frame, text="Filter Results:"); lbl_filter.pack(side=tk.LEFT, padx=(0,5))
         self.filter_var = tk.StringVar()
-        self.filter_var.trace_add("write", self.apply_filter) # Filter as user types
-        self.filter_entry = ctk.CTkEntry(filter_frame, textvariable=self.filter_var, placeholder_text="Filter by URL, Method, Status...")
+        self.filter_var.trace_add("write", self.schedule_filter) # Filter as user types (debounced)
+        self.filter_entry = ctk.CTkEntry(filter_frame, textvariable=self.filter_var, placeholder_text="Filter: text, or method:POST status:2xx host:*.example.com size:>1mb ...")
         self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.filter_entry.bind("<Return>", self.apply_filter)
         ToolTip(lbl_filter, "Filter the discovered API table below.")
-        ToolTip(self.filter_entry, "Type text to filter results (case-insensitive).")
-
-        # Treeview (Results Table using ttk)
-        self.tree = ttk.Treeview(table_frame, columns=("Method", "Status", "URL", "ContentType"), show="headings") # Style set in configure_styles
+        ToolTip(self.filter_entry, "Type text to filter results (case-insensitive), and/or field clauses:\n"
+                                   "method:GET,POST  status:2xx,>=400  host:*.example.com  path:/api/*\n"
+                                   "size:>1mb  hits:>10  url:/v2/  type:json  header:authorization[=text]\n"
+                                   "All clauses must match; prefix '-' to negate, quote values with spaces.")
+
+        # Results table: a Treeview that only holds the rows in view (see VirtualTable)
+        self.results_table = VirtualTable(table_frame, self.results_model, ("Method", "Status", "URL", "ContentType", "Hits"),
+                                          self.tree_row_values, self.on_tree_select)
+        self.tree = self.results_table.tree
         self.tree.heading("Method", text="Method", command=lambda: self.sort_treeview("Method", False))
         self.tree.heading("Status", text="Status", command=lambda: self.sort_treeview("Status", False))
         self.tree.heading("URL", text="URL", command=lambda: self.sort_treeview("URL", False))
         self.tree.heading("ContentType", text="Content-Type", command=lambda: self.sort_treeview("ContentType", False))
+        self.tree.heading("Hits", text="Hits", command=lambda: self.sort_treeview("Hits", True))
         # Adjust column widths
         self.tree.column("Method", width=80, anchor=tk.W, stretch=False)
         self.tree.column("Status", width=70, anchor=tk.CENTER, stretch=False)
         self.tree.column("URL", width=500, anchor=tk.W, stretch=True) # Give URL most space
         self.tree.column("ContentType", width=200, anchor=tk.W, stretch=False)
+        self.tree.column("Hits", width=60, anchor=tk.E, stretch=False)
 
-        # Scrollbars for Treeview
-        vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
+        # Scrollbars for Treeview (the vertical one scrolls the model, not the widget)
+        vsb = self.results_table.vsb
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.tree.configure(xscrollcommand=hsb.set)
 
         # Grid layout for Treeview and Scrollbars
         self.tree.grid(row=1, column=0, sticky="nsew")
         vsb.grid(row=1, column=1, sticky="ns")
         hsb.grid(row=2, column=0, sticky="ew") # Horizontal scrollbar below tree
 
-        # Treeview Bindings
-        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        # Treeview Bindings (selection, scrolling and arrow keys are handled by VirtualTable)
         self.tree.bind("<Button-3>", self.show_tree_menu) # Right-click menu
 
         # Treeview Context Menu
@@ -559,6 +912,7 @@ class ViperApiGuiPro(ctk.CTk):
         tab_req = self.details_tabview.add("Request")
         tab_resp = self.details_tabview.add("Response")
         tab_raw = self.details_tabview.add("Raw Body")
+        tab_samples = self.details_tabview.add("Samples")
 
         # --- Request Tab Content ---
         tab_req.grid_columnconfigure(0, weight=1)
@@ -592,6 +946,17 @@ class ViperApiGuiPro(ctk.CTk):
         self.raw_body_text = ctk.CTkTextbox(tab_raw)
         self.raw_body_text.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         ToolTip(self.raw_body_text, "The full raw response body. JSON is pretty-printed, text shown directly, binary shown as Base64.")
+        self.raw_more_button = ctk.CTkButton(tab_raw, text="Load More", command=self.load_more_raw_body, width=120)
+        self.raw_more_button.grid(row=1, column=0, sticky="e", padx=5, pady=(0, 5))
+        self.raw_more_button.grid_remove() # Shown only while part of the body is not displayed yet
+        ToolTip(self.raw_more_button, f"Long bodies are shown {DETAIL_PAGE_CHARS // 1024}K characters at a time.")
+
+        # --- Samples Tab Content ---
+        tab_samples.grid_columnconfigure(0, weight=1)
+        tab_samples.grid_rowconfigure(0, weight=1)
+        self.samples_text = ctk.CTkTextbox(tab_samples)
+        self.samples_text.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
+        ToolTip(self.samples_text, "Endpoint template mode: hit count and a few concrete URLs seen for this endpoint.")
 
         # --- Bottom Controls Row ---
         bottom_controls = ctk.CTkFrame(self, fg_color="transparent")
@@ -613,17 +978,38 @@ class ViperApiGuiPro(ctk.CTk):
         btn_clear = ctk.CTkButton(bottom_controls, text="Clear All", command=self.clear_results_and_log, width=100)
         btn_clear.pack(side=tk.LEFT, padx=10)
         ToolTip(btn_clear, "Clear results table, details panels, and log messages.")
+        btn_open_store = ctk.CTkButton(bottom_controls, text="Open Store...", command=self.open_result_store_file, width=100)
+        btn_open_store.pack(side=tk.LEFT, padx=10)
+        ToolTip(btn_open_store, "Show the results of an earlier scan from its SQLite result store.")
+        btn_open_results = ctk.CTkButton(bottom_controls, text="Open Results...", command=self.open_results_file, width=110)
+        btn_open_results.pack(side=tk.LEFT, padx=10)
+        ToolTip(btn_open_results, "Load a saved results file (JSON export or NDJSON journal, optionally .gz) into the table.\n"
+                                  "Rows appear while the file is read. With 'Keep Results In SQLite Store' on they go to the store, so memory stays flat.")
 
         # Export Button (Menu - New Options Added)
-        export_options = ["Export Visible JSON", "Export Visible CSV", "Export All JSON", "Export All CSV"]
+        export_options = ["Export Visible JSON", "Export Visible CSV", "Export All JSON", "Export All CSV", "Export OpenAPI Spec"]
         self.export_menu_button = ctk.CTkOptionMenu(bottom_controls, values=export_options, command=self.export_data, width=170)
         self.export_menu_button.pack(side=tk.RIGHT, padx=(10, 0))
         self.export_menu_button.set("Export...") # Default text
         ToolTip(self.export_menu_button, "Save discovered API data (visible or all).")
 
         # --- Status Bar Row ---
-        self.status_label = ctk.CTkLabel(self, text="Status: Idle", anchor="w", height=20, font=(MONOSPACE_FONT[0], 9))
-        self.status_label.grid(row=2, column=0, columnspan=2, padx=10, pady=(0,5), sticky="ew")
+        status_bar = ctk.CTkFrame(self, fg_color="transparent")
+        status_bar.grid(row=2, column=0, columnspan=2, padx=10, pady=(0,5), sticky="ew")
+        self.status_label = ctk.CTkLabel(status_bar, text="Status: Idle", anchor="w", height=20, font=(MONOSPACE_FONT[0], 9))
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.queue_stats_label = ctk.CTkLabel(status_bar, text="Queue: 0", anchor="e", height=20, font=(MONOSPACE_FONT[0], 9))
+        self.queue_stats_label.pack(side=tk.RIGHT)
+        # Export/import progress (packed only while one runs)
+        self.file_task_frame = ctk.CTkFrame(status_bar, fg_color="transparent")
+        self.file_task_label = ctk.CTkLabel(self.file_task_frame, text="", anchor="e", height=20, font=(MONOSPACE_FONT[0], 9))
+        self.file_task_label.pack(side=tk.LEFT, padx=(0, 5))
+        self.file_task_progress = ttk.Progressbar(self.file_task_frame, orient='horizontal', mode='determinate', length=150)
+        self.file_task_progress.pack(side=tk.LEFT, padx=5)
+        btn_cancel_task = ctk.CTkButton(self.file_task_frame, text="Cancel", command=self.cancel_file_task, width=60, height=20)
+        btn_cancel_task.pack(side=tk.LEFT, padx=(5, 10))
+        ToolTip(btn_cancel_task, "Stop the export (the partial file is removed) or the loading of a results file (rows loaded so far stay).")
+        ToolTip(self.queue_stats_label, "Messages waiting for the GUI, and time from capture to display of the latest result.")
 
     # --- GUI Logic Methods ---
 
@@ -634,10 +1020,157 @@ class ViperApiGuiPro(ctk.CTk):
              "ERROR": logging.ERROR, "SUCCESS": logging.INFO # Treat SUCCESS as INFO for filtering level
          }
         level = level_map.get(choice.upper(), logging.INFO)
-        log.setLevel(level) # Set root logger level - affects what's processed by handlers
-        # Queue handler doesn't need level set usually, GUI handles filtering display
+        # Gate at the handler: lower records are dropped before they are queued. The logger stays at
+        # DEBUG so the log file (if enabled) still gets the full history.
+        self.queue_handler.setLevel(level)
         self.log_message_direct(f"Log level set to display {choice} and higher.", level="INFO")
 
+    def set_file_log(self, enabled):
+        """Opens or closes the rotating on-disk log."""
+        if self.file_log_handler:
+            close_rotating_log(self.file_log_handler)
+            self.file_log_handler = None
+        if not enabled: return
+        path = self.log_file_var.get().strip() or DEFAULT_LOG_FILE
+        try:
+            self.file_log_handler = open_rotating_log(path)
+            log.info(f"Writing the full log (DEBUG and up) to {os.path.abspath(path)}")
+        except OSError as e:
+            log.error(f"Could not open log file {path}: {e}")
+            self.file_log_var.set(False)
+
+    def use_result_store(self, path):
+        """
+        Switches the results table to the SQLite store at `path`, or back to the in-memory dict (None).
+        Returns False (after telling the user) if the store cannot be opened.
+        """
+        if not path and not self.result_store: return True # Already in memory mode
+        if self.result_store and path and os.path.abspath(path) == os.path.abspath(self.result_store.path):
+            return True
+        try:
+            store = ResultStore(path) if path else None
+        except Exception as e: # sqlite3.Error, or a store from a newer version
+            messagebox.showerror("Result Store", f"Could not open result store {path}:\n{e}", parent=self)
+            return False
+        if self.result_store: self.result_store.close()
+        self.result_store = store
+        self.current_selection_iid = None
+        self.results_table.clear_selection()
+        self.detail_renderer.cancel()
+        self.detail_renderer.cache.clear()
+        if store:
+            self.api_results_data = StoreRecords(store)
+            self.results_model = StoreResultsModel(store, self.api_results_data)
+            store.changed() # Baseline for the writer's commits
+        else:
+            self.api_results_data = {}
+            self.results_model = ResultsModel(self.api_results_data)
+        self.results_table.model = self.results_model
+        self.results_table.top = 0
+        self.filter_var.set("")
+        self.results_table.refresh()
+        return True
+
+    def open_result_store_file(self):
+        """Reopens the result store of an earlier scan."""
+        if self.scan_thread and self.scan_thread.is_alive():
+            messagebox.showwarning("Scan Running", "Cannot open a result store while a scan is running.", parent=self)
+            return
+        if self.file_task_running():
+            messagebox.showwarning("File Task Running", "Wait for the export or import to finish (or cancel it) first.", parent=self)
+            return
+        filename = filedialog.askopenfilename(
+            filetypes=[("SQLite result store", "*.sqlite *.db"), ("All files", "*.*")],
+            initialdir=os.path.dirname(self.store_path_var.get()) or ".",
+            title="Open Result Store", parent=self)
+        if not filename or not self.use_result_store(filename): return
+        self.clear_details_panes()
+        self.update_status(f"Opened result store {os.path.basename(filename)}: {len(self.results_model)} result(s).")
+        log.info(f"Opened result store {filename} ({len(self.results_model)} results).")
+
+    def sync_result_store(self, pending):
+        """Store mode: shows rows (and hit counts) the scan's store writer has committed since the last drain."""
+        if not self.result_store.changed(): return
+        self.api_results_data.invalidate() # Hit counts/samples may have changed
+        if self.results_model.poll() and pending['ts'] is not None:
+            self._last_latency = time.monotonic() - pending['ts']
+        self.results_table.refresh()
+        if self.current_selection_iid is not None and self.current_selection_iid in self.api_results_data:
+            self.show_samples(self.api_results_data[self.current_selection_iid])
+
+    def set_metrics_server(self, enabled):
+        """Starts or stops the local metrics endpoint (it always serves the current scan's metrics)."""
+        if self.metrics_server:
+            self.metrics_server.close()
+            self.metrics_server = None
+        if not enabled: return
+        try:
+            self.metrics_server = MetricsServer(lambda: self.scan_metrics, int(self.metrics_port_var.get()))
+        except (OSError, ValueError, OverflowError, tk.TclError) as e:
+            log.error(f"Could not serve metrics: {e}")
+            self.metrics_server_var.set(False)
+
+    def update_metrics_summary(self, force=False):
+        """Refreshes the scan metrics summary on the Runtime tab (throttled)."""
+        now = time.monotonic()
+        if not force and now - self._metrics_shown_at < GUI_METRICS_INTERVAL: return
+        self._metrics_shown_at = now
+        if not self.scan_metrics: return
+        try: self.metrics_label.configure(text="\n".join(self.scan_metrics.summary_lines()))
+        except tk.TclError: pass
+
+    def on_warm_runtime_toggle(self):
+        """Shuts the warm runtime down when disabled (deferred to scan end if a scan is running)."""
+        if self.warm_runtime_var.get():
+            log.info("Warm browser runtime enabled. It starts with the next scan.")
+        elif not (self.scan_thread and self.scan_thread.is_alive()):
+            self.release_scan_runtime()
+
+    def get_scan_runtime(self):
+        """Returns the warm ScanRuntime (creating or reconfiguring it), or None when warm mode is off."""
+        if not self.warm_runtime_var.get():
+            return None
+        try:
+            pool_size = max(1, int(self.runtime_pool_size_var.get()))
+            max_scans = max(1, int(self.runtime_max_scans_var.get()))
+            max_rss = max(0, int(self.runtime_max_rss_var.get()))
+        except (tk.TclError, ValueError):
+            log.warning("Invalid runtime settings. Using defaults.")
+            pool_size, max_scans, max_rss = 2, 50, 2048
+        if self.scan_runtime is None:
+            self.scan_runtime = ScanRuntime(pool_size=pool_size, max_scans_per_browser=max_scans, max_rss_mb=max_rss)
+        else:
+            self.scan_runtime.pool_size = pool_size
+            self.scan_runtime.max_scans_per_browser = max_scans
+            self.scan_runtime.max_rss_mb = max_rss
+        return self.scan_runtime
+
+    def get_blob_store(self):
+        """Returns the on-disk store for large response bodies (a temp dir, removed by release_resources when the window closes)."""
+        if self.blob_store is None:
+            self.blob_store = BlobStore()
+            log.debug(f"Large response bodies are stored in {self.blob_store.root}")
+        return self.blob_store
+
+    def release_scan_runtime(self):
+        """Shuts down the warm runtime in the background (closing pooled browsers)."""
+        runtime, self.scan_runtime = self.scan_runtime, None
+        if runtime:
+            threading.Thread(target=runtime.shutdown, daemon=True).start()
+            log.info("Warm browser runtime shut down.")
+        self.update_runtime_stats()
+
+    def update_runtime_stats(self):
+        """Refreshes the runtime stats label on the Runtime tab."""
+        if not self.scan_runtime:
+            text = "Runtime: not started"
+        else:
+            st = self.scan_runtime.stats()
+            text = (f"Runtime: {st['scans']} scans, {st['launches']} launches, {st['reuses']} reuses, "
+                    f"{st['recycled']} recycled, {st['idle']} idle | saved ~{st['seconds_saved']:.1f}s startup")
+        try: self.runtime_stats_label.configure(text=text)
+        except tk.TclError: pass
+
     def on_user_agent_change(self, choice):
         """Shows/hides the custom User Agent entry based on selection."""
         if choice == "Custom":
@@ -658,28 +1191,16 @@ class ViperApiGuiPro(ctk.CTk):
     def get_proxy_config(self):
         """Constructs the proxy dictionary for Playwright from GUI inputs."""
         proxy_str = self.proxy_entry.get().strip()
-        if not proxy_str: return None
-        proxy_type = self.proxy_type_var.get().lower() # Ensure lowercase
-        # Ensure scheme is added if not present (e.g., user enters 127.0.0.1:8080)
-        server = f"{proxy_type}://{proxy_str}" if not proxy_str.startswith(('http://', 'https://', 'socks5://')) else proxy_str
-        # Basic validation
         try:
-            parsed = urlparse(server)
-            if not parsed.hostname or not parsed.port:
-                 raise ValueError("Invalid hostname or port")
+            return build_proxy_config(proxy_str, self.proxy_type_var.get())
         except ValueError as e:
              log.warning(f"Invalid proxy format: {proxy_str}. Error: {e}. Ignoring proxy.")
              self.log_message_direct(f"Invalid proxy format ignored: {proxy_str}", level="WARNING")
              return None
-        return {"server": server}
 
     def update_user_ignore_list(self):
         """Updates the list of custom patterns to ignore from the textbox."""
-        self.user_ignore_list = [
-            line.strip().lower()
-            for line in self.ignore_textbox.get("1.0", tk.END).splitlines()
-            if line.strip() and not line.strip().startswith('#') # Ignore empty lines and comments
-        ]
+        self.user_ignore_list = [line.lower() for line in parse_pattern_lines(self.ignore_textbox.get("1.0", tk.END))]
         log.info(f"Using {len(self.user_ignore_list)} custom ignore patterns.")
 
     def update_allowed_resource_types(self):
@@ -690,34 +1211,14 @@ class ViperApiGuiPro(ctk.CTk):
     def parse_status_codes(self):
         """Parses the status code entry to create a set of allowed codes."""
         code_input = self.status_code_entry.get().strip().lower()
-        self.allowed_status_codes = set() # Reset first
-
         if not code_input:
             log.debug("Status code filter empty. Defaulting to allow <400 codes.")
             # No specific codes means we use the default logic in is_likely_api_call
+            self.allowed_status_codes = set()
             return
-
-        parts = code_input.split(',')
         try:
-            for part in parts:
-                part = part.strip()
-                if not part: continue
-                if 'x' in part: # Handle ranges like 2xx, 4xx
-                    if len(part) == 3 and part.endswith('xx') and part[0].isdigit():
-                        base = int(part[0])
-                        if 1 <= base <= 5:
-                            self.allowed_status_codes.update(range(base * 100, (base + 1) * 100))
-                        else: raise ValueError(f"Invalid range base: {part}")
-                    else: raise ValueError(f"Invalid range format: {part}. Use '1xx' to '5xx'.")
-                elif part.isdigit(): # Handle specific codes
-                     code = int(part)
-                     if 100 <= code <= 599:
-                         self.allowed_status_codes.add(code)
-                     else: raise ValueError(f"Status code out of range (100-599): {part}")
-                else: raise ValueError(f"Invalid status code format: {part}")
-
+            self.allowed_status_codes = parse_status_codes(code_input)
             log.info(f"Explicit allowed status codes set: {sorted(list(self.allowed_status_codes))}")
-
         except ValueError as e:
              log.warning(f"Invalid status code input '{code_input}': {e}. Reverting to default (<400).")
              self.log_message_direct(f"Invalid status code input: {e}. Using default.", level="WARNING")
@@ -741,26 +1242,45 @@ class ViperApiGuiPro(ctk.CTk):
         Directly inserts a message into the log textbox in a thread-safe way.
         Ensures the textbox is temporarily enabled for insertion.
         """
+        self.log_messages_direct([(message, level)], tags)
+
+    def log_messages_direct(self, entries, tags=(), dropped=0):
+        """
+        Inserts several (message, level) log lines with a single Text insert (one enable/scroll/disable per batch),
+        then trims the pane to its newest LOG_PANE_MAX_LINES lines. `dropped` lines never made it into the batch.
+        """
+        if not entries: return
         try:
+            follow = self.log_textbox.yview()[1] >= 0.999 # Only auto-scroll if the user has not scrolled up
             # Ensure the textbox is normal before inserting
             self.log_textbox.configure(state=tk.NORMAL)
 
-            level_tag = level.upper()
-            # Make sure the level tag exists, otherwise use default 'INFO'
-            if level_tag not in self.log_textbox.tag_names():
-                level_tag = 'INFO'
-
-            # Combine level tag with any other custom tags
-            all_tags = (level_tag,) + tuple(tags)
-            self.log_textbox.insert(tk.END, f"{message}\n", all_tags)
-            self.log_textbox.see(tk.END) # Scroll to the end
+            known_tags = self.log_textbox.tag_names()
+            insert_args = []
+            for message, level in entries:
+                level_tag = level.upper()
+                # Make sure the level tag exists, otherwise use default 'INFO'
+                if level_tag not in known_tags:
+                    level_tag = 'INFO'
+                # Combine level tag with any other custom tags
+                insert_args += [f"{message}\n", (level_tag,) + tuple(tags)]
+            if dropped:
+                insert_args[:0] = [f"[... {dropped} older log lines skipped in the pane ...]\n", ('WARNING',)]
+            self.log_textbox.insert(tk.END, *insert_args)
+
+            # Ring buffer: drop the oldest lines once the pane holds too many
+            lines = int(self.log_textbox.index('end-1c').split('.')[0]) # Line after the final newline = line count + 1
+            if lines > LOG_PANE_MAX_LINES + LOG_PANE_TRIM_SLACK:
+                self.log_textbox.delete("1.0", f"{lines - LOG_PANE_MAX_LINES}.0")
+            if follow:
+                self.log_textbox.see(tk.END) # Scroll to the end
 
             # Set back to disabled *after* insert, making it read-only
             self.log_textbox.configure(state=tk.DISABLED)
 
         except Exception as e:
              # Fallback print if GUI logging fails catastrophically
-             print(f"Direct Log Error ({level}): {message}\nError: {e}", file=sys.stderr)
+             print(f"Direct Log Error: {entries[-1][0]}\nError: {e}", file=sys.stderr)
 
 
     def update_status(self, text):
@@ -794,20 +1314,41 @@ class ViperApiGuiPro(ctk.CTk):
         if self.scan_thread and self.scan_thread.is_alive():
              messagebox.showwarning("Scan Running", "Cannot clear results while a scan is running.", parent=self)
              return
+        if self.file_task_running():
+             messagebox.showwarning("File Task Running", "Cannot clear results while an export or import is running.", parent=self)
+             return
+        self.reset_results()
 
-        # Clear Treeview
-        try:
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-        except tk.TclError:
-            log.warning("Error clearing Treeview items (widget might be closing).")
+        # Clear filter entry
+        self.filter_var.set("")
 
-        # Clear internal data store
-        self.api_results_data = {}
+        # Clear and reset log
+        self.clear_log()
+        self.update_status("Cleared.")
+        log.info("Results and log cleared.")
+
+    def reset_results(self):
+        """Empties the results (memory or store), the table, the detail panes and what belongs to the results."""
+        # Clear internal data store and the table rows
+        if self.result_store:
+            self.result_store.clear()
+            self.api_results_data.invalidate()
+            self.results_model.reset(self.result_store, self.api_results_data)
+        else:
+            self.api_results_data = {}
+            self.results_model.reset(self.api_results_data)
         self.current_selection_iid = None
+        self.results_table.top = 0
+        self.results_table.clear_selection()
+        self.detail_renderer.cancel()
+        self.detail_renderer.cache.clear()
+        self.schema_registry.clear() # Inferred schemas belong to the cleared results
+        self.set_raw_body_view(None)
+        if self.blob_store:
+            self.blob_store.clear() # Spilled bodies belong to the cleared results
 
         # Clear detail textboxes safely
-        for textbox in [self.req_headers_text, self.req_body_text, self.resp_headers_text, self.resp_body_text, self.raw_body_text]:
+        for textbox in [self.req_headers_text, self.req_body_text, self.resp_headers_text, self.resp_body_text, self.raw_body_text, self.samples_text]:
             try:
                 textbox.configure(state=tk.NORMAL)
                 textbox.delete("1.0", tk.END)
@@ -815,128 +1356,58 @@ class ViperApiGuiPro(ctk.CTk):
             except tk.TclError: pass # Ignore errors if widgets are destroyed
             except AttributeError: pass # Ignore if widget doesn't exist yet
 
-        # Clear filter entry
-        self.filter_var.set("")
-
-        # Clear and reset log
-        self.clear_log()
-        self.update_status("Cleared.")
-        log.info("Results and log cleared.")
+    def schedule_filter(self, *args):
+        """Applies the filter once typing pauses, so a burst of keystrokes filters once."""
+        if self._filter_after_id is not None:
+            self.after_cancel(self._filter_after_id)
+        self._filter_after_id = self.after(FILTER_DEBOUNCE_MS, self.apply_filter)
 
     def apply_filter(self, *args):
-        """Filters the Treeview based on the filter entry content."""
-        filter_term = self.filter_var.get().lower()
-        # Detach all items first for cleaner filtering when items are *removed* by the filter
+        """Filters the results table based on the filter entry content."""
+        if self._filter_after_id is not None:
+            self.after_cancel(self._filter_after_id)
+            self._filter_after_id = None
         try:
-            all_tree_items = self.tree.get_children('')
-            if all_tree_items: # Only detach if there are items
-                self.tree.detach(*all_tree_items)
-        except tk.TclError:
-            log.warning("Error detaching Treeview items during filter (widget might be closing).")
-            return # Avoid further processing if tree is unusable
-
-        items_to_show_ids = []
-        # Iterate through internal data, not the tree itself, for filtering logic
-        for api_key, api_data in self.api_results_data.items():
-            # Check if any relevant field contains the filter term
-            match = ( not filter_term or # Show all if filter is empty
-                      filter_term in api_data.get('method', '').lower() or
-                      filter_term in str(api_data.get('status', '')).lower() or
-                      filter_term in api_data.get('url', '').lower() or
-                      filter_term in api_data.get('content_type', '').lower() )
-            if match:
-                items_to_show_ids.append(api_key)
-
-        # Re-insert matched items in their original order (or sorted order if preferred)
-        # Maintaining original insertion order might feel more natural during filtering
-        # sorted_items_to_show = sorted(items_to_show, key=lambda k: list(self.api_results_data.keys()).index(k))
-        for i, api_key in enumerate(items_to_show_ids):
-             try:
-                  # Re-attach/move the item to the correct filtered position
-                  self.tree.move(api_key, '', i)
-             except tk.TclError:
-                  # This might happen if the item was somehow deleted between internal check and move
-                  log.warning(f"Error moving filtered item {api_key} (might have been deleted).")
-                  # Try to re-insert if it doesn't exist (should be rare)
-                  if not self.tree.exists(api_key) and api_key in self.api_results_data:
-                      self.add_api_to_tree(api_key, self.api_results_data[api_key], index=i)
-
-             except Exception as e:
-                  log.error(f"Unexpected error applying filter to item {api_key}: {e}", exc_info=True)
+            if not self.results_model.set_filter(self.filter_var.get()):
+                return
+        except QueryError as e: # Keep the current rows until the query parses
+            self.update_status(f"Filter: {e}")
+            return
+        self.results_table.top = 0
 
         # Clear selection if the selected item is filtered out
-        if self.current_selection_iid and self.current_selection_iid not in items_to_show_ids:
-             try:
-                 self.tree.selection_set(()) # Empty selection
-             except tk.TclError: pass # Ignore if tree closed
+        if self.current_selection_iid and self.results_model.row_of(self.current_selection_iid) is None:
+             self.current_selection_iid = None
+             self.results_table.clear_selection() # Empty selection
              self.clear_details_panes() # Clear details
+        else:
+             self.results_table.refresh()
 
 
     def sort_treeview(self, col, reverse):
-        """Sorts the Treeview column based on the underlying data."""
-        col_map = {"Method": "method", "Status": "status", "URL": "url", "ContentType": "content_type"}
+        """Sorts the results table column based on the underlying data."""
+        col_map = {"Method": "method", "Status": "status", "URL": "url", "ContentType": "content_type", "Hits": "hits"}
         data_key = col_map.get(col)
         if not data_key: return # Should not happen with current columns
+        if not len(self.results_model): return # Nothing visible to sort
 
-        # Get data only for items *currently visible* in the tree
+        # Numeric sort for Status/Hits, case-insensitive string sort otherwise; missing values last
         try:
-            items_to_sort = self.tree.get_children('')
-        except tk.TclError:
-             log.warning("Cannot sort, Treeview widget likely closed.")
-             return
-        if not items_to_sort: return # Nothing visible to sort
-
-        # Create a list of tuples (value_to_sort_by, item_id)
-        data_list = []
-        for item_id in items_to_sort:
-            api_data = self.api_results_data.get(item_id) # Get data from internal store
-            if api_data:
-                 # Use a default value for sorting if key is missing or None
-                 sort_val = api_data.get(data_key)
-                 data_list.append((sort_val, item_id))
-            else:
-                # Should not happen if tree is synced with data, but handle defensively
-                data_list.append((None, item_id))
-
-
-        # Determine sort type (numeric for Status, string otherwise)
-        is_numeric = (col == "Status")
-
-        # Define a robust sort key function
-        def sort_key(item_tuple):
-            val, _ = item_tuple
-            if val is None: # Handle missing values (sort Nones last)
-                return float('inf') if not reverse else float('-inf')
-            if is_numeric:
-                try: return int(val)
-                except (ValueError, TypeError): return float('inf') if not reverse else float('-inf') # Non-numeric status codes last
-            else:
-                return str(val).lower() # Case-insensitive string sort
-
-        # Perform the sort
-        try:
-             data_list.sort(key=sort_key, reverse=reverse)
+             self.results_model.sort(data_key, reverse=reverse, numeric=col in ("Status", "Hits"))
         except Exception as e:
              log.error(f"Error during tree sort: {e}", exc_info=True)
              return # Abort sort on error
-
-        # Reorder items in the treeview
-        try:
-            for index, (val, item_id) in enumerate(data_list):
-                self.tree.move(item_id, '', index)
-        except tk.TclError:
-             log.warning("Could not move item during sort (widget might be closing).")
+        self.results_table.top = 0
+        self.results_table.refresh()
 
         # Update the heading command to reverse sort next time
         self.tree.heading(col, command=lambda: self.sort_treeview(col, not reverse))
 
     def show_tree_menu(self, event):
         """Displays the right-click context menu for the Treeview."""
-        iid = self.tree.identify_row(event.y) # Get item id under cursor
-        if iid:
-            if iid not in self.tree.selection(): # Select if not already selected
-                self.tree.selection_set(iid)
-            self.on_tree_select(None) # Update details pane for the selection
+        api_key = self.results_table.key_at_y(event.y) # Get row under cursor
+        if api_key:
+            self.results_table.select_key(api_key) # Select (and show details) if not already selected
             try:
                  # Position and show the menu
                  self.tree_menu.tk_popup(event.x_root, event.y_root)
@@ -947,7 +1418,7 @@ class ViperApiGuiPro(ctk.CTk):
     def copy_selected_url(self):
         """Copies the URL of the selected Treeview item to the clipboard."""
         if self.current_selection_iid and self.current_selection_iid in self.api_results_data:
-            url = self.api_results_data[self.current_selection_iid].get('url', 'N/A')
+            url = self.api_results_data[self.current_selection_iid].url or 'N/A'
             try:
                 self.clipboard_clear()
                 self.clipboard_append(url)
@@ -967,10 +1438,10 @@ class ViperApiGuiPro(ctk.CTk):
             return
 
         data = self.api_results_data[self.current_selection_iid]
-        url = data.get('url')
-        method = data.get('method', 'GET').upper()
-        headers = data.get('request_headers', {})
-        req_body_bytes = data.get('request_body') # Raw bytes
+        url = data.url
+        method = (data.method or 'GET').upper()
+        headers = data.request_headers
+        req_body_bytes = data.request_body # Raw bytes
 
         if not url:
             self.log_message_direct("Cannot generate cURL: URL missing.", level="ERROR")
@@ -1046,24 +1517,19 @@ class ViperApiGuiPro(ctk.CTk):
              log.error(f"Unexpected error generating cURL: {e}", exc_info=True)
              self.update_status("Error generating cURL command.")
 
-    def on_tree_select(self, event):
-        """Handles item selection in the Treeview, displays details."""
+    def on_tree_select(self, api_key):
+        """Handles row selection in the results table (click, arrow keys, right-click), displays details."""
         try:
-            selected_items = self.tree.selection()
-            if not selected_items:
-                # If selection cleared, maybe clear details or do nothing
-                # self.current_selection_iid = None
-                # self.clear_details_panes() # Option: clear details when selection is lost
-                return
-
-            self.current_selection_iid = selected_items[0]
+            self.current_selection_iid = api_key
             self.show_details(self.current_selection_iid)
         except tk.TclError:
             log.warning("Error during tree selection (widget might be closing).")
 
     def clear_details_panes(self):
          """Clears all detail text boxes safely."""
-         for textbox in [self.req_headers_text, self.req_body_text, self.resp_headers_text, self.resp_body_text, self.raw_body_text]:
+         self.detail_renderer.cancel()
+         self.set_raw_body_view(None)
+         for textbox in [self.req_headers_text, self.req_body_text, self.resp_headers_text, self.resp_body_text, self.raw_body_text, self.samples_text]:
              try:
                  if textbox.winfo_exists(): # Check if widget exists
                      textbox.configure(state=tk.NORMAL)
@@ -1071,179 +1537,268 @@ class ViperApiGuiPro(ctk.CTk):
                      textbox.configure(state=tk.DISABLED)
              except Exception: pass # Ignore other potential errors
 
+    def populate_textbox(self, textbox, content, highlight_keys=None):
+        """ Replaces a detail textbox's content: header (name, value) pairs (highlighted) or text. """
+        try:
+            if not textbox.winfo_exists(): return
+            textbox.configure(state=tk.NORMAL)
+            textbox.delete("1.0", tk.END)
+            if content:
+                if highlight_keys is not None: # For headers
+                    insert_args = []
+                    for key, value in content:
+                         tag = "interesting_header" if key.lower() in highlight_keys else "normal_header"
+                         insert_args += [f"{key}: {value}\n", (tag,)]
+                    textbox.insert(tk.END, *insert_args)
+                    textbox.tag_config("interesting_header", foreground="#FFFF00") # Yellow
+                    textbox.tag_config("normal_header", foreground="#CCCCCC") # Default
+                else: # For body text/snippets
+                     textbox.insert("1.0", str(content))
+            else: # Handle empty content
+                textbox.insert("1.0", "[No Content]")
+            textbox.configure(state=tk.DISABLED)
+        except Exception as e:
+            log.error(f"Error populating textbox: {e}", exc_info=True)
+            try: # Try to disable textbox even on error
+                textbox.configure(state=tk.DISABLED)
+            except: pass
+
     def show_details(self, api_key):
-        """Populates the detail tabs based on the selected API key."""
+        """
+        Populates the detail tabs for the selected API key. Bodies are formatted by the details worker
+        (or taken from its cache); headers and samples are cheap and shown at once.
+        """
         if api_key not in self.api_results_data:
             self.clear_details_panes()
             log.debug(f"No data found for selected key: {api_key}")
             return
 
         data = self.api_results_data[api_key]
+        view = self.detail_renderer.cache.get(api_key, data)
+        if not view and not data.response_body_blob and (data.body_size or 0) + len(data.request_body or b'') <= DETAIL_SYNC_BYTES:
+            view = render_details(data) # Small bodies: formatting costs less than a round trip to the worker
+        if view:
+            self.detail_renderer.cancel() # An older, slower render must not overwrite this one
+            self.apply_details(view)
+        else:
+            self.populate_textbox(self.req_headers_text, sorted(data.request_headers.items()), INTERESTING_HEADERS)
+            self.populate_textbox(self.resp_headers_text, sorted(data.response_headers.items()), INTERESTING_HEADERS)
+            for textbox in (self.req_body_text, self.resp_body_text, self.raw_body_text):
+                self.populate_textbox(textbox, "[Loading...]")
+            self.set_raw_body_view(None)
+            self.detail_renderer.submit(api_key, data)
+        self.show_samples(data)
+
+    def on_details_rendered(self, api_key, generation, view):
+        """ Called on the details worker thread; the view is applied by the next queue drain. """
+        self.detail_queue.put((api_key, generation, view))
+        self.wake_gui()
+
+    def apply_rendered_details(self):
+        """ Shows the newest rendered view, if it is still for the selected row. """
+        latest = None
+        while True:
+            try: latest = self.detail_queue.get_nowait()
+            except queue.Empty: break
+        if latest is None: return
+        api_key, generation, view = latest
+        if generation == self.detail_renderer.generation and api_key == self.current_selection_iid:
+            self.apply_details(view)
+
+    def apply_details(self, view):
+        """ Fills the detail tabs from a rendered DetailView (long bodies are paged). """
+        self.populate_textbox(self.req_headers_text, view.request_headers, INTERESTING_HEADERS)
+        self.populate_textbox(self.resp_headers_text, view.response_headers, INTERESTING_HEADERS)
+        req_body = view.request_body
+        if len(req_body) > DETAIL_PAGE_CHARS:
+            req_body = req_body[:DETAIL_PAGE_CHARS] + f"\n[... {len(req_body) - DETAIL_PAGE_CHARS} more characters not shown ...]"
+        self.populate_textbox(self.req_body_text, req_body)
+        self.populate_textbox(self.resp_body_text, view.response_snippet)
+        self.set_raw_body_view(view)
+
+    def set_raw_body_view(self, view):
+        """ Shows the first page of a view's raw body (None: just resets the paging). """
+        self.raw_body_view = view; self.raw_body_shown = 0
+        if view is None:
+            self.raw_more_button.grid_remove()
+            return
+        self.populate_textbox(self.raw_body_text, view.raw_note + view.raw_body[:DETAIL_PAGE_CHARS])
+        self.raw_body_shown = DETAIL_PAGE_CHARS
+        self.update_raw_more_button()
+
+    def load_more_raw_body(self):
+        """ Appends the next page of the raw body. """
+        view = self.raw_body_view
+        if view is None or self.raw_body_shown >= len(view.raw_body): return
+        try:
+            self.raw_body_text.configure(state=tk.NORMAL)
+            self.raw_body_text.insert(tk.END, view.raw_body[self.raw_body_shown:self.raw_body_shown + DETAIL_PAGE_CHARS])
+            self.raw_body_text.configure(state=tk.DISABLED)
+        except tk.TclError: return
+        self.raw_body_shown += DETAIL_PAGE_CHARS
+        self.update_raw_more_button()
+
+    def update_raw_more_button(self):
+        remaining = len(self.raw_body_view.raw_body) - self.raw_body_shown
+        if remaining > 0:
+            self.raw_more_button.configure(text=f"Load More ({remaining // 1024 + 1}K chars left)")
+            self.raw_more_button.grid()
+        else:
+            self.raw_more_button.grid_remove()
 
-        # --- Helper to populate a textbox ---
-        def populate_textbox(textbox, content, highlight_keys=None):
-            try:
-                if not textbox.winfo_exists(): return
-                textbox.configure(state=tk.NORMAL)
-                textbox.delete("1.0", tk.END)
-                if content:
-                    if isinstance(content, dict) and highlight_keys: # For headers
-                        for key, value in sorted(content.items()):
-                             tag = "interesting_header" if key.lower() in highlight_keys else "normal_header"
-                             textbox.insert(tk.END, f"{key}: {value}\n", (tag,))
-                        textbox.tag_config("interesting_header", foreground="#FFFF00") # Yellow
-                        textbox.tag_config("normal_header", foreground="#CCCCCC") # Default
-                    elif isinstance(content, str): # For body text/snippets
-                         textbox.insert("1.0", content)
-                    else: # Fallback for unexpected types
-                         textbox.insert("1.0", str(content))
-                else: # Handle empty content
-                    textbox.insert("1.0", "[No Content]")
-                textbox.configure(state=tk.DISABLED)
-            except Exception as e:
-                log.error(f"Error populating textbox: {e}", exc_info=True)
-                try: # Try to disable textbox even on error
-                    textbox.configure(state=tk.DISABLED)
-                except: pass
-
-        # --- Populate Textboxes ---
-        populate_textbox(self.req_headers_text, data.get('request_headers'), INTERESTING_HEADERS)
-        populate_textbox(self.resp_headers_text, data.get('response_headers'), INTERESTING_HEADERS)
-
-        # Process and display request body
-        req_body_bytes = data.get('request_body')
-        req_body_display = "[No Request Body]"
-        if req_body_bytes:
-            try:
-                req_body_text = req_body_bytes.decode('utf-8', errors='replace')
-                # Try pretty-printing JSON
-                if req_body_text.strip().startswith(('{', '[')):
-                    try: req_body_display = json.dumps(json.loads(req_body_text), indent=2, ensure_ascii=False)
-                    except json.JSONDecodeError: req_body_display = req_body_text # Show raw if not valid JSON
-                else: req_body_display = req_body_text # Show as text
-            except Exception as e:
-                log.debug(f"Could not decode request body for display: {e}")
-                req_body_display = "[Binary or Undecodable Request Body]"
-        populate_textbox(self.req_body_text, req_body_display)
-
-        # Display response snippet (already formatted)
-        populate_textbox(self.resp_body_text, data.get('response_snippet', '[N/A]'))
-
-        # Process and display raw response body
-        raw_body_b64 = data.get('raw_response_body_bytes')
-        raw_body_display = "[No Response Body Captured]"
-        if raw_body_b64:
-            try:
-                raw_body_bytes = base64.b64decode(raw_body_b64)
-                content_type = data.get('content_type', '').lower()
-                # Try decoding JSON/Text types
-                if 'json' in content_type:
-                    try:
-                        json_text = raw_body_bytes.decode('utf-8', errors='replace')
-                        raw_body_display = json.dumps(json.loads(json_text), indent=2, ensure_ascii=False)
-                    except Exception: raw_body_display = raw_body_bytes.decode('utf-8', errors='replace') # Fallback to raw text
-                elif content_type.startswith('text/') or any(sub in content_type for sub in ['xml', 'javascript', 'html']):
-                    try: raw_body_display = raw_body_bytes.decode('utf-8', errors='replace')
-                    except Exception: raw_body_display = f"[Binary or Undecodable Text]\n--- Base64 ---\n{raw_body_b64}"
-                else: # Assume binary
-                     raw_body_display = f"[Binary Data ({content_type or 'Unknown Type'})]\n--- Base64 ---\n{raw_body_b64}"
-            except (binascii.Error, ValueError) as b64_err:
-                 log.error(f"Base64 decode error for raw body: {b64_err}")
-                 raw_body_display = f"[Error decoding Base64: {b64_err}]\n--- Original Data ---\n{raw_body_b64}"
-            except Exception as e:
-                log.error(f"Error decoding/displaying raw body: {e}", exc_info=True)
-                raw_body_display = f"[Error decoding/displaying raw body]\n--- Base64 ---\n{raw_body_b64}"
-        populate_textbox(self.raw_body_text, raw_body_display)
+    def show_samples(self, data):
+        """Fills the Samples tab: template, hit count and the concrete URLs kept for it."""
+        if data.template:
+            lines = [data.template, f"Hits: {data.hits}", "", "Sample URLs:"] + list(data.samples or [data.url])
+        else:
+            lines = [f"{data.method} {data.url}", "", "[Exact-URL mode: enable endpoint templates to group similar calls]"]
+        try:
+            self.samples_text.configure(state=tk.NORMAL)
+            self.samples_text.delete("1.0", tk.END)
+            self.samples_text.insert("1.0", "\n".join(lines))
+            self.samples_text.configure(state=tk.DISABLED)
+        except tk.TclError: pass # Widget closing
 
 
     def sanitize_url(self, url_str: str) -> str:
         """Adds scheme if missing and validates basic structure."""
-        url_str = url_str.strip()
-        if not url_str: raise ValueError("URL cannot be empty.")
-        # Prepend https:// if no scheme is present
-        if not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*://', url_str):
-            log.debug(f"Prepending https:// to URL: {url_str}")
-            url_str = 'https://' + url_str
-        try:
-            parsed = urlparse(url_str)
-            # Basic check for scheme and netloc (domain)
-            if not parsed.scheme or not parsed.netloc:
-                 # Try to handle cases like "https:example.com"
-                 if parsed.scheme and not parsed.netloc and parsed.path:
-                      url_str = f"{parsed.scheme}://{parsed.path}"
-                      parsed = urlparse(url_str) # Reparse
-
-                 # If still invalid, raise error
-                 if not parsed.scheme or not parsed.netloc:
-                     raise ValueError("Invalid URL format. Ensure it includes scheme and domain.")
-            # Reconstruct to ensure clean format (e.g., handles ports correctly)
-            return parsed.geturl()
-        except Exception as e: # Catch potential errors during parsing
-            raise ValueError(f"Invalid URL structure: {e}")
+        return sanitize_url(url_str)
 
 
+    def get_batch_targets(self):
+        """Returns the sanitized batch target URLs (deduplicated, in order). Raises ValueError on a bad line."""
+        targets = []
+        for line in parse_pattern_lines(self.batch_targets_textbox.get("1.0", tk.END)):
+            try:
+                target = self.sanitize_url(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid batch target '{line}': {e}")
+            if target not in targets:
+                targets.append(target)
+        return targets
+
     def start_scan(self):
         """Validates inputs and starts the Playwright scan in a separate thread."""
-        url = self.url_entry.get()
-        if not url: messagebox.showerror("Input Error", "Target URL is required.", parent=self); return
+        if self.file_task_running(): # A new scan resets the results (and store) the export or import is using
+            messagebox.showwarning("File Task Running", "Wait for the export or import to finish (or cancel it) before starting a scan.", parent=self)
+            return
         try:
-             # Sanitize and update the entry field
-             target_url = self.sanitize_url(url);
-             self.url_entry.delete(0, tk.END); self.url_entry.insert(0, target_url)
+            batch_targets = self.get_batch_targets()
         except ValueError as e: messagebox.showerror("Input Error", str(e), parent=self); return
 
+        url = self.url_entry.get()
+        if batch_targets:
+            target_url = batch_targets[0] # Batch mode: the Target URL field is not used
+        else:
+            if not url: messagebox.showerror("Input Error", "Target URL is required.", parent=self); return
+            try:
+                 # Sanitize and update the entry field
+                 target_url = self.sanitize_url(url);
+                 self.url_entry.delete(0, tk.END); self.url_entry.insert(0, target_url)
+            except ValueError as e: messagebox.showerror("Input Error", str(e), parent=self); return
+
+        try:
+            batch_concurrency = max(1, int(self.batch_concurrency_var.get()))
+            batch_timeout = max(0.0, float(self.batch_timeout_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Input Error", "Batch concurrency and per-target timeout must be numbers.", parent=self); return
+
         # Prevent starting multiple scans
         if self.scan_thread and self.scan_thread.is_alive():
             messagebox.showwarning("Scan Running", "A scan is already in progress.", parent=self)
             return
 
         # --- Prepare Scan Parameters ---
-        self.update_status(f"Initializing scan: {target_url}")
+        if batch_targets:
+            self.update_status(f"Initializing batch scan: {len(batch_targets)} targets")
+        else:
+            self.update_status(f"Initializing scan: {target_url}")
         self.show_progress(start=True) # Show progress bar
-        log.info(f"Scan initiated for: {target_url}")
+        if batch_targets:
+            log.info(f"Batch scan initiated for {len(batch_targets)} targets (concurrency {batch_concurrency}).")
+        else:
+            log.info(f"Scan initiated for: {target_url}")
         self.stop_event.clear() # Reset stop signal
         self.update_user_ignore_list()
         self.update_allowed_resource_types()
         self.parse_status_codes() # Updates self.allowed_status_codes
 
-        # Combine default and custom ignore lists, remove duplicates
-        combined_ignore_list = list(set(DEFAULT_IGNORE_PATTERNS + self.user_ignore_list))
-        log.debug(f"Using {len(combined_ignore_list)} combined ignore patterns.")
-
         # Get form values (filter out empty lines)
         form_values = [line.strip() for line in self.form_values_textbox.get("1.0", tk.END).splitlines() if line.strip()]
 
-        # Build parameter dictionary to pass to the thread
-        scan_params = {
-            "url": target_url,
-            "output_file": self.output_file_var.get(), # Not used by thread, but maybe later
-            "scrolls": self.scrolls_var.get(),
-            "scroll_delay": self.scroll_delay_var.get(),
-            "wait_time": self.wait_time_var.get(),
-            "click_selectors": [s.strip() for s in self.click_selectors_entry.get().split(',') if s.strip()],
-            "hover_before_click": self.hover_var.get(),
-            "form_selector": self.form_selector_entry.get().strip(),
-            "form_values_list": form_values,
-            "form_submit": self.form_submit_var.get(),
-            "form_delay": self.form_delay_var.get(),
-            "wait_strategy": self.wait_strategy_var.get(),
-            "user_agent": self.get_selected_user_agent(),
-            "proxy_config": self.get_proxy_config(),
-            "combined_ignore_list": combined_ignore_list,
-            "allowed_resource_types": self.allowed_resource_types,
-            "allowed_status_codes": self.allowed_status_codes,
-            "navigation_timeout": self.nav_timeout_var.get(),
-            "action_timeout": self.action_timeout_var.get(),
-            "use_stealth": False, # Keep False unless playwright-stealth is explicitly integrated
-            "queue": self.result_queue, # Queue for thread communication
-            "stop_event": self.stop_event # Event to signal termination
-        }
+        # Results go to the SQLite store when enabled (switching the table over), otherwise to memory
+        store_path = (self.store_path_var.get().strip() or DEFAULT_STORE_FILE) if self.store_var.get() else None
+        if not self.use_result_store(store_path):
+            self.show_progress(start=False)
+            return
+
+        # Fresh metrics per scan; the log queue's depth is read whenever they are
+        self.scan_metrics = ScanMetrics()
+        self.scan_metrics.queue_depth.set_function(self.log_queue.qsize, queue="log")
+        output_file = self.output_file_var.get() or DEFAULT_OUTPUT_FILE
+
+        # Build parameter dictionary to pass to the thread (same builder as the headless CLI)
+        try:
+            scan_params = build_scan_params(
+                url=target_url,
+                targets=batch_targets,
+                output_file=self.output_file_var.get(),
+                scrolls=self.scrolls_var.get(),
+                scroll_delay=self.scroll_delay_var.get(),
+                wait_time=self.wait_time_var.get(),
+                click_selectors=self.click_selectors_entry.get().split(','),
+                hover_before_click=self.hover_var.get(),
+                form_selector=self.form_selector_entry.get(),
+                form_values_list=form_values,
+                form_submit=self.form_submit_var.get(),
+                form_delay=self.form_delay_var.get(),
+                wait_strategy=self.wait_strategy_var.get(),
+                user_agent=self.get_selected_user_agent(),
+                proxy_config=self.get_proxy_config(),
+                ignore_patterns=self.user_ignore_list,
+                allowed_resource_types=self.allowed_resource_types,
+                allowed_status_codes=self.allowed_status_codes,
+                navigation_timeout=self.nav_timeout_var.get(),
+                action_timeout=self.action_timeout_var.get(),
+                concurrency=batch_concurrency,
+                target_timeout=batch_timeout,
+                runtime=self.get_scan_runtime(), # Warm browser pool, or None to launch per scan
+                block_resources=self.block_resources_var.get(),
+                block_resource_types=parse_csv_list(self.block_types_entry.get()),
+                block_ignored_urls=self.block_ignored_var.get(),
+                inline_body_limit=self.inline_body_kb_var.get() * 1024,
+                adaptive_waits=self.adaptive_waits_var.get(),
+                quiet_window=self.quiet_window_var.get(),
+                quiet_cap=self.quiet_cap_var.get(),
+                crawl=self.crawl_var.get(),
+                crawl_max_depth=self.crawl_depth_var.get(),
+                crawl_max_pages=self.crawl_pages_var.get(),
+                crawl_concurrency=self.crawl_concurrency_var.get(),
+                capture_concurrency=self.capture_concurrency_var.get(),
+                dedup_templates=self.dedup_templates_var.get(),
+                schema_registry=self.schema_registry if self.infer_schemas_var.get() else None, # Kept across scans until Clear
+                metrics=self.scan_metrics,
+                metrics_path=os.path.splitext(output_file)[0] + ".metrics.json" if self.metrics_file_var.get() else None,
+                notify=self.wake_gui, # New results are drawn right away instead of at the next poll
+                journal_path=journal_path_for(output_file), # Results hit disk as they arrive
+                store_path=store_path,
+                blob_store=self.get_blob_store(),
+                result_queue=self.result_queue,
+                stop_event=self.stop_event,
+            )
+        except (ValueError, tk.TclError) as e:
+            self.show_progress(start=False)
+            messagebox.showerror("Input Error", f"Invalid scan settings: {e}", parent=self)
+            return
+        log.debug(f"Using {len(scan_params['combined_ignore_list'])} combined ignore patterns.")
 
         # --- Update GUI State ---
         self.start_button.configure(state=tk.DISABLED, text="Scanning...")
         self.stop_button.configure(state=tk.NORMAL)
         self.clear_results_and_log() # Clear previous results before new scan
 
+        self.scan_journal_path = scan_params['journal_path']
+
         # --- Start Scan Thread ---
         self.scan_thread = threading.Thread(target=run_playwright_discover_thread, args=(scan_params,), daemon=True)
         self.scan_thread.start()
@@ -1263,115 +1818,162 @@ class ViperApiGuiPro(ctk.CTk):
             log.info("No active scan to stop.")
 
 
+    def wake_gui(self):
+        """ Called on the scan thread after each queued message: asks Tk to drain the queues now (once per drain). """
+        if self._wake_pending: return
+        self._wake_pending = True
+        try: self.event_generate(QUEUE_WAKE_EVENT, when="tail")
+        except Exception: pass # Tcl without thread support, or closing: the regular poll picks the message up
+
+    def on_queue_wake(self, event=None):
+        """ Runs the next drain now instead of at its scheduled poll. """
+        if self._drain_after_id is None: return # Already draining
+        self.after_cancel(self._drain_after_id)
+        self.process_gui_queue()
+
     def process_gui_queue(self):
-        """ Processes messages from the result and log queues to update the GUI. """
+        """
+        Processes messages from the result and log queues to update the GUI, for up to GUI_DRAIN_BUDGET
+        seconds per call. Table inserts and log lines are applied in batches; only the latest status is shown.
+        """
+        self._drain_after_id = None
+        self._wake_pending = False
+        deadline = time.perf_counter() + GUI_DRAIN_BUDGET
+        pending = {'keys': [], 'logs': deque(maxlen=LOG_PANE_MAX_LINES), 'log_count': 0, 'status': None, 'ts': None}
         try:
-            processed_count = 0
-            max_process = 25 # Process up to N messages per cycle to keep GUI responsive
-
-            # Process Log Queue first
-            while not self.log_queue.empty() and processed_count < max_process:
-                message = self.log_queue.get_nowait()
-                if message.get('type') == 'log_record':
-                    record = message.get('record')
-                    if record:
-                         # Check if the record level is sufficient based on GUI setting
-                         if record.levelno >= log.getEffectiveLevel():
-                             # Format and log the message using the direct method
-                             self.log_message_direct(self.queue_handler.format(record), level=record.levelname)
-                processed_count += 1
-
-            # Process Result Queue (for status, results, finish signals)
-            while not self.result_queue.empty() and processed_count < max_process:
-                 message = self.result_queue.get_nowait()
-                 msg_type = message.get('type')
-
-                 if msg_type == 'log':
-                     # Log messages coming through the result queue (less common now)
-                     level_name = message.get('level', 'INFO').upper()
-                     level_num = getattr(logging, level_name, logging.INFO)
-                     if level_num >= log.getEffectiveLevel():
-                          self.log_message_direct(message.get('message', ''), level=level_name)
-
-                 elif msg_type == 'status':
-                     # Update status bar and progress indicator
-                     self.update_status(message.get('message', ''))
-                     self.show_progress(start=message.get('progress', False))
-
-                 elif msg_type == 'api_found':
-                     # Add a newly found API to the internal store and potentially the treeview
-                     api_data = message.get('data')
-                     if api_data:
-                         # Create a unique key (e.g., METHOD + URL)
-                         # Consider adding a counter for truly identical requests if needed
-                         api_key = f"{api_data['method']} {api_data['url']}"
-                         if api_key not in self.api_results_data: # Avoid exact duplicates
-                             self.api_results_data[api_key] = api_data
-                             # Add to tree only if it matches the current filter
-                             if self.filter_matches(api_data):
-                                 self.add_api_to_tree(api_key, api_data)
-                         else:
-                             # Log duplicate detection if needed (can be noisy)
-                             log.debug(f"Duplicate API key ignored: {api_key}")
-
-                 elif msg_type == 'finished':
-                     # Handle scan completion (success)
-                     self.scan_finished(success=True, message=message.get('message', 'Scan complete.'))
-
-                 elif msg_type == 'error':
-                     # Handle scan failure/error
-                     self.scan_finished(success=False, message=message.get('message', 'Scan failed.'))
-
-                 processed_count += 1
-
-        except queue.Empty:
-            pass # No messages left in the queue for now
+            self.apply_rendered_details() # The selected row's details come before any backlog
+            # Process Result Queue first (results, status and finish signals matter more than log lines)
+            while time.perf_counter() < deadline:
+                try: message = self.result_queue.get_nowait()
+                except queue.Empty: break
+                self.handle_result_message(message, pending)
+
+            # Then the Log Queue
+            while time.perf_counter() < deadline:
+                try: message = self.log_queue.get_nowait()
+                except queue.Empty: break
+                record = message.get('record') if message.get('type') == 'log_record' else None
+                if record: # Already gated by the handler's level
+                    pending['logs'].append((self.queue_handler.format(record), record.levelname))
+                    pending['log_count'] += 1
+
         except Exception as e:
             # Log unexpected errors during queue processing
             log.error(f"Error processing GUI queue: {e}", exc_info=True)
             # Use fallback print to avoid potential recursion if logging itself fails
             print(f"FATAL GUI Error processing queue: {e}", file=sys.stderr)
         finally:
-            # Reschedule the check to keep processing queues periodically
-            self.after(100, self.process_gui_queue) # Check every 100ms
-
-    def filter_matches(self, api_data):
-        """Checks if the api_data dictionary matches the current filter term."""
-        filter_term = self.filter_var.get().lower()
-        if not filter_term: return True # No filter means always match
-
-        # Check if filter term is present in key fields (case-insensitive)
-        return ( filter_term in api_data.get('method', '').lower() or
-                 filter_term in str(api_data.get('status', '')).lower() or
-                 filter_term in api_data.get('url', '').lower() or
-                 filter_term in api_data.get('content_type', '').lower() )
-
-
-    def add_api_to_tree(self, api_key, api_data, index=tk.END):
-        """Adds or updates a single API entry in the Treeview."""
-        try:
-            if not self.tree.exists(api_key): # Check if item already exists
-                method = api_data.get('method', 'N/A')
-                url = api_data.get('url', 'N/A')
-                status = api_data.get('status', 'N/A')
-                content_type = api_data.get('content_type', '').split(';')[0].strip() # Get main type
-
-                # Shorten long URLs for display in the table column
-                max_url_len = 80
-                display_url = url if len(url) <= max_url_len else url[:max_url_len-3] + "..."
-
-                # Insert the new item at the specified index (or end)
-                self.tree.insert("", index, iid=api_key, values=(method, status, display_url, content_type))
-                # Optional: Scroll to show the newly added item if desired
-                # self.tree.see(api_key)
+            try: self.flush_gui_updates(pending)
+            except Exception as e: print(f"FATAL GUI Error applying queued updates: {e}", file=sys.stderr)
+            # Reschedule: right away-ish if messages are left over, otherwise at the idle poll rate
+            backlog = self.result_queue.qsize() + self.log_queue.qsize()
+            self.update_queue_stats(backlog)
+            if self.scan_thread and self.scan_thread.is_alive(): self.update_metrics_summary()
+            self._drain_after_id = self.after(GUI_BUSY_INTERVAL_MS if backlog else GUI_POLL_INTERVAL_MS, self.process_gui_queue)
+
+    def handle_result_message(self, message, pending):
+        """ Applies one result-queue message; table rows, log lines and status are collected in `pending`. """
+        msg_type = message.get('type')
+
+        if msg_type == 'log':
+            # Scan log messages: every one goes to the log file, the pane only gets those at its level
+            level_name = message.get('level', 'INFO').upper()
+            level_num = getattr(logging, level_name, logging.INFO)
+            if self.file_log_handler:
+                self.file_log_handler.handle(log_record_from_message(message))
+            if level_num >= self.queue_handler.level:
+                 pending['logs'].append((message.get('message', ''), level_name))
+                 pending['log_count'] += 1
+
+        elif msg_type == 'status':
+            # Only the latest status/progress state is shown
+            pending['status'] = message
+
+        elif msg_type == 'api_found':
+            # Add a newly found API to the internal store; rows are added to the table in one batch
+            api_data = message.get('data')
+            if self.result_store:
+                pending['ts'] = message.get('ts', pending['ts']) # The store writer adds the row (see sync_result_store)
+            elif api_data:
+                api_key = api_data.key
+                if api_key not in self.api_results_data: # Avoid exact duplicates
+                    self.api_results_data[api_key] = api_data
+                    pending['keys'].append(api_key)
+                    pending['ts'] = message.get('ts', pending['ts'])
+                else:
+                    # Log duplicate detection if needed (can be noisy)
+                    log.debug(f"Duplicate API key ignored: {api_key}")
+
+        elif msg_type == 'api_hit':
+            # Template mode: another call to a known endpoint, only its hit count/samples change (store mode: in the writer)
+            api_data = apply_api_hit(self.api_results_data, message) if not self.result_store else None
+            if api_data is not None:
+                api_key = message.get('key')
+                self.results_table.refresh_key(api_key) # Redrawn only if the row is on screen
+                if api_key == self.current_selection_iid and message.get('url'):
+                    self.show_samples(api_data)
+
+        elif msg_type == 'target_done':
+            # A batch target finished (status line is updated separately)
+            log.debug(f"Batch target {message.get('target')} finished: {message.get('outcome')} ({message.get('done')}/{message.get('total')})")
+
+        elif msg_type in ('finished', 'error'):
+            # Handle scan completion (success) or failure; everything before it is shown first
+            self.flush_gui_updates(pending)
+            self.update_metrics_summary(force=True) # Final numbers of the scan
+            if msg_type == 'finished':
+                self.scan_finished(success=True, message=message.get('message', 'Scan complete.'))
             else:
-                # Item already exists, potentially update it if needed (optional)
-                log.debug(f"Item {api_key} already in tree, not re-adding.")
-
-        except tk.TclError as e:
-            log.warning(f"TclError adding item {api_key} to tree (widget might be closing): {e}")
-        except Exception as e:
-            log.error(f"Error adding {api_key} to table: {e}", exc_info=True)
+                self.scan_finished(success=False, message=message.get('message', 'Scan failed.'))
+
+    def flush_gui_updates(self, pending):
+        """ Applies the table rows, log lines and status collected by a drain, then empties `pending`. """
+        if self.result_store:
+            self.sync_result_store(pending)
+            pending['ts'] = None
+        if pending['keys']:
+            self.add_api_batch(pending['keys'])
+            if pending['ts'] is not None: self._last_latency = time.monotonic() - pending['ts']
+            pending['keys'] = []; pending['ts'] = None
+        if pending['logs']:
+            # The deque keeps only the newest LOG_PANE_MAX_LINES of a flood; the rest would be trimmed anyway
+            self.log_messages_direct(pending['logs'], dropped=pending['log_count'] - len(pending['logs']))
+            pending['logs'].clear(); pending['log_count'] = 0
+        if pending['status'] is not None:
+            # Update status bar and progress indicator
+            self.update_status(pending['status'].get('message', ''))
+            self.show_progress(start=pending['status'].get('progress', False))
+            pending['status'] = None
+
+    def update_queue_stats(self, backlog):
+        """ Shows queue depth and the latest capture-to-display latency (throttled). """
+        now = time.monotonic()
+        if now - self._stats_shown_at < GUI_STATS_INTERVAL and backlog: return
+        self._stats_shown_at = now
+        text = f"Queue: {backlog}"
+        if self._last_latency is not None: text += f" | Latency: {self._last_latency * 1000:.0f} ms"
+        try: self.queue_stats_label.configure(text=text)
+        except tk.TclError: pass # Widget closing
+
+    def add_api_batch(self, api_keys):
+        """Adds stored API entries to the results table model; rows are drawn (one redraw) once they scroll into view."""
+        shown = [key for key in api_keys if self.results_model.add(key) is not None]
+        if shown:
+            self.results_table.refresh()
+
+    def tree_row_values(self, api_key):
+        """Column values of a table row."""
+        api_data = self.results_model.row_record(api_key)
+        method = api_data.method or 'N/A'
+        # Template mode shows the endpoint template ("/items/{int}") instead of the first concrete URL
+        url = api_data.template.partition(' ')[2] if api_data.template else api_data.url or 'N/A'
+        status = api_data.status if api_data.status is not None else 'N/A'
+        content_type = api_data.content_type.split(';')[0].strip() # Get main type
+
+        # Shorten long URLs for display in the table column
+        max_url_len = 80
+        display_url = url if len(url) <= max_url_len else url[:max_url_len-3] + "..."
+        return (method, status, display_url, content_type, api_data.hits)
 
 
     def scan_finished(self, success=True, message=""):
@@ -1394,6 +1996,11 @@ class ViperApiGuiPro(ctk.CTk):
         # Clear thread reference (important!)
         self.scan_thread = None
 
+        # Show warm pool counters, or shut the pool down if warm mode was switched off mid-scan
+        if self.scan_runtime and not self.warm_runtime_var.get():
+            self.release_scan_runtime()
+        self.update_runtime_stats()
+
         # Determine if results should be saved (only if successful and not stopped)
         should_save = success and self.api_results_data and not self.stop_event.is_set()
 
@@ -1405,34 +2012,35 @@ class ViperApiGuiPro(ctk.CTk):
         if should_save:
              output_file = self.output_file_var.get()
              if not output_file: output_file = DEFAULT_OUTPUT_FILE
-             # Use save_results_gui which logs via the queue
-             save_results_gui(self.api_results_data, output_file, self.result_queue)
+             journal_path = self.scan_journal_path
+             if journal_path and os.path.exists(journal_path):
+                 # Stream the journal into the JSON file off the GUI thread (logs via the queue)
+                 threading.Thread(target=save_journal_results, args=(journal_path, output_file, self.result_queue), daemon=True).start()
+             else: # Written by an export thread (progress in the status bar)
+                 total, source = self.export_source(export_all=True)
+                 self.start_export(source, total, output_file, "json", notify=False)
+        elif self.scan_journal_path and self.api_results_data and os.path.exists(self.scan_journal_path):
+             self.log_message_direct(f"Results found so far are kept in the journal: {self.scan_journal_path}", level="INFO")
 
 
     def export_data(self, export_type):
         """Handles exporting data based on the selected menu option."""
+        if export_type == "Export OpenAPI Spec":
+            return self.export_openapi()
         export_all = "All" in export_type
         is_csv = "CSV" in export_type
+        self.export_menu_button.set("Export...") # Reset export menu text
+        if self.file_task_running():
+            messagebox.showinfo("Export", "An export or import is already running.", parent=self)
+            return
 
-        data_to_export = {}
         if export_all:
-            data_to_export = self.api_results_data # Use all collected data
-            log.info(f"Preparing to export all {len(data_to_export)} discovered items.")
-        else: # Export only visible items
-            try:
-                visible_items = self.tree.get_children('')
-                if not visible_items:
-                    messagebox.showinfo("Export", "No API data currently visible in the table to export.", parent=self)
-                    return
-                data_to_export = {iid: self.api_results_data[iid] for iid in visible_items if iid in self.api_results_data}
-                if not data_to_export:
-                     messagebox.showinfo("Export", "Could not retrieve data for visible items.", parent=self)
-                     return
-                log.info(f"Preparing to export {len(data_to_export)} visible items.")
-            except tk.TclError:
-                 log.error("Failed to get visible items from Treeview (widget might be closed).")
-                 messagebox.showerror("Export Error", "Failed to retrieve visible items from the table.", parent=self)
-                 return
+            if not self.api_results_data:
+                messagebox.showinfo("Export", "No API data to export.", parent=self)
+                return
+        elif not len(self.results_model):
+            messagebox.showinfo("Export", "No API data currently visible in the table to export.", parent=self)
+            return
 
         # Determine file extension and dialog title
         file_ext = ".csv" if is_csv else ".json"
@@ -1444,10 +2052,10 @@ class ViperApiGuiPro(ctk.CTk):
         initial_name = f"{initial_name_base}_{'all' if export_all else 'visible'}{file_ext}"
         initial_dir = os.path.dirname(self.output_file_var.get()) or "."
 
-        # Ask user for save location
+        # Ask user for save location (a name ending in .gz is written gzip-compressed)
         filename = filedialog.asksaveasfilename(
             defaultextension=file_ext,
-            filetypes=[(file_type_descr, f"*{file_ext}"), ("All files", "*.*")],
+            filetypes=[(file_type_descr, f"*{file_ext}"), (f"Gzipped {file_type_descr}", f"*{file_ext}.gz"), ("All files", "*.*")],
             initialfile=initial_name,
             initialdir=initial_dir,
             title=dialog_title,
@@ -1455,604 +2063,155 @@ class ViperApiGuiPro(ctk.CTk):
         )
         if not filename: return # User cancelled
 
-        # Reset export menu text
-        self.export_menu_button.set("Export...")
+        # The rows are fixed now; the file is written by a worker thread
+        total, source = self.export_source(export_all)
+        log.info(f"Exporting {total} {'' if export_all else 'visible '}item(s) to {filename}.")
+        self.start_export(source, total, filename, "csv" if is_csv else "json")
 
-        # Perform the export
-        try:
-            if is_csv:
-                self.export_to_csv(filename, data_to_export) # Pass the selected data
-            else:
-                # Use save_results_gui for JSON as it handles logging via queue
-                save_results_gui(data_to_export, filename, self.result_queue)
-                # Provide feedback (save_results_gui logs, but popup is good UX)
-                messagebox.showinfo("Export Complete", f"Data saved as JSON to:\n{filename}", parent=self)
-        except Exception as e:
-             log.error(f"Error during data export to {filename}: {e}", exc_info=True)
-             messagebox.showerror("Export Error", f"An error occurred during export:\n{e}", parent=self)
+    def export_source(self, export_all):
+        """
+        (record count, callable returning the records) for an export thread, fixed at the time of the call.
+        Dict mode hands over a list of the records; store mode the row ids, read on the thread's own connection.
+        """
+        if self.result_store:
+            ids = self.result_store.query_ids() if export_all else array('q', self.results_model.view)
+            path = self.result_store.path
+            return len(ids), lambda: iter_store_file(path, ids)
+        data = self.api_results_data if export_all else self.results_model.visible_records()
+        records = list(data.values())
+        return len(records), lambda: records
+
+    def export_running(self):
+        return self.export_task is not None and self.export_task.is_alive()
+
+    def start_export(self, source, total, filename, fmt, notify=True):
+        """Starts an ExportTask and shows its progress in the status bar. `notify` pops up the result."""
+        if self.export_running():
+            log.warning(f"An export is already running; {filename} was not written.")
+            return
+        self.export_task = ExportTask(source, filename, fmt, total).start()
+        self._export_notify = notify
+        self.file_task_progress.configure(maximum=max(total, 1), value=0)
+        self.file_task_label.configure(text=f"Exporting {os.path.basename(filename)}: 0/{total}")
+        self.file_task_frame.pack(side=tk.RIGHT, padx=(0, 10))
+        self.after(FILE_TASK_POLL_MS, self.poll_export)
+
+    def file_task_running(self):
+        return self.export_running() or self.import_running()
+
+    def cancel_file_task(self):
+        if self.export_running():
+            self.export_task.cancel()
+            self.file_task_label.configure(text="Cancelling export...")
+        if self.import_running():
+            self.import_task.cancel()
+            self.file_task_label.configure(text="Cancelling import...")
+
+    def poll_export(self):
+        """Refreshes the export progress until the task ends, then reports how it went."""
+        task = self.export_task
+        if task is None: return
+        if task.is_alive():
+            self.file_task_progress.configure(value=task.done)
+            self.file_task_label.configure(text=f"Exporting {os.path.basename(task.filename)}: {task.done}/{task.total}")
+            self.after(FILE_TASK_POLL_MS, self.poll_export)
+            return
+        self.file_task_frame.pack_forget()
+        if task.cancelled:
+            log.info(f"Export to {task.filename} cancelled after {task.done} item(s).")
+            self.update_status("Export cancelled.")
+        elif task.error is not None:
+            self.update_status("Export failed.")
+            messagebox.showerror("Export Error", f"An error occurred during export:\n{task.error}", parent=self)
+        else:
+            msg = f"{task.count} item(s) exported as {task.fmt.upper()} to {task.filename} in {task.elapsed:.1f} s"
+            self.log_message_direct(msg, level="SUCCESS")
+            self.update_status(f"Exported {task.count} item(s).")
+            if self._export_notify:
+                messagebox.showinfo("Export Complete", f"Data saved as {task.fmt.upper()} to:\n{task.filename}", parent=self)
 
+    def import_running(self):
+        return self.import_task is not None and self.import_task.is_alive()
 
-    def export_to_csv(self, filename, data_to_export):
-        """Exports the provided dictionary of API data to a CSV file."""
-        if not data_to_export:
-            log.warning("No data provided for CSV export.")
-            messagebox.showwarning("Export Warning", "No data available to export to CSV.", parent=self)
+    def open_results_file(self):
+        """Loads a saved results file into the table; its rows arrive through the result queue like a scan's."""
+        if self.scan_thread and self.scan_thread.is_alive():
+            messagebox.showwarning("Scan Running", "Cannot open results while a scan is running.", parent=self)
+            return
+        if self.file_task_running():
+            messagebox.showwarning("File Task Running", "Wait for the export or import to finish (or cancel it) first.", parent=self)
+            return
+        filename = filedialog.askopenfilename(
+            filetypes=[("Result files", "*.json *.ndjson *.jsonl *.gz"), ("All files", "*.*")],
+            initialdir=os.path.dirname(self.output_file_var.get()) or ".",
+            title="Open Results", parent=self)
+        if not filename: return
+        if self.api_results_data and not messagebox.askyesno(
+                "Open Results", "Loading a file replaces the results in the table. Continue?", parent=self):
             return
 
+        # Same destination as a scan: the SQLite store when enabled, otherwise memory (large bodies to the blob store)
+        store_path = (self.store_path_var.get().strip() or DEFAULT_STORE_FILE) if self.store_var.get() else None
+        if not self.use_result_store(store_path): return
+        self.reset_results()
+        self.filter_var.set("")
+        writer = None
         try:
-            data_list = list(data_to_export.values()) # Get list of api_data dicts
-            if not data_list: return # Should not happen if data_to_export is not empty
-
-            # Define primary headers and find others dynamically
-            # Include more potentially relevant fields for CSV export
-            headers = ['method', 'status', 'url', 'content_type', 'request_body', 'raw_response_body_bytes']
-            all_keys = set().union(*(d.keys() for d in data_list))
-            # Exclude complex dicts/lists and the snippet which is derived
-            excluded_keys = {'request_headers', 'response_headers', 'response_snippet'}
-            extra_headers = sorted([k for k in all_keys if k not in headers and k not in excluded_keys])
-            final_headers = headers + extra_headers
-
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=final_headers, extrasaction='ignore', quoting=csv.QUOTE_ALL) # Quote all fields
-                writer.writeheader()
-                for item in data_list:
-                    row_data = item.copy()
-                    # Decode request body for CSV readability if possible
-                    if isinstance(row_data.get('request_body'), bytes):
-                        try: row_data['request_body'] = row_data['request_body'].decode('utf-8', errors='replace')
-                        except: row_data['request_body'] = "[Binary Data]"
-                    # Truncate potentially long base64 body in CSV
-                    if row_data.get('raw_response_body_bytes') and len(row_data['raw_response_body_bytes']) > 1000: # Limit length in CSV
-                         row_data['raw_response_body_bytes'] = row_data['raw_response_body_bytes'][:1000] + "...(truncated)"
-                    else: # Ensure it's a string or None for the writer
-                         row_data['raw_response_body_bytes'] = row_data.get('raw_response_body_bytes', None)
-
-                    writer.writerow(row_data)
-
-            msg = f"Data exported as CSV to {filename}"
-            log.info(msg)
-            messagebox.showinfo("Export Complete", f"{msg}", parent=self) # Use log message in popup
-
-        except IOError as e:
-            log.error(f"Error writing CSV file {filename}: {e}")
-            messagebox.showerror("Export Error", f"Could not write CSV file:\n{e}", parent=self)
-        except Exception as e:
-            log.error(f"Unexpected error during CSV export: {e}", exc_info=True)
-            messagebox.showerror("Export Error", f"An unexpected error occurred during CSV export:\n{e}", parent=self)
-
-
-# --- Playwright Logic (Adapted for Threading/Queue Communication) ---
-
-def is_likely_api_call_pro_thread(request, response, queue, ignore_list, allowed_types, allowed_codes):
-    """
-    Checks if a request/response pair looks like an API call based on configured filters.
-    This version includes slightly looser heuristics for xhr/fetch types.
-    """
-    # Early exit checks
-    if not request or not response: return False
-    if request.method == 'OPTIONS': return False # Ignore OPTIONS preflight requests
-
-    url = request.url # Keep case for potential future use, compare lower
-    method = request.method
-    status = response.status
-    resource_type = request.resource_type or 'other' # Default to 'other' if None
-
-    # --- Filtering Logic ---
-    # 1. Resource Type Filter
-    if allowed_types and resource_type not in allowed_types:
-        # q_log(f"Ignoring (type filter): {resource_type} {url}", "DEBUG") # Can be noisy
-        return False
-
-    # 2. Status Code Filter
-    if allowed_codes: # If specific codes are provided, ONLY allow those
-        if status not in allowed_codes:
-            # q_log(f"Ignoring (status filter): {status} {url}", "DEBUG")
-            return False
-    elif status >= 400: # Default: If no specific codes, ignore errors (>=400)
-        # q_log(f"Ignoring (default status >=400): {status} {url}", "DEBUG")
-        return False
-
-    # 3. Ignore List Filter (Combined default + custom)
-    url_lower = url.lower()
-    parsed_url = urlparse(url_lower) # Parse the lowercase URL
-    url_path = parsed_url.path
-    url_domain = parsed_url.netloc
-    if any((ignore_frag in url_domain or ignore_frag in url_path) for ignore_frag in ignore_list if ignore_frag):
-        # q_log(f"Ignoring (ignore list): {url}", "DEBUG")
-        return False
-
-    # --- API Heuristics ---
-    headers = response.headers # Playwright headers are dict-like, case-insensitive access
-    content_type = headers.get('content-type', '').lower()
-
-    # Strong indicators: Specific API content types
-    if any(api_ct in content_type for api_ct in ['application/json', 'application/xml', 'text/xml', 'application/javascript', 'text/javascript', 'application/vnd.api+json']):
-        return True
-
-    # Strong indicator: Non-GET successful requests are often API calls
-    if method != 'GET' and status < 400:
-        return True
-
-    # Moderate indicator (Looser Heuristic): xhr/fetch types that passed other filters
-    # This helps catch APIs that don't use standard content types but are requested via XHR/Fetch
-    if resource_type in ["xhr", "fetch"]:
-        log.debug(f"Including based on resource type filter pass: {method} {status} {resource_type} {url}")
-        return True
-
-    # If it passed filters but didn't match strong or moderate heuristics, exclude it.
-    # This avoids including many standard document/script/css loads that might pass basic filters.
-    log.debug(f"Excluding (passed filters but no strong API heuristic): {method} {status} {resource_type} {url}")
-    return False
-
-
-def format_response_snippet_pro_thread(body_bytes, content_type):
-    """ Generates a display snippet from the response body (UTF-8 focused). """
-    if body_bytes is None: return "[No Response Body Captured]"
-    if not body_bytes: return "[Empty Response Body]"
-
-    limit = 300 # Max characters for snippet
-    try:
-        content_type = content_type.lower() if content_type else ''
-        # Try decoding as UTF-8 if it's likely text
-        is_text_based = content_type.startswith('text/') or any(sub in content_type for sub in ['json', 'xml', 'javascript', 'html'])
-
-        if is_text_based:
-            text = body_bytes.decode('utf-8', errors='replace')
-            # Try to pretty-print JSON within the snippet
-            if 'json' in content_type:
-                try:
-                    # Attempt to load only the beginning to avoid parsing huge responses
-                    potential_json = text[:limit*2] # Load slightly more than limit for parsing
-                    data = json.loads(potential_json + ('}' if potential_json.strip().startswith('{') else ']' if potential_json.strip().startswith('[') else '')) # Attempt to close if truncated
-                    pretty_text = json.dumps(data, indent=2, ensure_ascii=False)
-                    # Truncate *after* pretty printing
-                    snippet = pretty_text
-                except json.JSONDecodeError:
-                    # Show raw text if JSON parsing fails but content-type suggested it
-                    snippet = text
-            else:
-                 # Just return truncated text for other text types
-                 snippet = text
-
-            # Truncate the final snippet
-            return snippet[:limit] + ('...' if len(snippet) > limit else '')
+            if self.result_store: writer = StoreWriter(self.result_store.path, notify=self.wake_gui, append=True)
+            self.import_task = ImportTask(filename, self.result_queue, store=writer, notify=self.wake_gui,
+                                          blob_store=None if writer else self.get_blob_store(),
+                                          inline_body_limit=self.inline_body_kb_var.get() * 1024).start()
+        except Exception as e: # OSError, sqlite3.Error, tk.TclError (inline body limit)
+            if writer: writer.close()
+            messagebox.showerror("Open Results", f"Could not open {filename}:\n{e}", parent=self)
+            return
+        log.info(f"Loading results from {filename}.")
+        self.file_task_progress.configure(maximum=max(self.import_task.total, 1), value=0)
+        self.file_task_label.configure(text=f"Loading {os.path.basename(filename)}: 0")
+        self.file_task_frame.pack(side=tk.RIGHT, padx=(0, 10))
+        self.after(FILE_TASK_POLL_MS, self.poll_import)
+
+    def poll_import(self):
+        """Refreshes the import progress until the task ends, then reports how it went (rows read so far stay)."""
+        task = self.import_task
+        if task is None: return
+        name = os.path.basename(task.path)
+        if task.is_alive():
+            self.file_task_progress.configure(value=task.done)
+            self.file_task_label.configure(text=f"Loading {name}: {task.count} ({task.done * 100 // max(task.total, 1)}%)")
+            self.after(FILE_TASK_POLL_MS, self.poll_import)
+            return
+        self.file_task_frame.pack_forget()
+        if task.cancelled:
+            log.info(f"Loading {task.path} cancelled after {task.count} result(s).")
+            self.update_status(f"Loading cancelled: {task.count} result(s) from {name}.")
+        elif task.error is not None:
+            self.update_status(f"Loading {name} failed after {task.count} result(s).")
+            messagebox.showerror("Open Results", f"Could not read {task.path}:\n{task.error}\n\n{task.count} result(s) were loaded.", parent=self)
         else:
-            # For binary or unknown, show type and size
-            size_kb = len(body_bytes) / 1024
-            return f"[Binary Data ({content_type or 'Unknown Type'}), Size: {size_kb:.2f} KB]"
-    except Exception as e:
-        # Log the error? maybe just return a placeholder
-        log.debug(f"Error formatting snippet (size {len(body_bytes)}): {e}")
-        return f"[Error formatting snippet, Size: {len(body_bytes)} bytes]"
-
-
-async def discover_apis_async(params: dict):
-    """ The core Playwright automation logic running in the worker thread. """
-    # --- Extract parameters for easier access ---
-    url = params['url']; queue = params['queue']; stop_event = params['stop_event']
-    scrolls = params['scrolls']; scroll_delay = params['scroll_delay']
-    wait_time = params['wait_time']; click_selectors = params['click_selectors']
-    hover_before_click = params['hover_before_click']
-    form_selector = params['form_selector']; form_values_list = params['form_values_list']
-    form_submit = params['form_submit']; form_delay = params['form_delay']
-    wait_strategy = params['wait_strategy']; user_agent = params['user_agent']
-    proxy_config = params['proxy_config']; combined_ignore_list = params['combined_ignore_list']
-    allowed_resource_types = params['allowed_resource_types']
-    allowed_status_codes = params['allowed_status_codes']
-    navigation_timeout = params['navigation_timeout']
-    action_timeout = params['action_timeout']
-    use_stealth = params.get('use_stealth', False)
-
-    # --- State Variables ---
-    processed_req_keys = set() # Use set of (method, url) tuples for faster lookups
-    browser = None
-    context = None
-    page = None
-
-    # --- Helper Functions for Queue Communication ---
-    def q_log(message, level="INFO", exc_info=False):
-         """ Safely put a log message onto the queue. """
-         log_msg = {'type': 'log', 'level': level, 'message': message}
-         # Optionally include traceback string for errors
-         if exc_info and getattr(logging, level.upper(), 0) >= logging.ERROR:
-              log_msg['message'] += f"\n{traceback.format_exc()}"
-         try:
-             queue.put_nowait(log_msg)
-         except queue.Full:
-             print(f"Warning: Log queue full. Dropping message: {message}", file=sys.stderr)
-
-    def q_status(message, progress=False):
-        """ Safely put a status update onto the queue. """
-        try:
-            queue.put_nowait({'type': 'status', 'message': message, 'progress': progress})
-        except queue.Full:
-            print(f"Warning: Result queue full. Dropping status: {message}", file=sys.stderr)
+            self.log_message_direct(f"Loaded {task.count} result(s) from {task.path} in {task.elapsed:.1f} s", level="SUCCESS")
+            self.update_status(f"Loaded {task.count} result(s) from {name}.")
 
-
-    # --- Main Async Automation Block ---
-    try:
-        async with async_playwright() as p:
-            q_status("Launching browser...", progress=True)
-            try:
-                 # Launch browser (consider adding channel="chrome" or "msedge" if needed)
-                 browser = await p.chromium.launch(headless=True, proxy=proxy_config)
-                 q_log(f"Browser launched successfully.", level="DEBUG")
-            except PlaywrightError as launch_err:
-                 q_log(f"Failed to launch browser: {launch_err}", level="CRITICAL")
-                 q_log("Check if Playwright browsers are installed ('playwright install --with-deps')", level="ERROR")
-                 queue.put({'type': 'error', 'message': f"Browser Launch Error: {launch_err}"})
-                 return # Critical error, cannot proceed
-            except Exception as e: # Catch other potential launch errors
-                 q_log(f"Unexpected browser launch error: {e}", level="CRITICAL", exc_info=True)
-                 queue.put({'type': 'error', 'message': f"Unexpected Launch Error: {e}"})
-                 return
-
-            # Check stop event *after* launching browser but *before* context
-            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped before context creation.")
-
-            q_log("Creating browser context.", level="DEBUG")
-            try:
-                context = await browser.new_context(
-                    user_agent=user_agent,
-                    viewport={'width': 1920, 'height': 1080}, # Common desktop size
-                    java_script_enabled=True,
-                    accept_downloads=False, # Don't automatically download files
-                    ignore_https_errors=True, # Useful for sites with self-signed certs
-                    bypass_csp=True, # Can help scripts load/run, but use cautiously
-                    locale="en-US", # Set locale/language
-                    timezone_id="America/New_York" # Set timezone
-                )
-                # Set default timeouts for the context
-                context.set_default_navigation_timeout(navigation_timeout)
-                context.set_default_timeout(action_timeout) # Default for actions like click, fill
-                page = await context.new_page()
-                q_log(f"Browser context and page created.", level="DEBUG")
-            except Exception as context_err:
-                 q_log(f"Failed to create browser context or page: {context_err}", level="CRITICAL", exc_info=True)
-                 queue.put({'type': 'error', 'message': f"Context/Page Error: {context_err}"})
-                 # Cleanup browser if context failed
-                 if browser: await browser.close()
-                 return
-
-            # Apply stealth patches if enabled (requires playwright-stealth installed)
-            if use_stealth:
-                 try:
-                     from playwright_stealth import stealth_async
-                     q_log("Applying playwright-stealth patches...", level="DEBUG")
-                     await stealth_async(page) # Note: stealth often modifies the page object
-                     q_log("Stealth patches applied.", level="DEBUG")
-                 except ImportError: q_log("playwright-stealth not installed. Skipping stealth.", level="WARNING")
-                 except Exception as stealth_err: q_log(f"Could not apply stealth: {stealth_err}", level="WARNING")
-
-
-            # --- Response Handler ---
-            async def handle_response(response):
-                """ Callback function executed for each network response. """
-                # Check stop event frequently inside the handler
-                if stop_event.is_set(): return
-
-                request = response.request # Define request early for logging
-                req_url = "unknown_request_url" # Default for logging if request is invalid
-                try:
-                    # Basic check if request/response objects are valid
-                    if not request or not response: return
-
-                    req_url = request.url; req_method = request.method
-                    # Use tuple key for faster lookups in the processed set
-                    req_key = (req_method, req_url)
-                    if req_key in processed_req_keys:
-                        # q_log(f"Skipping already processed: {req_method} {req_url}", "DEBUG")
-                        return # Already processed this exact request/URL pair
-
-                    # Perform the check using parameters passed to the main function
-                    if is_likely_api_call_pro_thread(request, response, queue, combined_ignore_list, allowed_resource_types, allowed_status_codes):
-                        # Mark as processed *after* passing the check
-                        processed_req_keys.add(req_key)
-
-                        # --- Gather Details (best effort) ---
-                        response_body_bytes = None; response_headers = {}; request_headers = {}; request_body_bytes = None
-                        try: response_body_bytes = await response.body()
-                        except PlaywrightError as e: q_log(f"Could not get response body for {req_url}: {e}", "DEBUG")
-                        try: response_headers = dict(await response.all_headers())
-                        except PlaywrightError as e: q_log(f"Could not get response headers for {req_url}: {e}", "DEBUG")
-                        try: request_headers = dict(await request.all_headers())
-                        except PlaywrightError as e: q_log(f"Could not get request headers for {req_url}: {e}", "DEBUG")
-                        try:
-                            request_body_bytes = request.post_data_buffer # Access attribute directly
-                        except PlaywrightError as e: q_log(f"Could not get request post data buffer for {req_url}: {e}", "DEBUG")
-                        except Exception as e_body: q_log(f"Unexpected error getting request post data buffer for {req_url}: {e_body}", "DEBUG")
-
-                        content_type = response_headers.get('content-type', '')
-                        response_snippet_formatted = format_response_snippet_pro_thread(response_body_bytes, content_type)
-
-                        # Prepare data dictionary for the queue
-                        api_key = f"{req_method} {req_url}" # Unique string key for GUI dictionary
-                        api_details = {
-                            "method": req_method, "url": req_url, "status": response.status,
-                            "content_type": content_type, "response_snippet": response_snippet_formatted,
-                            "request_headers": request_headers,
-                            "request_body": request_body_bytes, # Store raw bytes (or None)
-                            "response_headers": response_headers,
-                            # Encode raw body bytes to Base64 string for JSON compatibility & display
-                            "raw_response_body_bytes": base64.b64encode(response_body_bytes).decode('ascii') if response_body_bytes else None
-                        }
-                        # Put the found API details onto the queue for the GUI thread
-                        try:
-                            queue.put_nowait({'type': 'api_found', 'data': api_details})
-                            q_log(f"API Found: {req_method} {req_url} ({response.status})", level="SUCCESS") # Log success via queue
-                        except queue.Full:
-                            q_log(f"Warning: Result queue full. Dropping API data for {req_url}", "WARNING")
-
-
-                except Exception as e:
-                    # Log errors occurring within the handler itself
-                    url_for_log = req_url if 'req_url' in locals() and req_url != "unknown_request_url" else response.url if response else "unknown URL"
-                    q_log(f"Error processing response {url_for_log}: {e}", level="ERROR", exc_info=True)
-
-            # --- Attach Event Handlers ---
-            page.on("response", handle_response)
-            # Optional: Add other handlers if needed for deep debugging
-            # page.on("request", lambda request: q_log(f">> REQ: {request.method} {request.resource_type} {request.url}", "DEBUG"))
-            # page.on("framenavigated", lambda frame: q_log(f"Frame Nav: {frame.url}", "DEBUG"))
-            # page.on("load", lambda: q_log("Page Load event fired", "DEBUG"))
-            # page.on("domcontentloaded", lambda: q_log("DOM Content Loaded event fired", "DEBUG"))
-            # page.on("console", lambda msg: q_log(f"CONSOLE ({msg.type()}): {msg.text()}", "DEBUG"))
-            # page.on("pageerror", lambda exc: q_log(f"PAGE ERROR: {exc}", "ERROR"))
-
-            # --- Initial Navigation ---
-            q_log(f"Navigating to {url} [UA: {user_agent[:50]}...]", level="INFO")
-            try:
-                q_status(f"Loading page (wait: {wait_strategy}, timeout: {navigation_timeout}ms)...", progress=True)
-                await page.goto(url, wait_until=wait_strategy) # Uses context default timeout
-                q_status(f"Page loaded. Initial wait {wait_time}s...", progress=True)
-                await asyncio.sleep(wait_time) # Initial settle time after load
-            except PlaywrightTimeoutError as e: q_log(f"Navigation timeout for {url}: {e}", level="ERROR")
-            except PlaywrightError as e: q_log(f"Navigation/load error for {url}: {e}", level="ERROR")
-            except Exception as e: q_log(f"Unexpected error during page load for {url}: {e}", level="ERROR", exc_info=True)
-            # Check stop event after initial load attempt
-            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped during initial load.")
-
-            # --- Interaction Phase ---
-            q_status("Performing interactions...", progress=True)
-            interactions_performed = 0
-
-            # Form Interactions
-            if form_selector and form_values_list:
-                q_log(f"Attempting form input on '{form_selector}'...", level="INFO")
-                for i, form_value in enumerate(form_values_list):
-                    if stop_event.is_set(): break # Check stop event between inputs
-                    q_log(f"Form Input {i+1}/{len(form_values_list)}: Filling '{form_selector}' with '{form_value[:30]}...'")
-                    try:
-                        form_input = page.locator(form_selector).first # Target the first match
-                        await form_input.scroll_into_view_if_needed(timeout=action_timeout // 2) # Ensure visible first
-                        await form_input.fill(form_value, timeout=action_timeout) # Use context default
-                        interactions_performed += 1
-                        await asyncio.sleep(0.1 + random.uniform(0, 0.2)) # Tiny delay after fill
-
-                        if form_submit:
-                            q_log(f"Submitting form via Enter key on '{form_selector}'")
-                            await form_input.press("Enter", delay=random.uniform(100, 300))
-                            interactions_performed += 1
-                            q_status(f"Waiting after submit {i+1} (networkidle)...", progress=True)
-                            try:
-                                 # Wait for network to likely settle after submission
-                                 await page.wait_for_load_state('networkidle', timeout=action_timeout)
-                            except PlaywrightTimeoutError: q_log("Timeout waiting network idle after form submit", "WARNING")
-                            except PlaywrightError as e: q_log(f"Error waiting after form submit: {e}", "WARNING")
-                        # Wait specified delay between form submissions/inputs
-                        await asyncio.sleep(form_delay + random.uniform(0, 0.5))
-                    except PlaywrightTimeoutError as e: q_log(f"Timeout interacting with form '{form_selector}' for value '{form_value[:30]}...': {e}", level="WARNING")
-                    except PlaywrightError as e: q_log(f"Playwright error on form '{form_selector}': {e}", level="WARNING")
-                    except Exception as e: q_log(f"Unexpected error during form interaction '{form_selector}': {e}", level="ERROR", exc_info=True)
-                # Wait after completing all form interactions
-                if interactions_performed > 0 and not stop_event.is_set():
-                    q_status("Form input phase finished. Waiting...", progress=True);
-                    await asyncio.sleep(wait_time) # Wait specified time after all form fills
-
-            # Check stop event
-            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after form input.")
-
-            # Click Interactions
-            if click_selectors:
-                q_log(f"Attempting clicks based on {len(click_selectors)} selector(s)...", level="INFO")
-                clicks_done_in_phase = 0
-                for selector in click_selectors:
-                     if stop_event.is_set(): break # Check stop event between clicks
-                     q_log(f"Attempting click: {selector}", level="DEBUG")
-                     try:
-                         elements = page.locator(selector)
-                         count = await elements.count()
-                         if count == 0:
-                             q_log(f"No elements found for click selector: {selector}", level="DEBUG")
-                             continue
-
-                         # Try to click the first visible, enabled element
-                         element_to_click = None
-                         # Check first few matches for visibility/enabled state
-                         for i in range(min(count, 5)): # Limit checks for performance
-                             el = elements.nth(i)
-                             try:
-                                 if await el.is_visible() and await el.is_enabled():
-                                    element_to_click = el
-                                    break
-                             except PlaywrightError as vis_err:
-                                 q_log(f"Error checking visibility/enabled for {selector} nth({i}): {vis_err}", level="DEBUG")
-                                 continue # Try next element
-
-                         if element_to_click:
-                            q_log(f"Found visible/enabled element for {selector}. Attempting click.", level="DEBUG")
-                            await element_to_click.scroll_into_view_if_needed(timeout=action_timeout // 2)
-                            if hover_before_click:
-                                q_log(f"Hovering over {selector}", level="DEBUG")
-                                try:
-                                    await element_to_click.hover(timeout=action_timeout // 3) # Shorter hover timeout
-                                    await asyncio.sleep(0.2 + random.uniform(0, 0.3)) # Short pause after hover
-                                except PlaywrightError as hover_err: q_log(f"Hover failed for {selector}: {hover_err}", level="WARNING")
-
-                            # Perform the click with slight random delay
-                            await element_to_click.click(delay=random.uniform(50, 200), timeout=action_timeout)
-                            q_log(f"Clicked element matching {selector}", level="INFO")
-                            clicks_done_in_phase += 1
-                            interactions_performed += 1
-                            # Wait briefly after click to allow potential async operations
-                            await asyncio.sleep(1.0 + random.uniform(0, 0.5))
-
-                            # Optional: Wait for network idle after *each* click? Can be slow.
-                            # try:
-                            #    q_status(f"Waiting after click {selector} (networkidle)...", progress=True)
-                            #    await page.wait_for_load_state('networkidle', timeout=action_timeout // 2)
-                            # except PlaywrightTimeoutError: q_log(f"Timeout waiting network idle after clicking {selector}", "DEBUG")
-
-                         else: q_log(f"No visible/enabled element found for click selector: {selector}", level="DEBUG")
-
-                     except PlaywrightTimeoutError as e: q_log(f"Timeout clicking {selector}: {e}", level="WARNING")
-                     except PlaywrightError as e: q_log(f"Playwright error clicking {selector}: {e}", level="WARNING")
-                     except Exception as e_click: q_log(f"Unexpected error clicking {selector}: {e_click}", level="ERROR", exc_info=True)
-
-                # Wait after completing all click interactions if any were performed
-                if clicks_done_in_phase > 0 and not stop_event.is_set():
-                     q_status("Click phase finished. Waiting for network...", progress=True)
-                     try: await page.wait_for_load_state('networkidle', timeout=action_timeout)
-                     except PlaywrightTimeoutError: q_log("Timeout waiting network idle after clicks", "WARNING")
-                     except PlaywrightError as e: q_log(f"Error waiting after clicks: {e}", "WARNING")
-                     await asyncio.sleep(wait_time) # Additional wait
-
-            # Check stop event
-            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after clicks.")
-
-            # Scroll Interactions
-            if scrolls > 0:
-                q_log(f"Performing {scrolls} scroll(s)...", level="INFO")
-                for i in range(scrolls):
-                    if stop_event.is_set(): break # Check stop event between scrolls
-                    q_log(f"Scroll {i+1}/{scrolls}", level="DEBUG")
-                    try:
-                         # Scroll down the page using JavaScript
-                         await page.evaluate('window.scrollTo(0, document.body.scrollHeight)')
-                         interactions_performed += 1
-                         # Wait specified delay between scrolls
-                         await asyncio.sleep(scroll_delay + random.uniform(0, 0.2))
-                    except PlaywrightError as e: q_log(f"Error during scroll {i+1}: {e}", level="WARNING")
-                    except Exception as e: q_log(f"Unexpected error during scroll {i+1}: {e}", level="ERROR", exc_info=True)
-
-                # Wait after completing all scrolls
-                if scrolls > 0 and not stop_event.is_set():
-                    q_status("Scrolling finished. Waiting for network...", progress=True)
-                    try: await page.wait_for_load_state('networkidle', timeout=action_timeout)
-                    except PlaywrightTimeoutError: q_log("Timeout waiting network idle after scroll", "WARNING")
-                    except PlaywrightError as e: q_log(f"Error waiting after scroll: {e}", "WARNING")
-                    await asyncio.sleep(wait_time) # Final wait after scrolling phase
-
-            # --- Final Wait & Cleanup ---
-            if interactions_performed > 0: q_log("Interaction phase complete.", level="INFO")
-            else: q_log("No interactions were performed based on settings.", level="INFO")
-
-            if not stop_event.is_set():
-                q_log("Allowing final 5s for network settlement before closing...", level="DEBUG")
-                await asyncio.sleep(5) # Extra final wait
-
-            if stop_event.is_set(): raise asyncio.CancelledError("Scan stopped after interactions.")
-            q_log("Async discovery phase complete.", level="INFO")
-
-    # --- Exception Handling for the entire async block ---
-    except asyncio.CancelledError:
-         q_log("Scan process was stopped by user signal.", level="WARNING")
-         # Results collected so far are already in the queue
-
-    except PlaywrightError as e:
-        # Log Playwright-specific errors that weren't caught deeper
-        q_log(f"A Playwright error occurred: {e}", level="ERROR", exc_info=True)
-        try: queue.put_nowait({'type': 'error', 'message': f"Playwright Error: {e}"})
-        except queue.Full: pass
-
-    except Exception as e:
-        # Log any other unexpected errors
-        q_log(f"An unexpected error occurred during the scan: {e}", level="CRITICAL", exc_info=True)
-        try: queue.put_nowait({'type': 'error', 'message': f"Unexpected Scan Error: {e}"})
-        except queue.Full: pass
-
-    # --- Cleanup ---
-    finally:
-        q_log("Closing browser context and browser.", level="INFO")
-        # Close page, context, and browser safely
-        if page:
-             try: await page.close()
-             except Exception as e: q_log(f"Error closing page: {e}", "DEBUG")
-        if context:
-            try: await context.close()
-            except Exception as e: q_log(f"Error closing context: {e}", "DEBUG")
-        if browser:
-            try:
-                 await browser.close()
-                 q_log("Browser closed.", level="INFO")
-            except Exception as e: q_log(f"Error closing browser: {e}", "DEBUG")
-        q_log("Async function finished.", level="DEBUG")
-
-
-def run_playwright_discover_thread(params: dict):
-    """ Wrapper function to run the async Playwright logic in a separate thread. """
-    queue = params['queue']
-    stop_event = params['stop_event']
-    try:
-        # Create a new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        # Run the main async function until it completes or is cancelled
-        loop.run_until_complete(discover_apis_async(params))
-        loop.close() # Clean up the loop
-
-        # Check if the scan was stopped *before* sending the final finished message
-        if not stop_event.is_set():
-            # Send a 'finished' message if the scan completed normally
-            try: queue.put_nowait({'type': 'finished', 'message': f"Scan finished. Check results table."})
-            except queue.Full: log.warning("Result queue full, couldn't send 'finished' message.")
+    def export_openapi(self):
+        """Writes the OpenAPI spec inferred from the captured JSON bodies so far (a scan may still be running)."""
+        self.export_menu_button.set("Export...")
+        if not len(self.schema_registry):
+            messagebox.showinfo("Export", "No endpoint schemas inferred yet. Enable 'Infer JSON schemas' and run a scan.", parent=self)
+            return
+        initial_name_base = os.path.splitext(os.path.basename(self.output_file_var.get()) or DEFAULT_OUTPUT_FILE)[0]
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("OpenAPI JSON", "*.json"), ("All files", "*.*")],
+            initialfile=f"{initial_name_base}_openapi.json",
+            initialdir=os.path.dirname(self.output_file_var.get()) or ".",
+            title="Export OpenAPI Spec",
+            parent=self
+        )
+        if not filename: return # User cancelled
+        if save_openapi_spec(self.schema_registry, filename, self.result_queue):
+            messagebox.showinfo("Export Complete", f"OpenAPI spec saved to:\n{filename}", parent=self)
         else:
-             # Send appropriate message if stopped by user
-             try: queue.put_nowait({'type': 'finished', 'message': f"Scan stopped by user. Check results table."})
-             except queue.Full: log.warning("Result queue full, couldn't send 'stopped' message.")
-
-
-    except Exception as e:
-        # Log the error in the main thread's logger as well for visibility
-        log.exception("Error in worker thread execution")
-        # Send error message to the GUI queue
-        try: queue.put_nowait({'type': 'error', 'message': f"Worker thread error: {e}"})
-        except queue.Full: pass
-
-
-def save_results_gui(apis_data_dict, filename, queue):
-    """ Saves the provided API data dictionary to a JSON file. Logs messages via the queue. """
-    if not apis_data_dict:
-        try: queue.put_nowait({'type': 'log', 'level': 'WARNING', 'message': "No API data provided to save."})
-        except queue.Full: pass
-        return
-
-    # Convert the dictionary values (which contain the API details) to a list
-    data_to_save = list(apis_data_dict.values())
-
-    # Remove fields not suitable for basic JSON export if necessary
-    # (e.g., complex objects, or derived fields like response_snippet)
-    # Keep raw request/response bodies (base64 encoded) for potential analysis
-    for item in data_to_save:
-        item.pop('response_snippet', None) # Remove snippet as it's derived/truncated
-
-    try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            # Use ensure_ascii=False for proper UTF-8 output without escaping non-ASCII chars
-            json.dump(data_to_save, f, indent=2, ensure_ascii=False)
-        # Log success via queue
-        try: queue.put_nowait({'type': 'log', 'level': 'SUCCESS', 'message': f"API details saved to {filename}"})
-        except queue.Full: pass
-    except IOError as e:
-        try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Error writing results to {filename}: {e}"})
-        except queue.Full: pass
-    except TypeError as e:
-         # This might happen if data isn't JSON serializable (e.g., raw bytes left somehow)
-         try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Error serializing results to JSON: {e}"})
-         except queue.Full: pass
-    except Exception as e:
-        try: queue.put_nowait({'type': 'log', 'level': 'ERROR', 'message': f"Unexpected error saving results: {e}"})
-        except queue.Full: pass
+            messagebox.showerror("Export Error", f"Could not write the OpenAPI spec to:\n{filename}", parent=self)
 
 
 # --- Main Execution Block ---
@@ -0,0 +1,384 @@
+"""
+Viper API Interceptor - optional SQLite result store.
+
+By default every result lives in the GUI's {api_key: ApiRecord} dict, and filtering, sorting
+and exports are Python loops over it. With a store, results go to an SQLite file instead:
+
+  * StoreWriter appends a scan's 'api_found' / 'api_hit' messages from a background thread,
+    one transaction per batch (WAL mode, synchronous=NORMAL), like the NDJSON journal;
+  * ResultStore is the reading side: filter (a viper_query query, translated clause by
+    clause into SQL by clause_sql), sort and export are SQL queries over indexed columns
+    (method, status, host, path, content type), and a record is loaded by its row id only
+    when it is needed;
+  * the GUI keeps only the row ids of the visible rows (viper_results.StoreResultsModel), so
+    its memory no longer grows with the scan, and a finished scan's file can be reopened.
+
+Bodies are stored as BLOBs after the small columns, so queries never read them. Bodies spilled
+to the (temporary) blob store are copied in too, so a reopened file has every body.
+"""
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from urllib.request import pathname2url
+
+from viper_endpoints import DEFAULT_MAX_SAMPLES
+from viper_query import glob_matcher, record_location, search_text
+from viper_records import ApiRecord
+
+log = logging.getLogger(__name__)
+
+STORE_SCHEMA_VERSION = 1
+STORE_MESSAGE_TYPES = ('api_found', 'api_hit')
+DEFAULT_STORE_FILE = "viper_results.sqlite"
+DEFAULT_STORE_BATCH = 500 # Messages written per transaction
+STORE_RECORD_CACHE = 64 # Full records (with bodies) kept by StoreRecords
+STORE_FETCH_BATCH = 500 # Records read per query when streaming an export
+# Sortable columns (ApiRecord attribute -> SQL); text sorts are case-insensitive like ResultsModel.sort
+SORT_COLUMNS = {'method': "method COLLATE NOCASE", 'status': "status", 'url': "url COLLATE NOCASE",
+                'content_type': "content_type COLLATE NOCASE", 'hits': "hits", 'host': "host", 'template': "template COLLATE NOCASE"}
+
+# Query fields (viper_query) -> SQL
+QUERY_NUMERIC_COLUMNS = {'status': "status", 'hits': "hits",
+                         'size': "coalesce(length(response_body), json_extract(body_blob, '$.size'))"} # ApiRecord.body_size
+QUERY_TEXT_COLUMNS = {'url': "url", 'type': "content_type", 'template': "template", 'target': "target"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    api_key TEXT NOT NULL UNIQUE,
+    method TEXT, status INTEGER, url TEXT, host TEXT, path TEXT, template TEXT, content_type TEXT,
+    hits INTEGER NOT NULL DEFAULT 1, target TEXT, search TEXT NOT NULL,
+    samples TEXT, request_headers TEXT, response_headers TEXT, body_blob TEXT,
+    request_body BLOB, response_body BLOB
+);
+CREATE INDEX IF NOT EXISTS ix_results_method ON results(method COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_results_status ON results(status);
+CREATE INDEX IF NOT EXISTS ix_results_host ON results(host);
+CREATE INDEX IF NOT EXISTS ix_results_path ON results(path);
+CREATE INDEX IF NOT EXISTS ix_results_content_type ON results(content_type COLLATE NOCASE);
+"""
+RECORD_COLUMNS = ("method, url, status, content_type, request_headers, request_body, response_headers, "
+                  "response_body, body_blob, template, hits, samples, target")
+SUMMARY_COLUMNS = "method, url, status, content_type, template, hits"
+INSERT_SQL = ("INSERT OR IGNORE INTO results (api_key, method, status, url, host, path, template, content_type, hits, target, "
+              "search, samples, request_headers, response_headers, body_blob, request_body, response_body) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def open_store_connection(path, check_same_thread=True, readonly=False):
+    """ Opens (creating if needed, unless readonly) a store file in WAL mode. Raises sqlite3.Error / ValueError. """
+    if readonly: # E.g. an export thread reading while the scan's writer commits
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, check_same_thread=check_same_thread)
+    else:
+        conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL + NORMAL: a crash loses at most the last commits, never the file
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > STORE_SCHEMA_VERSION:
+        conn.close()
+        raise ValueError(f"{path} was written by a newer version (store schema {version}).")
+    # Query helpers with Python's semantics, so a query matches the same rows as in memory (see clause_sql)
+    conn.create_function("py_lower", 1, _sql_lower, deterministic=True)
+    conn.create_function("py_glob", 2, _sql_glob, deterministic=True)
+    if not readonly:
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version={STORE_SCHEMA_VERSION}")
+    return conn
+
+
+def _sql_lower(value):
+    return value.lower() if isinstance(value, str) else value # SQLite's lower() folds ASCII only
+
+
+def _sql_glob(pattern, value):
+    return glob_matcher(pattern)(value or '') is not None # viper_query's fnmatch rules ([!a] negates; GLOB uses [^a])
+
+
+def _json_or_none(value):
+    return json.dumps(value, ensure_ascii=False) if value else None
+
+
+def _body_columns(record):
+    """ (body_blob, response_body) columns: a spilled body is read back inline; a missing blob keeps its reference. """
+    try: return None, record.load_body()
+    except OSError: return _json_or_none(record.response_body_blob), None
+
+
+def record_row(record):
+    """ INSERT_SQL parameters of an ApiRecord. """
+    host, path = record_location(record)
+    body_blob, response_body = _body_columns(record)
+    return (record.key, record.method, record.status, record.url, host, path, record.template, record.content_type, record.hits, record.target, search_text(record),
+            _json_or_none(record.samples), _json_or_none(record.request_headers), _json_or_none(record.response_headers),
+            body_blob, record.request_body, response_body)
+
+
+def record_from_row(row):
+    """ ApiRecord from a RECORD_COLUMNS row. """
+    (method, url, status, content_type, request_headers, request_body, response_headers,
+     response_body, body_blob, template, hits, samples, target) = row
+    return ApiRecord(method, url, status, content_type, json.loads(request_headers) if request_headers else None,
+                     request_body, json.loads(response_headers) if response_headers else None, response_body,
+                     json.loads(body_blob) if body_blob else None, template, hits,
+                     json.loads(samples) if samples else None, target)
+
+
+def _ranges_sql(column, ranges, missing):
+    parts, args = [f"{column} IS NULL"] if missing else [], []
+    for low, high in ranges:
+        if low is not None and high is not None: parts.append(f"{column} BETWEEN ? AND ?"); args += [low, high]
+        elif low is not None: parts.append(f"{column} >= ?"); args.append(low)
+        elif high is not None: parts.append(f"{column} <= ?"); args.append(high)
+        else: parts.append(f"{column} IS NOT NULL")
+    return " OR ".join(parts), args
+
+
+def _header_sql(column, clause):
+    sql = f"EXISTS (SELECT 1 FROM json_each({column}) WHERE py_lower(key) = ?"
+    if clause.text is None: return sql + ")", [clause.name]
+    return sql + " AND instr(py_lower(value), ?) > 0)", [clause.name, clause.text]
+
+
+def clause_sql(clause):
+    """ (SQL condition, args) equivalent to a viper_query.Clause's predicate over the results table. """
+    field = clause.field
+    if field is None: sql, args = "instr(search, ?) > 0", [clause.text]
+    elif field == 'method': sql, args = f"method COLLATE NOCASE IN ({', '.join('?' * len(clause.values))})", list(clause.values)
+    elif field in ('status', 'hits', 'size'): sql, args = _ranges_sql(QUERY_NUMERIC_COLUMNS[field], clause.ranges, clause.missing)
+    elif field in ('host', 'path'):
+        if '[' in clause.pattern: sql = f"py_glob(?, {field})" # Character classes: SQLite GLOB reads [!...] / [^...] the other way round
+        else: sql = f"coalesce({field}, '') GLOB ?" # Only * and ?: same meaning in both, and GLOB can use the index
+        args = [clause.pattern]
+    elif field == 'header':
+        request_sql, request_args = _header_sql("request_headers", clause)
+        response_sql, response_args = _header_sql("response_headers", clause)
+        sql, args = f"{request_sql} OR {response_sql}", request_args + response_args
+    else: sql, args = f"instr(py_lower({QUERY_TEXT_COLUMNS[field]}), ?) > 0", [clause.text]
+    if clause.negate: return f"NOT coalesce(({sql}), 0)", args # NULL (e.g. no status) counts as no match
+    return f"({sql})", args
+
+
+class ResultStore:
+    """ Reading side of a store file, used from one thread (the GUI's). Row ids follow insertion order. """
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.conn = open_store_connection(path, readonly=readonly)
+        self._data_version = None
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT count(*) FROM results").fetchone()[0]
+
+    def max_id(self):
+        return self.conn.execute("SELECT coalesce(max(id), 0) FROM results").fetchone()[0]
+
+    def changed(self):
+        """ True if another connection (the scan's writer) committed since the last call. """
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def clear(self):
+        with self.conn: self.conn.execute("DELETE FROM results")
+
+    def has(self, row_id):
+        return self.conn.execute("SELECT 1 FROM results WHERE id = ?", (row_id,)).fetchone() is not None
+
+    def id_of(self, api_key):
+        row = self.conn.execute("SELECT id FROM results WHERE api_key = ?", (api_key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, row_id):
+        """ Full ApiRecord (bodies included), or None. """
+        row = self.conn.execute(f"SELECT {RECORD_COLUMNS} FROM results WHERE id = ?", (row_id,)).fetchone()
+        return record_from_row(row) if row else None
+
+    def summary(self, row_id):
+        """ ApiRecord with only the table columns (no headers or bodies), or None. """
+        row = self.conn.execute(f"SELECT {SUMMARY_COLUMNS} FROM results WHERE id = ?", (row_id,)).fetchone()
+        if not row: return None
+        method, url, status, content_type, template, hits = row
+        return ApiRecord(method, url, status, content_type, template=template, hits=hits)
+
+    def query_ids(self, query=None, sort=None, reverse=False, after_id=0, upto_id=None):
+        """
+        Row ids matching a viper_query.Query (translated to SQL by query_sql), in insertion
+        order or sorted by an ApiRecord attribute (missing values last), as an array('q').
+        """
+        where, args = ["id > ?"], [after_id]
+        if upto_id is not None: where.append("id <= ?"); args.append(upto_id)
+        if query:
+            for clause in query.clauses:
+                sql, clause_args = clause_sql(clause)
+                where.append(sql); args.extend(clause_args)
+        order = "id"
+        if sort:
+            column = SORT_COLUMNS[sort]
+            order = f"{column} {'DESC' if reverse else 'ASC'} NULLS LAST, id"
+        cursor = self.conn.execute(f"SELECT id FROM results WHERE {' AND '.join(where)} ORDER BY {order}", args)
+        return array('q', (row[0] for row in cursor))
+
+    def iter_records(self, ids=None, batch=STORE_FETCH_BATCH):
+        """ Yields full records in insertion order, or those of `ids` in that order, `batch` rows per query. """
+        if ids is None:
+            last = 0
+            while True:
+                rows = self.conn.execute(f"SELECT id, {RECORD_COLUMNS} FROM results WHERE id > ? ORDER BY id LIMIT ?", (last, batch)).fetchall()
+                if not rows: return
+                for row in rows: yield record_from_row(row[1:])
+                last = rows[-1][0]
+        for start in range(0, len(ids), batch):
+            chunk = list(ids[start:start + batch])
+            rows = self.conn.execute(f"SELECT id, {RECORD_COLUMNS} FROM results WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            by_id = {row[0]: row[1:] for row in rows}
+            for row_id in chunk:
+                if row_id in by_id: yield record_from_row(by_id[row_id])
+
+
+def iter_store_file(path, ids=None):
+    """ ResultStore.iter_records() on a read-only connection of its own (the GUI's cannot cross threads). """
+    store = ResultStore(path, readonly=True)
+    try: yield from store.iter_records(ids)
+    finally: store.close()
+
+
+class StoreRecords:
+    """
+    Read-only {row_id: ApiRecord} mapping over a ResultStore (what the GUI's results dict is in
+    store mode). Loaded records are kept in a small LRU so a selected row keeps its identity.
+    `ids` narrows it to some rows (e.g. the visible ones, for an export).
+    """
+    def __init__(self, store, ids=None, cache_size=STORE_RECORD_CACHE):
+        self.store = store
+        self.ids = ids
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def subset(self, ids):
+        """ The same mapping narrowed to `ids` (in that order). """
+        return StoreRecords(self.store, ids, self.cache_size)
+
+    def __len__(self):
+        return len(self.ids) if self.ids is not None else len(self.store)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __contains__(self, row_id):
+        if self.ids is not None: return row_id in self.ids
+        return isinstance(row_id, int) and (row_id in self._cache or self.store.has(row_id))
+
+    def __getitem__(self, row_id):
+        record = self.get(row_id)
+        if record is None: raise KeyError(row_id)
+        return record
+
+    def get(self, row_id, default=None):
+        record = self._cache.get(row_id)
+        if record is not None:
+            self._cache.move_to_end(row_id)
+            return record
+        record = self.store.get(row_id) if isinstance(row_id, int) else None
+        if record is None: return default
+        self._cache[row_id] = record
+        if len(self._cache) > self.cache_size: self._cache.popitem(last=False)
+        return record
+
+    def values(self):
+        """ Streams the records (never all in memory at once). """
+        return self.store.iter_records(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids) if self.ids is not None else (row[0] for row in self.store.conn.execute("SELECT id FROM results ORDER BY id"))
+
+
+class StoreWriter:
+    """ Writes result messages to a store file from a background thread, one transaction per batch. """
+    def __init__(self, path, notify=None, append=False, max_batch=DEFAULT_STORE_BATCH, max_samples=DEFAULT_MAX_SAMPLES):
+        self.path = path
+        self.notify = notify # Called after each commit (e.g. wakes the GUI, which then re-queries)
+        self.max_batch = max_batch
+        self.max_samples = max_samples
+        self.rows_written = 0
+        self.commits = 0
+        self.errors = 0
+        self._conn = open_store_connection(path, check_same_thread=False) # Opened here so errors reach the caller; used by the thread only
+        if not append:
+            with self._conn: self._conn.execute("DELETE FROM results")
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="viper-store", daemon=True)
+        self._thread.start()
+
+    def append(self, message):
+        """ Queues an 'api_found' / 'api_hit' message. Cheap and thread-safe. """
+        if message.get('type') == 'api_found' and isinstance(message.get('data'), ApiRecord):
+            message = {**message, 'data': message['data'].copy()} # The GUI may update hits/samples meanwhile
+        self._queue.put(message)
+
+    def backlog(self):
+        """ Messages queued but not written yet. """
+        return self._queue.qsize()
+
+    def close(self, timeout=30):
+        """ Commits everything queued and closes the connection. """
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        closing = False
+        while not closing:
+            batch = [self._queue.get()] # Whatever queued up while the last batch was written goes into the next one
+            while len(batch) < self.max_batch:
+                try: batch.append(self._queue.get_nowait())
+                except queue.Empty: break
+            if None in batch:
+                closing = True
+                batch = [m for m in batch if m is not None]
+            if batch: self._write(batch)
+        try: self._conn.close()
+        except sqlite3.Error: pass
+
+    def _write(self, batch):
+        rows = []; hits = {} # api_key -> [count, new sample URLs]
+        for message in batch:
+            if message.get('type') == 'api_found' and message.get('data') is not None:
+                try: rows.append(record_row(message['data']))
+                except (TypeError, ValueError) as e:
+                    self.errors += 1
+                    log.warning(f"Result store: could not encode {message['data']!r}: {e}")
+            elif message.get('type') == 'api_hit' and message.get('key'):
+                entry = hits.setdefault(message['key'], [0, []])
+                entry[0] += 1
+                if message.get('url'): entry[1].append(message['url'])
+        try:
+            with self._conn:
+                if rows: self._conn.executemany(INSERT_SQL, rows)
+                for api_key, (count, urls) in hits.items():
+                    if not urls:
+                        self._conn.execute("UPDATE results SET hits = hits + ? WHERE api_key = ?", (count, api_key))
+                        continue
+                    found = self._conn.execute("SELECT samples FROM results WHERE api_key = ?", (api_key,)).fetchone()
+                    if not found: continue
+                    samples = json.loads(found[0]) if found[0] else []
+                    for url in urls:
+                        if len(samples) < self.max_samples and url not in samples: samples.append(url)
+                    self._conn.execute("UPDATE results SET hits = hits + ?, samples = ? WHERE api_key = ?",
+                                       (count, json.dumps(samples, ensure_ascii=False), api_key))
+            self.rows_written += len(rows); self.commits += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            log.error(f"Result store: write to {self.path} failed: {e}")
+            return
+        if self.notify is not None:
+            try: self.notify()
+            except Exception: pass # GUI closing